@@ -0,0 +1,253 @@
+###
+#
+# Lenovo Redfish examples - Report BIOS configuration drift across many BMCs
+#
+# Copyright Notice:
+#
+# Copyright 2018 Lenovo Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+###
+
+
+import sys
+import json
+import hashlib
+import lenovo_utils as utils
+from set_bios_attribute import read_bios_profile, diff_bios_attributes
+
+
+def get_bios_settings(ip, login_account, login_password, system_id):
+    """Get current Bios attributes and the pending ones that differ from them
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params system_id: ComputerSystem instance id(None: first instance, All: all instances)
+    :type system_id: None or string
+    :returns: returns list of current and pending attributes per system when succeeded or error message when failed
+    """
+    result = {}
+    login_host = "https://" + ip
+    try:
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
+    except:
+        result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
+        return result
+    system = utils.get_system_url("/redfish/v1", system_id, REDFISH_OBJ)
+    if not system:
+        result = {'ret': False, 'msg': "This system id is not exist or system member is None"}
+        REDFISH_OBJ.logout()
+        return result
+    settings = []
+    for system_url in system:
+        response_system_url = REDFISH_OBJ.get(system_url, None)
+        if response_system_url.status != 200:
+            result = {'ret': False, 'msg': "response system url Error code %s" % response_system_url.status}
+            REDFISH_OBJ.logout()
+            return result
+        bios_url = response_system_url.dict['Bios']['@odata.id']
+        response_bios_url = REDFISH_OBJ.get(bios_url, None)
+        if response_bios_url.status != 200:
+            result = {'ret': False, 'msg': "response bios url Error code %s" % response_bios_url.status}
+            REDFISH_OBJ.logout()
+            return result
+        current = response_bios_url.dict['Attributes']
+        pending = {}
+        settings_object = response_bios_url.dict.get('@Redfish.Settings', {}).get('SettingsObject')
+        if settings_object:
+            response_pending_url = REDFISH_OBJ.get(settings_object['@odata.id'], None)
+            if response_pending_url.status == 200:
+                pending = dict((name, value) for name, value in response_pending_url.dict.get('Attributes', {}).items()
+                               if current.get(name) != value)
+        settings.append({'system': system_url, 'attributes': current, 'pending': pending})
+    REDFISH_OBJ.logout()
+    result = {'ret': True, 'settings': settings}
+    return result
+
+
+def hash_bios_attributes(attributes, pending=None):
+    """Get the sha256 of a canonical JSON form of Bios attributes and their pending changes, identical configurations get the same hash"""
+    config = {'attributes': attributes, 'pending': pending} if pending else attributes
+    return hashlib.sha256(json.dumps(config, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def diff_from_golden(attributes, golden, pending=None):
+    """Get the attributes whose value differs from the golden ones, as name: value(None: missing)
+    :params attributes: current Bios attributes
+    :type attributes: dict
+    :params golden: golden attribute values
+    :type golden: dict
+    :params pending: pending changes, compared over the current values when given(None: current values only)
+    :type pending: None or dict
+    :returns: returns deviations by attribute name
+    """
+    # Golden values read from JSON may be text for numbers, compared the way set_bios_attribute compares a profile
+    diff = diff_bios_attributes(attributes, pending or {}, golden)
+    deviations = dict((name, change[0]) for name, change in diff['changed'].items())
+    deviations.update((name, None) for name in diff['unknown'])
+    return deviations
+
+
+class DriftReport(object):
+    """Bios configurations of many hosts, grouped by the hash of their current attributes and pending changes.
+    Only one attribute dict per distinct configuration is kept, and none at all when a golden profile is given,
+    so memory grows with the number of distinct configurations rather than with the number of hosts.
+    """
+
+    def __init__(self, golden=None):
+        """
+        :params golden: golden attribute values(None: the most common configuration is the reference)
+        :type golden: None or dict
+        """
+        self.golden = golden
+        self.groups = {}
+        self.pending = {}
+        self.failed = {}
+        self.hosts = 0
+
+    def add(self, host, settings):
+        """Count the Bios settings of one host, returns the configuration hash of each of its systems"""
+        hashes = []
+        self.hosts += 1
+        for entry in settings:
+            config_hash = hash_bios_attributes(entry['attributes'], entry['pending'])
+            group = self.groups.get(config_hash)
+            if group is None:
+                group = {'members': [], 'attributes': None, 'pending': entry['pending'], 'deviations': None, 'effective_deviations': None}
+                if self.golden is None:
+                    group['attributes'] = entry['attributes']
+                else:
+                    # Identical configurations deviate identically, diff once per group
+                    group['deviations'] = diff_from_golden(entry['attributes'], self.golden)
+                    group['effective_deviations'] = diff_from_golden(entry['attributes'], self.golden, entry['pending'])
+                self.groups[config_hash] = group
+            group['members'].append(host if len(settings) == 1 else "%s %s" % (host, entry['system']))
+            for name in entry['pending']:
+                self.pending[name] = self.pending.get(name, 0) + 1
+            hashes.append(config_hash)
+        return hashes
+
+    def report(self):
+        """Get the drift report: configuration groups with their pending changes, deviation counts per attribute and pending counts"""
+        golden = self.golden
+        reference = None
+        if golden is None and self.groups:
+            reference = max(self.groups, key=lambda config_hash: len(self.groups[config_hash]['members']))
+            golden = self.groups[reference]['attributes']
+        deviations = {}
+        groups = []
+        for config_hash, group in sorted(self.groups.items(), key=lambda item: -len(item[1]['members'])):
+            systems = len(group['members'])
+            group_deviations = group['deviations']
+            effective_deviations = group['effective_deviations']
+            if group_deviations is None:
+                group_deviations = diff_from_golden(group['attributes'], golden)
+                effective_deviations = diff_from_golden(group['attributes'], golden, group['pending'])
+            for name, value in group_deviations.items():
+                attribute = deviations.setdefault(name, {'systems': 0, 'values': {}})
+                attribute['systems'] += systems
+                key = json.dumps(value)
+                attribute['values'][key] = attribute['values'].get(key, 0) + systems
+            # Pending changes show whether the next reboot fixes the drift of the group or creates new drift
+            groups.append({'hash': config_hash, 'systems': systems, 'deviations': len(group_deviations),
+                           'pending': group['pending'], 'deviations_after_reboot': len(effective_deviations),
+                           'members': group['members']})
+        return {'ret': not self.failed, 'hosts': self.hosts, 'systems': sum(group['systems'] for group in groups),
+                'failed': len(self.failed), 'failed_hosts': self.failed, 'configurations': len(groups), 'reference': reference or 'golden',
+                'compliant': sum(group['systems'] for group in groups if not group['deviations']),
+                'compliant_after_reboot': sum(group['systems'] for group in groups if not group['deviations_after_reboot']),
+                'groups': groups, 'deviations': deviations, 'pending': self.pending}
+
+
+def scan_bios_drift(host_list, login_account, login_password, system_id, golden=None, workers=16, timeout=None, output=None):
+    """Collect Bios settings from many BMCs in parallel and report how they drift
+    :params host_list: BMC address list
+    :type host_list: list
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params system_id: ComputerSystem instance id(None: first instance, All: all instances)
+    :type system_id: None or string
+    :params golden: golden attribute values(None: the most common configuration is the reference)
+    :type golden: None or dict
+    :params workers: maximum number of BMCs read at the same time
+    :type workers: int
+    :params timeout: seconds to wait for one BMC(None: no limit)
+    :type timeout: None or float
+    :params output: JSON lines stream for one line per BMC with its configuration hash(None: no per BMC lines)
+    :type output: None or file object
+    :returns: returns drift report
+    """
+    drift = DriftReport(golden)
+    args = (login_account, login_password, system_id)
+    for ip, result, elapsed in utils.run_on_hosts(get_bios_settings, host_list, args, workers, timeout):
+        if isinstance(result, dict) and result.get('ret') is True:
+            # The attribute dicts are dropped as soon as they are counted
+            record = {'host': ip, 'hashes': drift.add(ip, result['settings']),
+                      'pending': sum(len(entry['pending']) for entry in result['settings'])}
+        else:
+            drift.failed[ip] = result.get('msg') if isinstance(result, dict) else str(result)
+            record = {'host': ip, 'error': drift.failed[ip]}
+        if output is not None:
+            output.write(json.dumps(record, sort_keys=True) + '\n')
+            output.flush()
+    return drift.report()
+
+
+import argparse
+def add_parameter():
+    """Add bios drift report parameter"""
+    argget = utils.create_common_parameter_list()
+    utils.add_fleet_parameter(argget)
+    argget.add_argument('--golden', type=str, help='JSON file of golden attribute values, default is the most common configuration')
+    argget.add_argument('--hostlines', action='store_true', help='Also print one JSON line per BMC with its configuration hash')
+    argget.add_argument('--members', action='store_true', help='List the hosts of each configuration in the report')
+    args = argget.parse_args()
+    parameter_info = utils.parse_parameter(args)
+    for name in ['hosts', 'workers', 'timeout', 'golden', 'hostlines', 'members']:
+        parameter_info[name] = getattr(args, name)
+    return parameter_info
+
+
+if __name__ == '__main__':
+    # Get parameters from config.ini and/or command line
+    parameter_info = add_parameter()
+
+    # Get connection info from the parameters user specified
+    login_account = parameter_info["user"]
+    login_password = parameter_info["passwd"]
+    system_id = parameter_info['sysid']
+    host_list = utils.read_host_list(parameter_info['hosts'])
+    golden = None
+    if parameter_info['golden']:
+        result = read_bios_profile(parameter_info['golden'])
+        if result['ret'] is False:
+            sys.stderr.write(result['msg'])
+            sys.exit(1)
+        golden = result['attributes']
+
+    # Scan all hosts and write the report
+    result = scan_bios_drift(host_list, login_account, login_password, system_id, golden, parameter_info['workers'],
+                             parameter_info['timeout'], sys.stdout if parameter_info['hostlines'] else None)
+    if not parameter_info['members']:
+        for group in result['groups']:
+            del group['members']
+    sys.stdout.write(json.dumps(result, sort_keys=True, indent=2) + '\n')
+    sys.stderr.write("%s hosts(%s systems), %s configurations, %s systems compliant(%s after reboot), %s failed\n" % (result['hosts'], result['systems'],
+                     result['configurations'], result['compliant'], result['compliant_after_reboot'], result['failed']))
+    if result['ret'] is False:
+        sys.exit(1)
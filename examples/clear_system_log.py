@@ -21,7 +21,6 @@
 
 
 import sys
-import redfish
 import json
 import lenovo_utils as utils
 
@@ -43,16 +42,13 @@ def clear_system_log(ip, login_account, login_password, system_id):
     try:
         # Connect using the BMC address, account name, and password
         # Create a REDFISH object
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                             password=login_password, default_prefix='/redfish/v1')
-        # Login into the server and create a session
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
         return result
     try:
         # Get response_base_url resource
-        response_base_url = REDFISH_OBJ.get('/redfish/v1', None)
+        response_base_url = utils.get_navigation(REDFISH_OBJ, '/redfish/v1')
         if response_base_url.status == 200:
             managers_url = response_base_url.dict['Managers']['@odata.id']
         else:
@@ -61,7 +57,7 @@ def clear_system_log(ip, login_account, login_password, system_id):
             return result
 
         # Get managers url resource
-        response_managers_url = REDFISH_OBJ.get(managers_url, None)
+        response_managers_url = utils.get_navigation(REDFISH_OBJ, managers_url)
         if response_managers_url.status == 200:
             manager_count = response_managers_url.dict['Members@odata.count']
         else:
@@ -21,24 +21,25 @@
 
 
 import sys
-import redfish
 import json
 import lenovo_utils as utils
 
+# OemPrivileges a custom role may be given
+CUSTOM_PRIVILEGES = ("UserAccountManagement","RemoteConsoleAccess","RemoteConsoleAndVirtualMediaAcccess","RemoteServerPowerRestartAccess","AbilityClearEventLogs","AdapterConfiguration_Basic"
+,"AdapterConfiguration_NetworkingAndSecurity","AdapterConfiguration_Advanced")
+
 #set user privileges
 def set_user_privileges(REDFISH_OBJ,response_account_service_url,roleid,authority):
     result = {}
     list_auth = []
     #check custom privileges
-    rang_custom_auth = ("UserAccountManagement","RemoteConsoleAccess","RemoteConsoleAndVirtualMediaAcccess","RemoteServerPowerRestartAccess","AbilityClearEventLogs","AdapterConfiguration_Basic"
-,"AdapterConfiguration_NetworkingAndSecurity","AdapterConfiguration_Advanced")
     for auth in authority:
-        if auth not in rang_custom_auth:
+        if auth not in CUSTOM_PRIVILEGES:
             result = {'ret': False, 'msg': "custom privileges out of rang"}
             return result
         list_auth.append(auth)
     roles_url = response_account_service_url.dict['Roles']['@odata.id']
-    response_roles_url = REDFISH_OBJ.get(roles_url, None)
+    response_roles_url = utils.get_collection(REDFISH_OBJ, roles_url)
     if response_roles_url.status == 200:
         max_role_num = response_roles_url.dict["Members@odata.count"]
         list_role_url = []
@@ -46,8 +47,9 @@ def set_user_privileges(REDFISH_OBJ,response_account_service_url,roleid,authorit
             role_url = response_roles_url.dict["Members"][i]["@odata.id"]
             list_role_url.append(role_url)
         dst_role_url = ""
-        for role_url in list_role_url:
-            response_role_url = REDFISH_OBJ.get(role_url, None)
+        # Get all roles, several at a time
+        responses = utils.get_members(REDFISH_OBJ, response_roles_url.dict["Members"], select=["Name"])
+        for role_url, response_role_url in zip(list_role_url, responses):
             if response_role_url.status == 200:
                 role_username = response_role_url.dict["Name"]
                 if role_username == roleid:
@@ -108,16 +110,13 @@ def create_bmc_user(ip, login_account, login_password, username, password,author
         # Connect using the BMC address, account name, and password
         # Create a REDFISH object
         login_host = "https://" + ip
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                             password=login_password, default_prefix='/redfish/v1')
-        # Login into the server and create a session
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct\n"}
         return result
 
     # Get ServiceBase resource
-    response_base_url = REDFISH_OBJ.get('/redfish/v1', None)
+    response_base_url = utils.get_navigation(REDFISH_OBJ, '/redfish/v1')
     # Get response_base_url
     if response_base_url.status == 200:
         account_service_url = response_base_url.dict['AccountService']['@odata.id']
@@ -128,7 +127,7 @@ def create_bmc_user(ip, login_account, login_password, username, password,author
     response_account_service_url = REDFISH_OBJ.get(account_service_url, None)
     if response_account_service_url.status == 200:
         accounts_url = response_account_service_url.dict['Accounts']['@odata.id']
-        response_accounts_url = REDFISH_OBJ.get(accounts_url, None)
+        response_accounts_url = utils.get_collection(REDFISH_OBJ, accounts_url)
         if response_accounts_url.status == 200:
             max_account_num = response_accounts_url.dict["Members@odata.count"]
             list_account_url = []
@@ -139,10 +138,10 @@ def create_bmc_user(ip, login_account, login_password, username, password,author
             flag = False
             user_pos = 0
             num = 0
-            #find the first empty account pos
-            for account_url in list_account_url:
+            #find the first empty account pos, get all accounts several at a time
+            responses = utils.get_members(REDFISH_OBJ, response_accounts_url.dict["Members"], select=["UserName"])
+            for account_url, response_accounts_url in zip(list_account_url, responses):
                 num = num + 1
-                response_accounts_url = REDFISH_OBJ.get(account_url, None)
                 if response_accounts_url.status == 200:
                     account_username = response_accounts_url.dict["UserName"]
                     if account_username == "" and flag is False:
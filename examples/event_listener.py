@@ -0,0 +1,503 @@
+###
+#
+# Lenovo Redfish examples - Subscribe to BMC events and receive them instead of polling
+#
+# Copyright Notice:
+#
+# Copyright 2018 Lenovo Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+###
+
+
+import sys
+import ssl
+import json
+import time
+import queue
+import signal
+import socket
+import urllib.parse
+import threading
+import http.server
+import lenovo_utils as utils
+
+
+# Maximum number of received events waiting for the sink, BMCs get 503 and retry when it is full
+EVENT_QUEUE_SIZE = 10000
+# Seconds to wait before reconnecting a dropped SSE stream, doubled up to SSE_RECONNECT_MAX
+SSE_RECONNECT_DELAY = 5
+SSE_RECONNECT_MAX = 300
+
+
+def add_event_subscription(ip, login_account, login_password, destination, event_types=None, context=None):
+    """Subscribe a destination to the events of a BMC, an existing subscription of the destination is reused
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params destination: URL the BMC posts events to, such as https://10.10.10.1:8443/
+    :type destination: string
+    :params event_types: EventTypes to subscribe, such as ["Alert"](None: service default)
+    :type event_types: None or list
+    :params context: Context string the BMC sends back with each event(None: BMC IP address)
+    :type context: None or string
+    :returns: returns subscription URL when succeeded or error message when failed
+    """
+    result = {}
+    login_host = "https://" + ip
+    try:
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
+    except:
+        result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
+        return result
+
+    try:
+        response_subscriptions = get_subscriptions(REDFISH_OBJ)
+        if response_subscriptions['ret'] is False:
+            return response_subscriptions
+        for subscription in response_subscriptions['entries']:
+            if subscription.get('Destination') == destination:
+                result = {'ret': True, 'subscription_uri': subscription['@odata.id'], 'msg': "Subscription already exists"}
+                return result
+
+        body = {'Destination': destination, 'Protocol': 'Redfish', 'Context': context or ip}
+        if event_types:
+            body['EventTypes'] = event_types
+        subscriptions_url = response_subscriptions['subscriptions_url']
+        response_add = REDFISH_OBJ.post(subscriptions_url, body=body)
+        if response_add.status in [200, 201]:
+            subscription_uri = response_add.getheader('Location')
+            if not subscription_uri and response_add.dict:
+                subscription_uri = response_add.dict.get('@odata.id')
+            result = {'ret': True, 'subscription_uri': subscription_uri, 'msg': "Subscription added"}
+        else:
+            error_message = utils.get_extended_error(response_add)
+            result = {'ret': False, 'msg': "Url '%s' response Error code %s \nerror_message: %s" % (subscriptions_url, response_add.status, error_message)}
+    except Exception as e:
+        result = {'ret': False, 'msg': "error_message: %s" % (e)}
+    finally:
+        REDFISH_OBJ.logout()
+    return result
+
+
+def delete_event_subscription(ip, login_account, login_password, destination):
+    """Delete the subscriptions of a destination from a BMC
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params destination: URL the subscription posts events to
+    :type destination: string
+    :returns: returns number of deleted subscriptions when succeeded or error message when failed
+    """
+    result = {}
+    login_host = "https://" + ip
+    try:
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
+    except:
+        result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
+        return result
+
+    try:
+        response_subscriptions = get_subscriptions(REDFISH_OBJ)
+        if response_subscriptions['ret'] is False:
+            return response_subscriptions
+        deleted = 0
+        for subscription in response_subscriptions['entries']:
+            if subscription.get('Destination') != destination:
+                continue
+            response_delete = REDFISH_OBJ.delete(subscription['@odata.id'], None)
+            if response_delete.status not in [200, 204]:
+                error_message = utils.get_extended_error(response_delete)
+                result = {'ret': False, 'msg': "Url '%s' response Error code %s \nerror_message: %s" % (subscription['@odata.id'], response_delete.status, error_message)}
+                return result
+            deleted += 1
+        result = {'ret': True, 'deleted': deleted}
+    except Exception as e:
+        result = {'ret': False, 'msg': "error_message: %s" % (e)}
+    finally:
+        REDFISH_OBJ.logout()
+    return result
+
+
+def get_subscriptions(REDFISH_OBJ):
+    """Get the event subscriptions of a BMC
+    :params REDFISH_OBJ: logged-in redfish client
+    :type REDFISH_OBJ: redfish client object
+    :returns: returns Subscriptions URL and subscription resources when succeeded or error message when failed
+    """
+    event_service = get_event_service(REDFISH_OBJ)
+    if event_service['ret'] is False:
+        return event_service
+    subscriptions_url = event_service['entries']['Subscriptions']['@odata.id']
+    response_subscriptions_url = utils.get_collection(REDFISH_OBJ, subscriptions_url)
+    if response_subscriptions_url.status != 200:
+        error_message = utils.get_extended_error(response_subscriptions_url)
+        return {'ret': False, 'msg': "Url '%s' response Error code %s \nerror_message: %s" % (subscriptions_url, response_subscriptions_url.status, error_message)}
+    subscriptions = []
+    for response_subscription in utils.get_members(REDFISH_OBJ, response_subscriptions_url.dict['Members'], select=['Destination']):
+        if response_subscription.status == 200:
+            subscriptions.append(response_subscription.dict)
+    return {'ret': True, 'subscriptions_url': subscriptions_url, 'entries': subscriptions}
+
+
+def get_event_service(REDFISH_OBJ):
+    """Get the EventService resource of a BMC
+    :params REDFISH_OBJ: logged-in redfish client
+    :type REDFISH_OBJ: redfish client object
+    :returns: returns EventService resource when succeeded or error message when failed
+    """
+    response_base_url = utils.get_navigation(REDFISH_OBJ, '/redfish/v1')
+    if response_base_url.status != 200:
+        error_message = utils.get_extended_error(response_base_url)
+        return {'ret': False, 'msg': "Url '/redfish/v1' response Error code %s \nerror_message: %s" % (response_base_url.status, error_message)}
+    if 'EventService' not in response_base_url.dict:
+        return {'ret': False, 'msg': "This BMC does not support EventService"}
+    event_service_url = response_base_url.dict['EventService']['@odata.id']
+    response_event_service_url = REDFISH_OBJ.get(event_service_url, None)
+    if response_event_service_url.status != 200:
+        error_message = utils.get_extended_error(response_event_service_url)
+        return {'ret': False, 'msg': "Url '%s' response Error code %s \nerror_message: %s" % (event_service_url, response_event_service_url.status, error_message)}
+    return {'ret': True, 'entries': response_event_service_url.dict}
+
+
+def make_event_records(host, payload):
+    """Split a Redfish Event payload into one record per event
+    :params host: address the event came from
+    :type host: string
+    :params payload: Event resource posted by the BMC or read from the SSE stream
+    :type payload: dict
+    :returns: returns list of records with host, received time, Context and the event
+    """
+    received = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    context = payload.get('Context')
+    events = payload.get('Events')
+    if not isinstance(events, list):
+        events = [payload]
+    return [{'host': host, 'received': received, 'context': context, 'event': event} for event in events]
+
+
+class EventReceiver(object):
+    """HTTPS server receiving the events BMCs post to their subscriptions.
+    Each request is answered as soon as its events are queued, the sink reads them from the events queue.
+    """
+
+    def __init__(self, port, certfile, keyfile=None, address='', queue_size=None, allowed_hosts=None):
+        """
+        :params port: TCP port to listen on
+        :type port: int
+        :params certfile: PEM certificate presented to the BMCs(None: plain HTTP)
+        :type certfile: None or string
+        :params keyfile: PEM private key, if not in certfile
+        :type keyfile: None or string
+        :params address: local address to listen on('': all addresses)
+        :type address: string
+        :params queue_size: maximum number of queued events(None: EVENT_QUEUE_SIZE)
+        :type queue_size: None or int
+        :params allowed_hosts: BMC addresses or names events are accepted from(None: any sender)
+        :type allowed_hosts: None or list
+        """
+        self.events = queue.Queue(queue_size or EVENT_QUEUE_SIZE)
+        self.dropped = 0
+        self.rejected = 0
+        self.allowed_addresses = None if allowed_hosts is None else get_host_addresses(allowed_hosts)
+        self._server = http.server.ThreadingHTTPServer((address, port), self._make_handler())
+        self._server.daemon_threads = True
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            # Handshake in the request thread, a slow BMC must not hold up accepting the others
+            self._server.socket = context.wrap_socket(self._server.socket, server_side=True, do_handshake_on_connect=False)
+        self._thread = None
+
+    def _make_handler(self):
+        receiver = self
+
+        class EventHandler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                if receiver.allowed_addresses is not None and self.client_address[0] not in receiver.allowed_addresses:
+                    # Only the subscribed BMCs may post, anything else could forge events
+                    receiver.rejected += 1
+                    self.send_response(403)
+                    self.end_headers()
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    payload = json.loads(self.rfile.read(length).decode('utf-8'))
+                except ValueError:
+                    payload = None
+                if not isinstance(payload, dict):
+                    self.send_response(400)
+                    self.end_headers()
+                    return
+                status = 204
+                for record in make_event_records(self.client_address[0], payload):
+                    try:
+                        receiver.events.put_nowait(record)
+                    except queue.Full:
+                        receiver.dropped += 1
+                        status = 503
+                self.send_response(status)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return EventHandler
+
+    def start(self):
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving and close the listening socket"""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def get_host_addresses(host_list):
+    """Get the IP addresses of BMC addresses or names
+    :params host_list: BMC address list
+    :type host_list: list
+    :returns: returns set of IP addresses, a name that does not resolve is kept as is
+    """
+    addresses = set()
+    for host in host_list:
+        addresses.add(host)
+        try:
+            for info in socket.getaddrinfo(host, None):
+                addresses.add(info[4][0])
+        except socket.gaierror:
+            pass
+    return addresses
+
+
+def get_sse_uri(ip, login_account, login_password):
+    """Get the EventService ServerSentEventUri of a BMC
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :returns: returns SSE stream URL when succeeded or error message when the BMC does not provide one
+    """
+    login_host = "https://" + ip
+    try:
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
+    except:
+        return {'ret': False, 'msg': "Please check the username, password, IP is correct"}
+    try:
+        event_service = get_event_service(REDFISH_OBJ)
+    finally:
+        REDFISH_OBJ.logout()
+    if event_service['ret'] is False:
+        return event_service
+    sse_uri = event_service['entries'].get('ServerSentEventUri')
+    if not sse_uri:
+        return {'ret': False, 'msg': "This BMC does not provide ServerSentEventUri"}
+    return {'ret': True, 'sse_uri': sse_uri}
+
+
+def listen_sse(ip, login_account, login_password, events, stop_event, sse_uri=None):
+    """Read the EventService ServerSentEventUri stream of a BMC into the events queue until stop_event is set,
+    reconnecting with the last event id when the stream drops
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params events: queue receiving the event records
+    :type events: queue.Queue
+    :params stop_event: set to stop listening
+    :type stop_event: threading.Event
+    :params sse_uri: SSE stream URL from get_sse_uri(None: looked up first)
+    :type sse_uri: None or string
+    :returns: returns error message when the BMC does not provide an SSE stream
+    """
+    import requests
+    from requests.packages.urllib3.exceptions import InsecureRequestWarning
+    requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+
+    login_host = "https://" + ip
+    if sse_uri is None:
+        result = get_sse_uri(ip, login_account, login_password)
+        if result['ret'] is False:
+            return result
+        sse_uri = result['sse_uri']
+
+    delay = SSE_RECONNECT_DELAY
+    last_event_id = None
+    while not stop_event.is_set():
+        headers = {'Accept': 'text/event-stream'}
+        if last_event_id:
+            headers['Last-Event-ID'] = last_event_id
+        try:
+            # The read timeout only ends a silent stream, it is opened again right away
+            with requests.get(login_host + sse_uri, auth=(login_account, login_password), headers=headers,
+                              stream=True, verify=False, timeout=(30, SSE_RECONNECT_MAX)) as response:
+                if response.status_code != 200:
+                    raise Exception("Url '%s' response Error code %s" % (sse_uri, response.status_code))
+                delay = SSE_RECONNECT_DELAY
+                data = []
+                for line in response.iter_lines(decode_unicode=True):
+                    if stop_event.is_set():
+                        break
+                    if line:
+                        field, _, value = line.partition(':')
+                        if field == 'data':
+                            data.append(value.lstrip())
+                        elif field == 'id':
+                            last_event_id = value.strip()
+                        continue
+                    # A blank line ends one event
+                    if data:
+                        try:
+                            payload = json.loads('\n'.join(data))
+                        except ValueError:
+                            payload = None
+                        data = []
+                        if isinstance(payload, dict):
+                            for record in make_event_records(ip, payload):
+                                events.put(record)
+        except requests.exceptions.ReadTimeout:
+            continue
+        except Exception as e:
+            sys.stderr.write("%s: SSE stream dropped, %s\n" % (ip, e))
+            stop_event.wait(delay)
+            delay = min(delay * 2, SSE_RECONNECT_MAX)
+    return {'ret': True}
+
+
+def write_events(events, output, stop_event):
+    """Write queued event records as JSON lines until stop_event is set
+    :params events: queue of event records
+    :type events: queue.Queue
+    :params output: JSON lines stream
+    :type output: file object
+    :params stop_event: set to stop writing
+    :type stop_event: threading.Event
+    :returns: returns number of written events
+    """
+    count = 0
+    while not stop_event.is_set():
+        try:
+            record = events.get(timeout=1)
+        except queue.Empty:
+            continue
+        output.write(json.dumps(record, sort_keys=True) + '\n')
+        count += 1
+        # Flush when the queue drains, a burst of events is written in one go
+        if events.empty():
+            output.flush()
+    output.flush()
+    return count
+
+
+import argparse
+def add_parameter():
+    """Add event listener parameter"""
+    argget = utils.create_common_parameter_list()
+    utils.add_fleet_parameter(argget)
+    argget.add_argument('--destination', type=str, help='URL of this listener the BMCs post events to, such as https://10.10.10.1:8443/, required unless --sse is used')
+    argget.add_argument('--port', type=int, default=8443, help='Port the listener serves on, default is 8443')
+    argget.add_argument('--address', type=str, help='Local address the listener serves on, default is the host of --destination')
+    argget.add_argument('--certfile', type=str, help='PEM certificate of the listener(without it the listener serves plain HTTP)')
+    argget.add_argument('--keyfile', type=str, help='PEM private key of the listener certificate, if not in certfile')
+    argget.add_argument('--eventtypes', type=str, nargs='*', default=['Alert'], help='EventTypes to subscribe, default is Alert')
+    argget.add_argument('--output', type=str, default='-', help='JSON lines file events are appended to, default is stdout')
+    argget.add_argument('--sse', action='store_true', help='Read the EventService SSE stream of each BMC instead of adding subscriptions')
+    argget.add_argument('--keep', action='store_true', help='Keep the subscriptions on the BMCs when the listener stops')
+    args = argget.parse_args()
+    parameter_info = utils.parse_parameter(args)
+    for name in ['hosts', 'workers', 'timeout', 'destination', 'port', 'address', 'certfile', 'keyfile', 'eventtypes', 'output', 'sse', 'keep']:
+        parameter_info[name] = getattr(args, name)
+    return parameter_info
+
+
+if __name__ == '__main__':
+    # Get parameters from config.ini and/or command line
+    parameter_info = add_parameter()
+
+    # Get connection info from the parameters user specified
+    login_account = parameter_info["user"]
+    login_password = parameter_info["passwd"]
+    host_list = utils.read_host_list(parameter_info['hosts'])
+    destination = parameter_info['destination']
+    if not parameter_info['sse'] and not destination:
+        sys.stderr.write("Please specify the listener URL with --destination")
+        sys.exit(1)
+
+    output = sys.stdout if parameter_info['output'] == '-' else open(parameter_info['output'], 'a')
+    stop_event = threading.Event()
+    # Stop as on Ctrl-C, so the subscriptions are still deleted when the listener is terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    listeners = []
+    if parameter_info['sse']:
+        # Find the stream of every BMC, several at a time, then read one stream per BMC, all feeding the same queue
+        events = queue.Queue(EVENT_QUEUE_SIZE)
+        args = (login_account, login_password)
+        for ip, result, elapsed in utils.run_on_hosts(get_sse_uri, host_list, args, parameter_info['workers'], parameter_info['timeout']):
+            if result['ret'] is False:
+                sys.stderr.write("%s: %s\n" % (ip, result['msg']))
+                continue
+            listener = threading.Thread(target=listen_sse, args=(ip, login_account, login_password, events, stop_event, result['sse_uri']))
+            listener.daemon = True
+            listener.start()
+            listeners.append(listener)
+        if not listeners:
+            sys.stderr.write("No BMC provides an SSE stream\n")
+            sys.exit(1)
+    else:
+        address = parameter_info['address']
+        if address is None:
+            address = urllib.parse.urlsplit(destination).hostname or ''
+        receiver = EventReceiver(parameter_info['port'], parameter_info['certfile'], parameter_info['keyfile'],
+                                 address, allowed_hosts=host_list)
+        receiver.start()
+        events = receiver.events
+
+    # Write events until interrupted, the subscriptions are deleted however the listener ends
+    try:
+        if not parameter_info['sse']:
+            # Subscribe every BMC, several at a time
+            args = (login_account, login_password, destination, parameter_info['eventtypes'])
+            for ip, result, elapsed in utils.run_on_hosts(add_event_subscription, host_list, args, parameter_info['workers'], parameter_info['timeout']):
+                if result['ret'] is False:
+                    sys.stderr.write("%s: %s\n" % (ip, result['msg']))
+        write_events(events, output, stop_event)
+    except KeyboardInterrupt:
+        stop_event.set()
+    finally:
+        stop_event.set()
+        if not parameter_info['sse']:
+            receiver.stop()
+            if receiver.dropped:
+                sys.stderr.write("%s events dropped while the queue was full\n" % receiver.dropped)
+            if receiver.rejected:
+                sys.stderr.write("%s requests rejected from hosts not in the host list\n" % receiver.rejected)
+            if not parameter_info['keep']:
+                args = (login_account, login_password, destination)
+                for ip, result, elapsed in utils.run_on_hosts(delete_event_subscription, host_list, args, parameter_info['workers'], parameter_info['timeout']):
+                    if result['ret'] is False:
+                        sys.stderr.write("%s: %s\n" % (ip, result['msg']))
+    if output is not sys.stdout:
+        output.close()
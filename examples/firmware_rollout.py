@@ -0,0 +1,245 @@
+###
+#
+# Lenovo Redfish examples - Roll a firmware image across many BMCs in waves
+#
+# Copyright Notice:
+#
+# Copyright 2018 Lenovo Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+###
+
+
+import sys
+import json
+import math
+import time
+import lenovo_utils as utils
+from update_firmware import update_fw, plan_fw_update, add_image_server_parameter, start_image_server
+
+
+def plan_waves(host_list, canary=1, wave_percent=10):
+    """Split a host list into rollout waves, a canary wave followed by waves of wave_percent of the hosts
+    :params host_list: BMC address list
+    :type host_list: list
+    :params canary: number of hosts in the first wave(0: no canary wave)
+    :type canary: int
+    :params wave_percent: percentage of all hosts in each following wave
+    :type wave_percent: float
+    :returns: returns list of host lists
+    """
+    waves = []
+    wave_size = max(int(math.ceil(len(host_list) * wave_percent / 100.0)), 1)
+    if canary > 0 and host_list:
+        waves.append(host_list[:canary])
+        host_list = host_list[canary:]
+    for index in range(0, len(host_list), wave_size):
+        waves.append(host_list[index:index + wave_size])
+    return waves
+
+
+def rollout_firmware(host_list, login_account, login_password, image_url, targets, protocol, canary=1, wave_percent=10,
+                     max_failures=0.0, workers=16, timeout=None, output=sys.stdout, version=None):
+    """Update firmware on many BMCs wave by wave, each update task is tracked until it finishes.
+    The rollout stops after the first wave whose failures exceed max_failures, a failed canary always stops it.
+    A wave ends only when every update call of it has returned, and a BMC whose task did not finish in time
+    is reported as unknown rather than failed, it stops the rollout since its flash may still be running.
+    :params host_list: BMC address list
+    :type host_list: list
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params image_url: firmware image url
+    :type image_url: string
+    :params targets: targets list
+    :type targets: list
+    :params protocol: update transfer protocol
+    :type protocol: string
+    :params canary: number of hosts updated first, on their own(0: no canary wave)
+    :type canary: int
+    :params wave_percent: percentage of all hosts updated in each following wave
+    :type wave_percent: float
+    :params max_failures: failures tolerated in one wave, a fraction of the wave when below 1 or else a host count
+    :type max_failures: float
+    :params workers: maximum number of BMCs updated at the same time within a wave
+    :type workers: int
+    :params timeout: seconds to wait for the update task of one BMC(None: lenovo_utils.TASK_WAIT_TIMEOUT)
+    :type timeout: None or float
+    :params output: JSON lines stream, one line per BMC and one per wave
+    :type output: file object
+    :params version: version the image carries, BMCs whose targets are already at it are not updated(None: always update)
+    :type version: None or string
+    :returns: returns rollout summary with per-wave results
+    """
+    waves = plan_waves(host_list, canary, wave_percent)
+    args = (login_account, login_password, image_url, targets, protocol, True, version, timeout)
+    summary = {'ret': True, 'succeeded': 0, 'failed': 0, 'unknown': 0, 'current': 0, 'skipped': 0, 'waves': []}
+    time_start = time.time()
+    for number, wave in enumerate(waves):
+        wave_start = time.time()
+        failed = []
+        unknown = []
+        current = 0
+        # The timeout is applied by update_fw to the update task, so no call is abandoned while its flash goes on
+        for ip, result, elapsed in utils.run_on_hosts(update_fw, wave, args, workers):
+            state = utils.get_result_state(result)
+            if state == 'failed':
+                failed.append(ip)
+            elif state == 'timed_out':
+                unknown.append(ip)
+            elif result.get('skipped'):
+                current += 1
+            output.write(json.dumps({'wave': number, 'host': ip, 'elapsed': round(elapsed, 3), 'result': result}, sort_keys=True, default=str) + '\n')
+            output.flush()
+        duration = time.time() - wave_start
+        wave_summary = {'wave': number, 'hosts': len(wave), 'succeeded': len(wave) - len(failed) - len(unknown), 'failed': len(failed),
+                        'unknown': len(unknown), 'current': current, 'duration': round(duration, 3),
+                        'hosts_per_minute': round(len(wave) * 60 / duration, 2) if duration else None}
+        summary['waves'].append(wave_summary)
+        summary['succeeded'] += wave_summary['succeeded']
+        summary['failed'] += len(failed)
+        summary['unknown'] += len(unknown)
+        summary['current'] += current
+        output.write(json.dumps({'wave_summary': wave_summary}, sort_keys=True) + '\n')
+        output.flush()
+        limit = max_failures * len(wave) if max_failures < 1 else max_failures
+        if (number == 0 and canary > 0 and failed) or len(failed) > limit:
+            summary['ret'] = False
+            summary['skipped'] = sum(len(rest) for rest in waves[number + 1:])
+            summary['msg'] = "Rollout stopped after wave %s, %s of %s hosts failed: %s" % (number, len(failed), len(wave), ', '.join(failed))
+            break
+        if unknown:
+            # The next wave must not start while flashes of this one may still be in flight
+            summary['ret'] = False
+            summary['skipped'] = sum(len(rest) for rest in waves[number + 1:])
+            summary['msg'] = "Rollout stopped after wave %s, the update of %s hosts did not finish in time, check them before resuming: %s" % (
+                number, len(unknown), ', '.join(unknown))
+            break
+    summary['duration'] = round(time.time() - time_start, 3)
+    if summary['failed'] or summary['unknown']:
+        summary['ret'] = False
+    return summary
+
+
+def plan_rollout(host_list, login_account, login_password, targets, version, workers=16, timeout=None, output=sys.stdout):
+    """Dry run of a rollout, report which BMCs would be updated without updating any
+    :params host_list: BMC address list
+    :type host_list: list
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params targets: targets list
+    :type targets: list
+    :params version: version the image carries
+    :type version: string
+    :params workers: maximum number of BMCs checked at the same time
+    :type workers: int
+    :params timeout: seconds to wait for one BMC(None: no limit)
+    :type timeout: None or float
+    :params output: JSON lines stream, one line per BMC
+    :type output: file object
+    :returns: returns summary of the BMCs to update, already current and failed to check
+    """
+    summary = {'ret': True, 'update': 0, 'current': 0, 'failed': 0}
+    args = (login_account, login_password, targets, version)
+    for ip, result, elapsed in utils.run_on_hosts(plan_fw_update, host_list, args, workers, timeout):
+        if not (isinstance(result, dict) and result.get('ret') is True):
+            summary['failed'] += 1
+        elif result['update']:
+            summary['update'] += 1
+        else:
+            summary['current'] += 1
+        output.write(json.dumps({'host': ip, 'elapsed': round(elapsed, 3), 'result': result}, sort_keys=True, default=str) + '\n')
+        output.flush()
+    summary['ret'] = summary['failed'] == 0
+    return summary
+
+
+import argparse
+def add_parameter():
+    """Add firmware rollout parameter"""
+    argget = utils.create_common_parameter_list()
+    # Flashing a component takes a while, give the update task of each BMC up to an hour
+    utils.add_fleet_parameter(argget, timeout=3600)
+    argget.add_argument('--imageurl', type=str, help='Input the update firmware image url, required unless --dryrun is used')
+    argget.add_argument('--targets', type=str, default='', help='Input the targets list, comma separated')
+    argget.add_argument('--protocol', type=str, help='Input the update firmware protocol, required unless --dryrun is used')
+    argget.add_argument('--canary', type=int, default=1, help='Number of BMCs updated first, the rollout stops if any of them fails, default is 1')
+    argget.add_argument('--wavepercent', type=float, default=10, help='Percentage of the BMCs updated in each wave after the canary, default is 10')
+    argget.add_argument('--maxfailures', type=float, default=0, help='Failures tolerated in one wave before the rollout stops, a fraction of the wave when below 1 or else a count, default is 0')
+    add_image_server_parameter(argget)
+    argget.add_argument('--version', type=str, help='Version the image carries, BMCs whose targets are already at this version are not updated')
+    argget.add_argument('--dryrun', action='store_true', help='Only report which BMCs would be updated, requires --version')
+    args = argget.parse_args()
+    parameter_info = utils.parse_parameter(args)
+    parameter_info['hosts'] = args.hosts
+    parameter_info['workers'] = args.workers
+    parameter_info['timeout'] = args.timeout
+    parameter_info['imageurl'] = args.imageurl
+    parameter_info['targets'] = [target.strip() for target in args.targets.split(',') if target.strip()]
+    parameter_info['protocol'] = args.protocol
+    parameter_info['canary'] = args.canary
+    parameter_info['wavepercent'] = args.wavepercent
+    parameter_info['maxfailures'] = args.maxfailures
+    parameter_info['version'] = args.version
+    parameter_info['dryrun'] = args.dryrun
+    for name in ['imagefile', 'serveport', 'serveaddress', 'serverate']:
+        parameter_info[name] = getattr(args, name)
+    return parameter_info
+
+
+if __name__ == '__main__':
+    # Get parameters from config.ini and/or command line
+    parameter_info = add_parameter()
+
+    # Get connection info from the parameters user specified
+    login_account = parameter_info["user"]
+    login_password = parameter_info["passwd"]
+    host_list = utils.read_host_list(parameter_info['hosts'])
+
+    # Report what would be updated when a dry run is asked for
+    if parameter_info['dryrun']:
+        if not parameter_info['version']:
+            sys.stderr.write("Please specify the image version with --version for a dry run")
+            sys.exit(1)
+        result = plan_rollout(host_list, login_account, login_password, parameter_info['targets'], parameter_info['version'],
+                              parameter_info['workers'], parameter_info['timeout'])
+        sys.stderr.write("%s to update, %s current, %s failed\n" % (result['update'], result['current'], result['failed']))
+        sys.exit(0 if result['ret'] else 1)
+
+    # Serve the local image file to all BMCs when one is given, the file is read once into the page cache
+    server_result = start_image_server(parameter_info, host_list[0]) if host_list else {'ret': True, 'server': None}
+    if server_result['ret'] is False:
+        sys.stderr.write(server_result['msg'])
+        sys.exit(1)
+
+    # Roll the image across all hosts and check result, the server is stopped however the rollout ends
+    try:
+        if not parameter_info['imageurl'] or not parameter_info['protocol']:
+            sys.stderr.write("Please run the command 'python %s -h' to view the help info" % sys.argv[0])
+            sys.exit(1)
+        result = rollout_firmware(host_list, login_account, login_password, parameter_info['imageurl'], parameter_info['targets'],
+                                  parameter_info['protocol'], parameter_info['canary'], parameter_info['wavepercent'],
+                                  parameter_info['maxfailures'], parameter_info['workers'], parameter_info['timeout'],
+                                  version=parameter_info['version'])
+    finally:
+        if server_result['server'] is not None:
+            server_result['server'].stop()
+    sys.stderr.write("%s succeeded(%s already current), %s failed, %s unknown, %s skipped in %.2fs\n" % (result['succeeded'], result['current'],
+                     result['failed'], result['unknown'], result['skipped'], result['duration']))
+    if result['ret'] is False:
+        if 'msg' in result:
+            sys.stderr.write(result['msg'] + '\n')
+        sys.exit(1)
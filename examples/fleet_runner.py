@@ -0,0 +1,156 @@
+###
+#
+# Lenovo Redfish examples - Run an example function against many BMCs
+#
+# Copyright Notice:
+#
+# Copyright 2018 Lenovo Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+###
+
+
+import sys
+import json
+import inspect
+import importlib
+import lenovo_utils as utils
+
+
+def get_entry_function(script, function_name):
+    """Get the entry function of an example script
+    :params script: example script name, such as get_fw_inventory
+    :type script: string
+    :params function_name: function name(None: the only function of the script taking ip as first parameter)
+    :type function_name: None or string
+    :returns: returns function when found or error message when failed
+    """
+    if script.endswith('.py'):
+        script = script[:-3]
+    try:
+        module = importlib.import_module(script)
+    except ImportError as e:
+        return {'ret': False, 'msg': "Failed to load script %s: %s" % (script, e)}
+    if function_name:
+        function = getattr(module, function_name, None)
+        if not callable(function):
+            return {'ret': False, 'msg': "Function %s is not found in %s" % (function_name, script)}
+        return {'ret': True, 'function': function}
+    candidates = []
+    for name, function in inspect.getmembers(module, inspect.isfunction):
+        if function.__module__ != module.__name__ or name.startswith('_'):
+            continue
+        if inspect.iscoroutinefunction(function):
+            continue
+        parameters = list(inspect.signature(function).parameters)
+        if parameters and parameters[0] == 'ip':
+            candidates.append(function)
+    if len(candidates) != 1:
+        return {'ret': False, 'msg': "Please specify the function of %s to run with --function" % script}
+    return {'ret': True, 'function': candidates[0]}
+
+
+def build_function_args(function, login_account, login_password, system_id, extra_args):
+    """Build the arguments following ip for an entry function
+    :params function: entry function
+    :type function: callable
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params system_id: ComputerSystem instance id(None: first instance, All: all instances)
+    :type system_id: None or string
+    :params extra_args: values for the remaining parameters, in order
+    :type extra_args: list
+    :returns: returns argument tuple
+    """
+    args = [login_account, login_password]
+    extra_args = list(extra_args)
+    for name in list(inspect.signature(function).parameters)[3:]:
+        if name == 'system_id':
+            args.append(system_id)
+        elif extra_args:
+            args.append(extra_args.pop(0))
+        else:
+            break
+    return tuple(args)
+
+
+def get_async_function(function):
+    """Get the asyncio variant of an entry function, such as get_cpu_info_async for get_cpu_info
+    :params function: entry function
+    :type function: callable
+    :returns: returns async function when found or error message when failed
+    """
+    module = sys.modules[function.__module__]
+    async_function = getattr(module, function.__name__ + '_async', None)
+    if async_function is None or not inspect.iscoroutinefunction(async_function):
+        return {'ret': False, 'msg': "Function %s has no asyncio variant" % function.__name__}
+    return {'ret': True, 'function': async_function}
+
+
+import argparse
+def add_parameter():
+    """Add fleet runner parameter"""
+    argget = utils.create_common_parameter_list()
+    utils.add_fleet_parameter(argget)
+    argget.add_argument('--script', type=str, required=True, help='Example script to run, such as get_fw_inventory')
+    argget.add_argument('--function', type=str, help='Function of the script to run, required when the script has more than one')
+    argget.add_argument('--args', type=str, nargs='*', default=[], help='Values for the function parameters following the BMC user password, in order')
+    argget.add_argument('--async', dest='use_async', action='store_true', help='Run the asyncio variant of the function(such as get_cpu_info_async), all BMCs share one event loop and --workers may be much larger')
+    argget.add_argument('--stats', action='store_true', help='Print session pool and response cache counters after the run')
+    args = argget.parse_args()
+    parameter_info = utils.parse_parameter(args)
+    parameter_info['hosts'] = args.hosts
+    parameter_info['workers'] = args.workers
+    parameter_info['timeout'] = args.timeout
+    parameter_info['script'] = args.script
+    parameter_info['function'] = args.function
+    parameter_info['args'] = args.args
+    parameter_info['use_async'] = args.use_async
+    parameter_info['stats'] = args.stats
+    return parameter_info
+
+
+if __name__ == '__main__':
+    # Get parameters from config.ini and/or command line
+    parameter_info = add_parameter()
+
+    # Get connection info from the parameters user specified
+    login_account = parameter_info["user"]
+    login_password = parameter_info["passwd"]
+    system_id = parameter_info['sysid']
+
+    # Get the function to run and the hosts to run it on
+    result = get_entry_function(parameter_info['script'], parameter_info['function'])
+    if result['ret'] is False:
+        sys.stderr.write(result['msg'])
+        sys.exit(1)
+    function = result['function']
+    if parameter_info['use_async']:
+        result = get_async_function(function)
+        if result['ret'] is False:
+            sys.stderr.write(result['msg'])
+            sys.exit(1)
+        function = result['function']
+    args = build_function_args(function, login_account, login_password, system_id, parameter_info['args'])
+    host_list = utils.read_host_list(parameter_info['hosts'])
+
+    # Run function on all hosts and check result
+    result = utils.run_fleet(host_list, function, args, parameter_info['workers'], parameter_info['timeout'])
+    sys.stderr.write("%s succeeded, %s failed, %s timed out\n" % (result['succeeded'], result['failed'], result['timed_out']))
+    if parameter_info['stats']:
+        sys.stderr.write("session pool: %s\n" % json.dumps(utils.get_session_pool_stats(), sort_keys=True))
+        sys.stderr.write("response cache: %s\n" % json.dumps(utils.get_response_cache_stats(), sort_keys=True))
+    if result['ret'] is False:
+        sys.exit(1)
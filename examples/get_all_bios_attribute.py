@@ -23,7 +23,6 @@
 
 import sys
 import json
-import redfish
 import lenovo_utils as utils
 
 
@@ -44,10 +43,7 @@ def get_bios_attribute(ip, login_account, login_password, system_id, bios_get):
         # Connect using the BMC address, account name, and password
         # Create a REDFISH object
         login_host = "https://" + ip
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                             password=login_password, default_prefix='/redfish/v1')
-        # Login into the server and create a session
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
         return result
@@ -0,0 +1,133 @@
+###
+#
+# Lenovo Redfish examples - Get the system, cpu, storage, nic, psu, BMC and firmware inventory at once
+#
+# Copyright Notice:
+#
+# Copyright 2018 Lenovo Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+###
+
+
+import sys
+import json
+import lenovo_utils as utils
+from get_system_inventory import get_system_info
+from get_cpu_inventory import get_cpu_info
+from get_storage_inventory import get_storage_info
+from get_nic_inventory import get_network_info
+from get_psu_inventory import get_psu_info
+from get_bmc_inventory import get_bmc_info
+from get_fw_inventory import get_fw_inventory
+
+
+# Section name: (inventory function, whether it takes system_id, key of the entries in its result)
+INVENTORY_SECTIONS = {
+    'system': (get_system_info, True, 'entries'),
+    'cpu': (get_cpu_info, True, 'entries'),
+    'storage': (get_storage_info, True, 'entries'),
+    'nic': (get_network_info, True, 'entries'),
+    'psu': (get_psu_info, True, 'entry_details'),
+    'bmc': (get_bmc_info, True, 'entries'),
+    'fw': (get_fw_inventory, False, 'fw_version_detail'),
+}
+
+
+def get_all_inventory(ip, login_account, login_password, system_id, sections=None):
+    """Get the inventory of several sections with one session, fetching shared resources once
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params system_id: ComputerSystem instance id(None: first instance, All: all instances)
+    :type system_id: None or string
+    :params sections: sections to collect, names of INVENTORY_SECTIONS(None: all sections)
+    :type sections: None or list
+    :returns: returns inventory of each section when succeeded or error message when failed
+    """
+    result = {}
+    login_host = "https://" + ip
+    try:
+        # Login once, every section reuses this pooled session
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
+    except:
+        result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
+        return result
+
+    if sections is None:
+        sections = list(INVENTORY_SECTIONS)
+    inventory = {}
+    errors = {}
+    try:
+        # ComputerSystem, Chassis and Managers are read by several sections, fetch them once
+        with utils.memoize_gets(REDFISH_OBJ):
+            for section in sections:
+                function, takes_system_id, entries_key = INVENTORY_SECTIONS[section]
+                if takes_system_id:
+                    section_result = function(ip, login_account, login_password, system_id)
+                else:
+                    section_result = function(ip, login_account, login_password)
+                if section_result['ret'] is True:
+                    inventory[section] = section_result[entries_key]
+                else:
+                    errors[section] = section_result['msg']
+    except Exception as e:
+        result = {'ret': False, 'msg': "error_message: %s" % (e)}
+        return result
+    finally:
+        REDFISH_OBJ.logout()
+
+    if sections and not inventory:
+        result = {'ret': False, 'msg': "\n".join("%s: %s" % (section, errors[section]) for section in errors)}
+        return result
+    result['ret'] = True
+    result['entries'] = inventory
+    if errors:
+        result['errors'] = errors
+    return result
+
+
+import argparse
+def add_parameter():
+    """Add get all inventory parameter"""
+    argget = utils.create_common_parameter_list()
+    argget.add_argument('--sections', type=str, nargs='*', choices=list(INVENTORY_SECTIONS), default=list(INVENTORY_SECTIONS),
+                        help='Inventory sections to collect, default is all sections')
+    args = argget.parse_args()
+    parameter_info = utils.parse_parameter(args)
+    parameter_info['sections'] = args.sections
+    return parameter_info
+
+
+if __name__ == '__main__':
+    # Get parameters from config.ini and/or command line
+    parameter_info = add_parameter()
+
+    # Get connection info from the parameters user specified
+    ip = parameter_info['ip']
+    login_account = parameter_info["user"]
+    login_password = parameter_info["passwd"]
+    system_id = parameter_info['sysid']
+
+    # Get all inventory and check result
+    result = get_all_inventory(ip, login_account, login_password, system_id, parameter_info['sections'])
+    if result['ret'] is True:
+        del result['ret']
+        if 'errors' in result:
+            sys.stderr.write(json.dumps(result['errors'], sort_keys=True, indent=2))
+        sys.stdout.write(json.dumps(result['entries'], sort_keys=True, indent=2))
+    else:
+        sys.stderr.write(result['msg'])
@@ -23,11 +23,10 @@
 
 import sys
 import json
-import redfish
 import lenovo_utils as utils
 
 
-def get_bios_attribute_metadata(ip, login_account, login_password, system_id):
+def get_bios_attribute_metadata(ip, login_account, login_password, system_id, attribute_name=None):
     """Get bios attribute metadata    
     :params ip: BMC IP address
     :type ip: string
@@ -37,6 +36,8 @@ def get_bios_attribute_metadata(ip, login_account, login_password, system_id):
     :type login_password: string
     :params system_id: ComputerSystem instance id(None: first instance, All: all instances)
     :type system_id: None or string
+    :params attribute_name: attribute whose registry definition is returned too(None: none)
+    :type attribute_name: None or string
     :returns: returns bios attribute metadata when succeeded or error message when failed
     """
     result = {}
@@ -44,10 +45,7 @@ def get_bios_attribute_metadata(ip, login_account, login_password, system_id):
     try:
         # Connect using the BMC address, account name, and password
         # Create a REDFISH object
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                             password=login_password, default_prefix='/redfish/v1')
-        # Login into the server and create a session
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
         return result
@@ -72,6 +70,18 @@ def get_bios_attribute_metadata(ip, login_account, login_password, system_id):
         if response_bios_url.status == 200:
             metadata_url = response_bios_url.dict['@odata.context']
             result = {'ret': True, 'msg': "Metadata_url %s" % metadata_url}
+            # Add the attribute definitions from the registry, downloaded once per model and BIOS version
+            registry_result = utils.get_bios_registry(REDFISH_OBJ, system_url)
+            if registry_result['ret'] is True and registry_result['registry'] is not None:
+                registry = registry_result['registry']
+                if attribute_name:
+                    if attribute_name not in registry:
+                        result = {'ret': False, 'msg': "%s is not a Bios attribute" % attribute_name}
+                        REDFISH_OBJ.logout()
+                        return result
+                    result['attribute'] = {attribute_name: registry[attribute_name]}
+                result['registry'] = registry['@Registry']
+                result['attribute_count'] = len(registry) - 1
         elif response_bios_url.status_code == 400:
             result = {'ret': False, 'msg': 'Not supported on this platform'}
         else:
@@ -89,6 +99,7 @@ def get_bios_attribute_metadata(ip, login_account, login_password, system_id):
 if __name__ == '__main__':
     # Get parameters from config.ini and/or command line
     argget = utils.create_common_parameter_list()
+    argget.add_argument('--name', type=str, help='Attribute name whose definition is read from the BIOS attribute registry')
     args = argget.parse_args()
     parameter_info = utils.parse_parameter(args)
     
@@ -99,9 +110,9 @@ if __name__ == '__main__':
     system_id = parameter_info['sysid']
     
     # Get bios attribute metadata and check result
-    result = get_bios_attribute_metadata(ip, login_account, login_password, system_id)
+    result = get_bios_attribute_metadata(ip, login_account, login_password, system_id, args.name)
     if result['ret'] is True:
         del result['ret']
-        sys.stdout.write(json.dumps(result['msg'], sort_keys=True, indent=2))
+        sys.stdout.write(json.dumps(result, sort_keys=True, indent=2))
     else:
         sys.stderr.write(result['msg'])
@@ -23,10 +23,14 @@
 
 import sys
 import json
-import redfish
 import lenovo_utils as utils
 
 
+# Processor properties read by get_cpu_entry
+CPU_PROPERTIES = ['Name', 'ProcessorType', 'InstructionSet', 'Manufacturer', 'Model', 'MaxSpeedMHz', 'Socket',
+                  'TotalCores', 'TotalThreads', 'Status']
+
+
 def get_cpu_info(ip, login_account, login_password, system_id):
     """Get cpu inventory    
     :params ip: BMC IP address
@@ -44,10 +48,7 @@ def get_cpu_info(ip, login_account, login_password, system_id):
     try:
         # Connect using the BMC address, account name, and password
         # Create a REDFISH object
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                             password=login_password, default_prefix='/redfish/v1')
-        # Login into the server and create a session
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
         return result
@@ -69,55 +70,20 @@ def get_cpu_info(ip, login_account, login_password, system_id):
             result = {'ret': False, 'msg': "response_system_url Error code %s" % response_system_url.status}
             REDFISH_OBJ.logout()
             return result
-        response_processors_url = REDFISH_OBJ.get(processors_url, None)
+        response_processors_url = utils.get_collection(REDFISH_OBJ, processors_url)
 
         if response_processors_url.status == 200:
             # Get Members url
-            members_count = response_processors_url.dict['Members@odata.count']
+            members = response_processors_url.dict['Members']
         else:
             result = {'ret': False, 'msg': "response_processors_url Error code %s" % response_processors_url.status}
             REDFISH_OBJ.logout()
             return result
 
-        for i in range(members_count):
-            cpu = {}
-            # Get members url resource
-            members_url = response_processors_url.dict['Members'][i]['@odata.id']
-            response_members_url = REDFISH_OBJ.get(members_url, None)
+        # Get members url resource, several at a time
+        for response_members_url in utils.get_members(REDFISH_OBJ, members, select=CPU_PROPERTIES):
             if response_members_url.status == 200:
-                name = response_members_url.dict['Name']
-                odata_id = response_members_url.dict["@odata.id"]
-                total_threads = response_members_url.dict["TotalThreads"]
-                instructionsset = response_members_url.dict['InstructionSet']
-                if "State" in response_members_url.dict:
-                    status_state = response_members_url.dict['Status']['State']
-                else:
-                    status_state = ""
-                if "Health" in response_members_url.dict:
-                    status_Health = response_members_url.dict['Status']['Health']
-                else:
-                    status_Health = ""
-                processor_type = response_members_url.dict['ProcessorType']
-                total_cores = response_members_url.dict['TotalCores']
-                odata_type = response_members_url.dict['@odata.type']
-                id = response_members_url.dict['Id']
-                manufacturer = response_members_url.dict['Manufacturer']
-                max_speedMHz = response_members_url.dict['MaxSpeedMHz']
-                model = response_members_url.dict['Model']
-                socket = response_members_url.dict['Socket']
-
-                cpu['Name'] = name
-                cpu['ProcessorType'] = processor_type
-                cpu['InstructionSet'] = instructionsset
-                cpu['Manufacturer'] = manufacturer
-                cpu['Model'] = model
-                cpu['MaxSpeedMHz'] = max_speedMHz
-                cpu['Socket'] = socket
-                cpu['TotalCores'] = total_cores
-                cpu['TotalThreads'] = total_threads
-                cpu['State'] = status_state
-                cpu['Health'] = status_Health
-                cpu_details.append(cpu)
+                cpu_details.append(get_cpu_entry(response_members_url.dict))
             else:
                 result = {'ret': False, 'msg': "response_members_url Error code %s" % response_members_url.status}
 
@@ -128,6 +94,90 @@ def get_cpu_info(ip, login_account, login_password, system_id):
     return result
 
 
+def get_cpu_entry(processor):
+    """Get cpu inventory entry from a Processor resource
+    :params processor: Processor resource
+    :type processor: dict
+    :returns: returns cpu inventory entry
+    """
+    cpu = {}
+    if "State" in processor.get('Status', {}):
+        status_state = processor['Status']['State']
+    else:
+        status_state = ""
+    if "Health" in processor.get('Status', {}):
+        status_Health = processor['Status']['Health']
+    else:
+        status_Health = ""
+    cpu['Name'] = processor['Name']
+    cpu['ProcessorType'] = processor['ProcessorType']
+    cpu['InstructionSet'] = processor['InstructionSet']
+    cpu['Manufacturer'] = processor['Manufacturer']
+    cpu['Model'] = processor['Model']
+    cpu['MaxSpeedMHz'] = processor['MaxSpeedMHz']
+    cpu['Socket'] = processor['Socket']
+    cpu['TotalCores'] = processor['TotalCores']
+    cpu['TotalThreads'] = processor['TotalThreads']
+    cpu['State'] = status_state
+    cpu['Health'] = status_Health
+    return cpu
+
+
+async def get_cpu_info_async(ip, login_account, login_password, system_id):
+    """Get cpu inventory with the asyncio transport, all processors are fetched at once
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params system_id: ComputerSystem instance id(None: first instance, All: all instances)
+    :type system_id: None or string
+    :returns: returns cpu inventory when succeeded or error message when failed
+    """
+    result = {}
+    login_host = "https://" + ip
+    REDFISH_OBJ = utils.AsyncRedfishClient(login_host, login_account, login_password)
+    try:
+        await REDFISH_OBJ.login()
+    except Exception as e:
+        result = {'ret': False, 'msg': "Please check the username, password, IP is correct\nerror_message: %s" % (e)}
+        return result
+
+    cpu_details = []
+    try:
+        # GET the ComputerSystem resource
+        system = await utils.get_system_url_async("/redfish/v1", system_id, REDFISH_OBJ)
+        if not system:
+            result = {'ret': False, 'msg': "This system id is not exist or system member is None"}
+            return result
+        for system_url in system:
+            response_system_url = await REDFISH_OBJ.get(system_url, None)
+            if response_system_url.status == 200:
+                # Get the ComputerProcessors resource
+                processors_url = response_system_url.dict['Processors']['@odata.id']
+            else:
+                result = {'ret': False, 'msg': "response_system_url Error code %s" % response_system_url.status}
+                return result
+            response_processors_url = await REDFISH_OBJ.get(processors_url, None)
+            if response_processors_url.status != 200:
+                result = {'ret': False, 'msg': "response_processors_url Error code %s" % response_processors_url.status}
+                return result
+            # Get all members url resource at once
+            for response_members_url in await utils.get_members_async(REDFISH_OBJ, response_processors_url.dict['Members']):
+                if response_members_url.status == 200:
+                    cpu_details.append(get_cpu_entry(response_members_url.dict))
+                else:
+                    result = {'ret': False, 'msg': "response_members_url Error code %s" % response_members_url.status}
+                    return result
+        result['ret'] = True
+        result['entries'] = cpu_details
+        return result
+    finally:
+        # Logout of the current session
+        await REDFISH_OBJ.logout()
+
+
 if __name__ == '__main__':
     # Get parameters from config.ini and/or command line
     argget = utils.create_common_parameter_list()
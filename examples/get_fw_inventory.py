@@ -21,10 +21,21 @@
 
 
 import sys
-import redfish
+import time
 import json
+import threading
 import lenovo_utils as utils
 
+# SoftwareInventory properties read by get_fw_entry
+FW_PROPERTIES = ['Version', 'SoftwareId', 'Description', 'Status']
+
+# Seconds a firmware inventory read by get_cached_fw_inventory is reused
+FW_INVENTORY_CACHE_TTL = 300
+
+_fw_inventory_cache = {}
+_fw_inventory_cache_lock = threading.Lock()
+
+
 def get_fw_inventory(ip, login_account, login_password):
     """Get BMC inventory    
     :params ip: BMC IP address
@@ -40,17 +51,14 @@ def get_fw_inventory(ip, login_account, login_password):
         # Connect using the BMC address, account name, and password
         # Create a REDFISH object
         login_host = "https://" + ip
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                             password=login_password, default_prefix='/redfish/v1')
-        # Login into the server and create a session
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct\n"}
         return result
 
     fw_version = []
     # Get ServiceRoot resource
-    response_base_url = REDFISH_OBJ.get('/redfish/v1', None)
+    response_base_url = utils.get_navigation(REDFISH_OBJ, '/redfish/v1')
     # Get response_update_service_url
     if response_base_url.status == 200:
         update_service_url = response_base_url.dict['UpdateService']['@odata.id']
@@ -62,27 +70,15 @@ def get_fw_inventory(ip, login_account, login_password):
     response_update_service_url = REDFISH_OBJ.get(update_service_url, None)
     if response_update_service_url.status == 200:
         firmware_inventory_url = response_update_service_url.dict['FirmwareInventory']['@odata.id']
-        response_firmware_url = REDFISH_OBJ.get(firmware_inventory_url, None)
+        response_firmware_url = utils.get_collection(REDFISH_OBJ, firmware_inventory_url)
         if response_firmware_url.status == 200:
-            for firmware_url in response_firmware_url.dict["Members"]:
-                firmware_version_url = firmware_url['@odata.id']
-                firmware_list = firmware_version_url.split("/")
-                response_firmware_version = REDFISH_OBJ.get(firmware_version_url, None)
+            members = response_firmware_url.dict["Members"]
+            # Get the firmware entries, several at a time
+            responses = utils.get_members(REDFISH_OBJ, members, select=FW_PROPERTIES)
+            for firmware_url, response_firmware_version in zip(members, responses):
+                firmware_list = firmware_url['@odata.id'].split("/")
                 if response_firmware_version.status == 200:
-                    fw = {}
-                    Version = response_firmware_version.dict['Version']
-                    if "SoftwareId" in response_firmware_version.dict:
-                        SoftwareId = response_firmware_version.dict['SoftwareId']
-                    else:
-                        SoftwareId = ""
-                    Description = response_firmware_version.dict['Description']
-                    State = response_firmware_version.dict['Status']['State']
-                    fw['Version'] = Version
-                    fw['SoftwareId'] = SoftwareId
-                    fw['Description'] = Description
-                    fw['State'] = State
-                    fw = {firmware_list[-1]: fw}
-                    fw_version.append(fw)
+                    fw_version.append(get_fw_entry(response_firmware_version.dict, firmware_list[-1]))
                 else:
                     result = {'ret': False,
                               'msg': "response firmware version Error code %s" % response_firmware_version.status}
@@ -104,6 +100,120 @@ def get_fw_inventory(ip, login_account, login_password):
     return result
 
 
+def get_fw_entry(firmware, firmware_id):
+    """Get firmware inventory entry from a SoftwareInventory resource
+    :params firmware: SoftwareInventory resource
+    :type firmware: dict
+    :params firmware_id: last segment of the SoftwareInventory URL
+    :type firmware_id: string
+    :returns: returns firmware inventory entry
+    """
+    fw = {}
+    if "SoftwareId" in firmware:
+        SoftwareId = firmware['SoftwareId']
+    else:
+        SoftwareId = ""
+    fw['Version'] = firmware['Version']
+    fw['SoftwareId'] = SoftwareId
+    fw['Description'] = firmware['Description']
+    fw['State'] = firmware['Status']['State']
+    return {firmware_id: fw}
+
+
+def get_cached_fw_inventory(ip, login_account, login_password, max_age=None):
+    """Get firmware inventory, reusing the one read from the same BMC as the same user within max_age seconds
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params max_age: seconds a cached inventory is reused(None: FW_INVENTORY_CACHE_TTL)
+    :type max_age: None or float
+    :returns: returns firmware inventory when succeeded or error message when failed
+    """
+    if max_age is None:
+        max_age = FW_INVENTORY_CACHE_TTL
+    with _fw_inventory_cache_lock:
+        # Cached per user, another account may not be allowed to read the same inventory
+        cached = _fw_inventory_cache.get((ip, login_account))
+    if cached is not None and time.time() - cached[0] < max_age:
+        return cached[1]
+    result = get_fw_inventory(ip, login_account, login_password)
+    if result['ret'] is True:
+        with _fw_inventory_cache_lock:
+            _fw_inventory_cache[(ip, login_account)] = (time.time(), result)
+    return result
+
+
+def invalidate_fw_inventory_cache(ip=None):
+    """Drop cached firmware inventory, call it once firmware of the BMC changed
+    :params ip: BMC IP address(None: all BMCs)
+    :type ip: None or string
+    """
+    with _fw_inventory_cache_lock:
+        if ip is None:
+            _fw_inventory_cache.clear()
+        else:
+            for key in [key for key in _fw_inventory_cache if key[0] == ip]:
+                del _fw_inventory_cache[key]
+
+
+async def get_fw_inventory_async(ip, login_account, login_password):
+    """Get firmware inventory with the asyncio transport, all firmware entries are fetched at once
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :returns: returns firmware inventory when succeeded or error message when failed
+    """
+    result = {}
+    login_host = "https://" + ip
+    REDFISH_OBJ = utils.AsyncRedfishClient(login_host, login_account, login_password)
+    try:
+        await REDFISH_OBJ.login()
+    except Exception as e:
+        result = {'ret': False, 'msg': "Please check the username, password, IP is correct\nerror_message: %s" % (e)}
+        return result
+
+    fw_version = []
+    try:
+        # Get ServiceRoot resource
+        response_base_url = await REDFISH_OBJ.get('/redfish/v1', None)
+        if response_base_url.status == 200:
+            update_service_url = response_base_url.dict['UpdateService']['@odata.id']
+        else:
+            result = {'ret': False, 'msg': "response base url Error code %s" % response_base_url.status}
+            return result
+        response_update_service_url = await REDFISH_OBJ.get(update_service_url, None)
+        if response_update_service_url.status == 200:
+            firmware_inventory_url = response_update_service_url.dict['FirmwareInventory']['@odata.id']
+        else:
+            result = {'ret': False, 'msg': "response update service_url Error code %s" % response_update_service_url.status}
+            return result
+        response_firmware_url = await REDFISH_OBJ.get(firmware_inventory_url, None)
+        if response_firmware_url.status != 200:
+            result = {'ret': False, 'msg': "response firmware url Error code %s" % response_firmware_url.status}
+            return result
+        members = response_firmware_url.dict["Members"]
+        responses = await utils.get_members_async(REDFISH_OBJ, members)
+        for firmware_url, response_firmware_version in zip(members, responses):
+            if response_firmware_version.status == 200:
+                firmware_id = firmware_url['@odata.id'].split("/")[-1]
+                fw_version.append(get_fw_entry(response_firmware_version.dict, firmware_id))
+            else:
+                result = {'ret': False,
+                          'msg': "response firmware version Error code %s" % response_firmware_version.status}
+                return result
+        result['ret'] = True
+        result['fw_version_detail'] = fw_version
+        return result
+    finally:
+        await REDFISH_OBJ.logout()
+
+
 if __name__ == '__main__':
     # Get parameters from config.ini and/or command line
     argget = utils.create_common_parameter_list()
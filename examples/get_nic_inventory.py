@@ -22,7 +22,6 @@
 
 import sys
 import json
-import redfish
 import lenovo_utils as utils
 
 
@@ -43,22 +42,19 @@ def get_network_info(ip, login_account, login_password, system_id):
     try:
         # Connect using the BMC address, account name, and password
         # Create a REDFISH object
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                             password=login_password, default_prefix='/redfish/v1')
-        # Login into the server and create a session
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
         return result
     # Get ServiceRoot resource
-    response_base_url = REDFISH_OBJ.get("/redfish/v1", None)
+    response_base_url = utils.get_navigation(REDFISH_OBJ, "/redfish/v1")
     if response_base_url.status == 200:
         chassis_url_list = response_base_url.dict['Chassis']['@odata.id']
     else:
         result = {'ret': False, 'msg': "response base url Error code %s" % response_base_url.status}
         REDFISH_OBJ.logout()
         return result
-    response_chassis_url_list = REDFISH_OBJ.get(chassis_url_list, None)
+    response_chassis_url_list = utils.get_navigation(REDFISH_OBJ, chassis_url_list)
     if response_chassis_url_list.status == 200:
         chassis_count = response_chassis_url_list.dict['Members@odata.count']
     else:
@@ -92,7 +88,7 @@ def get_network_info(ip, login_account, login_password, system_id):
                         REDFISH_OBJ.logout()
                         return result
 
-            response_nic_adapter_url = REDFISH_OBJ.get(nic_adapter_url, None)
+            response_nic_adapter_url = utils.get_collection(REDFISH_OBJ, nic_adapter_url)
             if response_nic_adapter_url.status == 200:
                 nic_adapter_count = response_nic_adapter_url.dict["Members@odata.count"]
             else:
@@ -100,12 +96,10 @@ def get_network_info(ip, login_account, login_password, system_id):
                           'msg': "response nic adapter url Error code %s" % response_nic_adapter_url.status}
                 REDFISH_OBJ.logout()
                 return result
-            nic = 0
-            for nic in range(0, nic_adapter_count):
+            # Get the NetworkAdapter resources, several at a time
+            for response_nic_adapter_x_url in utils.get_members(REDFISH_OBJ, response_nic_adapter_url.dict["Members"]):
                 network = {}
                 nic_devices = []
-                nic_adapter_x_url = response_nic_adapter_url.dict["Members"][nic]["@odata.id"]
-                response_nic_adapter_x_url = REDFISH_OBJ.get(nic_adapter_x_url, None)
                 if response_nic_adapter_x_url.status == 200:
                     Network_Adapter_id = response_nic_adapter_x_url.dict["Id"]
                     Name = response_nic_adapter_x_url.dict["Name"]
@@ -142,17 +136,16 @@ def get_network_info(ip, login_account, login_password, system_id):
                 port = 0
                 # GET the NetworkDeviceFunction resources from each of the NetworkAdapter resources
                 nic_dev_url = response_nic_adapter_x_url.dict["NetworkDeviceFunctions"]["@odata.id"]
-                response_nic_dev_url = REDFISH_OBJ.get(nic_dev_url, None)
+                response_nic_dev_url = utils.get_collection(REDFISH_OBJ, nic_dev_url)
                 if response_nic_dev_url.status == 200:
                     nic_dev_count = response_nic_dev_url.dict["Members@odata.count"]
                 else:
                     result = {'ret': False, 'msg': "response nic dev url Error code %s" % response_nic_dev_url.status}
                     REDFISH_OBJ.logout()
                     return result
-                for dev in range(0, nic_dev_count):
+                # Get the NetworkDeviceFunction resources, several at a time
+                for response_nic_dev_x_url in utils.get_members(REDFISH_OBJ, response_nic_dev_url.dict["Members"]):
                     NIC_Devices = {}
-                    nic_dev_x_url = response_nic_dev_url.dict["Members"][dev]["@odata.id"]
-                    response_nic_dev_x_url = REDFISH_OBJ.get(nic_dev_x_url, None)
                     if response_nic_dev_x_url.status == 200:
                         NIC_Device_ID = response_nic_dev_x_url.dict["Id"]
                         Name = response_nic_dev_x_url.dict["Name"]
@@ -22,11 +22,10 @@
 
 import sys
 import json
-import redfish
 import lenovo_utils as utils
 
 
-def get_storage_info(ip, login_account, login_passwprd, system_id):
+def get_storage_info(ip, login_account, login_password, system_id):
     """Get storage inventory    
     :params ip: BMC IP address
     :type ip: string
@@ -43,10 +42,7 @@ def get_storage_info(ip, login_account, login_passwprd, system_id):
     try:
         # Connect using the BMC address, account name, and password
         # Create a REDFISH object
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                             password=login_password, default_prefix='/redfish/v1')
-        # Login into the server and create a session
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
         return result
@@ -66,13 +62,10 @@ def get_storage_info(ip, login_account, login_passwprd, system_id):
                 storage_url = response_system_url.dict["Storage"]["@odata.id"]
             else:
                 storage_url = response_system_url.dict["SimpleStorage"]["@odata.id"]
-            response_storage_url = REDFISH_OBJ.get(storage_url, None)
+            response_storage_url = utils.get_collection(REDFISH_OBJ, storage_url)
             if response_storage_url.status == 200:
-                storage_count = response_storage_url.dict["Members@odata.count"]
-                storage = 0
-                for nic in range(0, storage_count):
-                    storage_x_url = response_storage_url.dict["Members"][nic]["@odata.id"]
-                    response_storage_x_url = REDFISH_OBJ.get(storage_x_url, None)
+                # Get the Storage instances, several at a time
+                for response_storage_x_url in utils.get_members(REDFISH_OBJ, response_storage_url.dict["Members"]):
                     if response_storage_x_url.status == 200:
                         storage = {}
                         Storage_id = response_storage_x_url.dict["Id"]
@@ -20,13 +20,19 @@
 ###
 
 
+import os
 import sys
-import redfish
 import json
+import datetime
+import threading
 import lenovo_utils as utils
 
 
-def get_system_log(ip, login_account, login_password, system_id):
+# Page size requested from the LogServices Entries collections
+LOG_PAGE_SIZE = 100
+
+
+def get_system_log(ip, login_account, login_password, system_id, stream=None, state_file=None):
     """Get system log    
     :params ip: BMC IP address
     :type ip: string
@@ -36,99 +42,248 @@ def get_system_log(ip, login_account, login_password, system_id):
     :type login_password: string
     :params system_id: ComputerSystem instance id(None: first instance, All: all instances)
     :type system_id: None or string
-    :returns: returns system log when succeeded or error message when failed
+    :params stream: file to write entries to as JSON lines while they are read(None: return all entries)
+    :type stream: None or file object
+    :params state_file: file keeping the last seen entry of each log service per BMC, only newer entries are read(None: read all entries)
+    :type state_file: None or string
+    :returns: returns system log(or entry count when streaming) when succeeded or error message when failed
     """
     result = {}
     login_host = 'https://' + ip
     try:
         # Connect using the BMC address, account name, and password
         # Create a REDFISH object
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                             password=login_password, default_prefix='/redfish/v1')
-        # Login into the server and create a session
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
         return result
 
+    log_details = []
+    count = 0
+    cursors = None
+    try:
+        if state_file:
+            cursors = load_log_cursors(state_file, ip)
+        for entry in iter_log_entries(REDFISH_OBJ, cursors):
+            if stream is None:
+                log_details.append(entry)
+            else:
+                stream.write(json.dumps(entry, sort_keys=True) + '\n')
+            count += 1
+        if state_file:
+            # Remember the position only once every new entry was handed out
+            save_log_cursors(state_file, ip, cursors)
+    except Exception as e:
+        result = {'ret': False, 'msg': "error_message: %s" % (e)}
+        return result
+    finally:
+        # Logout of the current session
+        REDFISH_OBJ.logout()
+
+    result['ret'] = True
+    if stream is None:
+        result['entries'] = log_details
+    else:
+        result['count'] = count
+    return result
+
+
+def iter_log_entries(REDFISH_OBJ, cursors=None):
+    """Yield the entries of every manager log service, following the pages of each Entries collection
+    :params REDFISH_OBJ: logged-in redfish client
+    :type REDFISH_OBJ: redfish client object
+    :params cursors: last seen entry per Entries URL, only newer entries are yielded and cursors is updated(None: all entries)
+    :type cursors: None or dict
+    :returns: yields log entries, raises an exception when a resource can not be read
+    """
     # Get response_base_url resource
-    response_base_url = REDFISH_OBJ.get('/redfish/v1', None)
+    response_base_url = utils.get_navigation(REDFISH_OBJ, '/redfish/v1')
     if response_base_url.status == 200:
         managers_url = response_base_url.dict['Managers']['@odata.id']
     else:
-        result = {'ret': False, 'msg': "response base url Error code %s" % response_base_url.status}
-        REDFISH_OBJ.logout()
-        return result
+        raise Exception("response base url Error code %s" % response_base_url.status)
     # Get Managers url resource
-    response_managers_url = REDFISH_OBJ.get(managers_url, None)
-    if response_managers_url.status == 200:
-        manager_count = response_managers_url.dict['Members@odata.count']
-    else:
-        result = {'ret': False, 'msg': "response managers url Error code %s" % response_managers_url.status}
-        REDFISH_OBJ.logout()
-        return result
-    for i in range(manager_count):
-        manager_x_url = response_managers_url.dict['Members'][i]['@odata.id']
-        response_manager_x_url = REDFISH_OBJ.get(manager_x_url, None)
+    response_managers_url = utils.get_navigation(REDFISH_OBJ, managers_url)
+    if response_managers_url.status != 200:
+        raise Exception("response managers url Error code %s" % response_managers_url.status)
+    for manager in response_managers_url.dict['Members']:
+        response_manager_x_url = utils.get_navigation(REDFISH_OBJ, manager['@odata.id'])
         if response_manager_x_url.status == 200:
             log_services_url = response_manager_x_url.dict['LogServices']['@odata.id']
         else:
-            result = {'ret': False, 'msg': "response managers url Error code %s" % response_manager_x_url.status}
-            REDFISH_OBJ.logout()
-            return result
-        response_log_services_url = REDFISH_OBJ.get(log_services_url, None)
+            raise Exception("response managers url Error code %s" % response_manager_x_url.status)
+        response_log_services_url = utils.get_collection(REDFISH_OBJ, log_services_url)
         if response_log_services_url.status == 200:
             # Get the log url collection
             members = response_log_services_url.dict['Members']
         else:
-            result = {'ret': False, 'msg': "response_log_services_url Error code %s" % response_log_services_url.status}
-            REDFISH_OBJ.logout()
-            return result
-        log_details = []
-        for member in members:
-            log_url = member['@odata.id']
-            # Get the log url resource
-            response_log_url = REDFISH_OBJ.get(log_url, None)
-            if response_log_url.status == 200:
-                entries_url = response_log_url.dict['Entries']['@odata.id']
-                response_entries_url = REDFISH_OBJ.get(entries_url, None)
-                if response_entries_url.status == 200:
-                    # description = response_entries_url.dict['Description']
-                    for logEntry in response_entries_url.dict['Members']:
-                        entry = {}
-                        name = logEntry['Name']
-                        if 'Created' in logEntry:
-                            created = logEntry['Created']
-                        else:
-                            created = ""
-                        message = logEntry['Message']
-                        severity = logEntry['Severity']
-
-                        entry['Name'] = name
-                        entry['Message'] = message
-                        entry['Created'] = created
-                        entry['Severity'] = severity
-                        log_details.append(entry)
-                else:
-                    result = {'ret': False, 'msg': "response members url Error code %s" % response_entries_url.status}
-                    REDFISH_OBJ.logout()
-                    return result
-                
+            raise Exception("response_log_services_url Error code %s" % response_log_services_url.status)
+        # Get the log url resources, several at a time
+        for response_log_url in utils.get_members(REDFISH_OBJ, members, select=['Entries']):
+            if response_log_url.status != 200:
+                raise Exception("response members url Error code %s" % response_log_url.status)
+            entries_url = response_log_url.dict['Entries']['@odata.id']
+            # Read the entries page by page
+            if cursors is None:
+                log_entries = utils.iter_members(REDFISH_OBJ, entries_url, LOG_PAGE_SIZE)
             else:
-                result = {'ret': False, 'msg': "response members url Error code %s" % response_log_url.status}
-                REDFISH_OBJ.logout()
-                return result
-                
-    result['ret'] = True            
-    result['entries'] = log_details
-    # Logout of the current session
-    REDFISH_OBJ.logout()
-    return result
+                log_entries = iter_new_log_entries(REDFISH_OBJ, entries_url, cursors)
+            for logEntry in log_entries:
+                entry = {}
+                if 'Created' in logEntry:
+                    created = logEntry['Created']
+                else:
+                    created = ""
+                entry['Name'] = logEntry['Name']
+                entry['Message'] = logEntry['Message']
+                entry['Created'] = created
+                entry['Severity'] = logEntry['Severity']
+                yield entry
+
+
+def iter_new_log_entries(REDFISH_OBJ, entries_url, cursors):
+    """Yield the entries of one log service newer than its cursor, then move the cursor past them.
+    The service filters by Created with $filter or skips the known entries with $skip where supported,
+    the entries are also checked against the cursor here so services ignoring the query still give only the delta.
+    :params REDFISH_OBJ: logged-in redfish client
+    :type REDFISH_OBJ: redfish client object
+    :params entries_url: URL of the LogEntry collection
+    :type entries_url: string
+    :params cursors: last seen entry per Entries URL
+    :type cursors: dict
+    :returns: yields log entries
+    """
+    cursor = cursors.get(entries_url)
+    features = utils.get_protocol_features(REDFISH_OBJ)
+    if cursor and cursor['Count']:
+        # A cleared log shows up as fewer entries than were read last time, then start over from its beginning
+        response_count = REDFISH_OBJ.get(entries_url, {'$top': 1} if features.get('TopSkipQuery') else None)
+        if response_count.status == 200:
+            member_count = response_count.dict.get('Members@odata.count')
+            if member_count is not None and member_count < cursor['Count']:
+                cursor = None
+    if cursor:
+        new_cursor = dict(cursor, Ids=list(cursor['Ids']))
+    else:
+        new_cursor = {'Created': '', 'Ids': [], 'MaxId': -1, 'Count': 0, 'LastId': None}
+    log_entries = None
+    # Number of entries before the first one read, None when reading a filtered view of the log
+    position = 0
+    if cursor and cursor['Created'] and features.get('FilterQuery'):
+        # 'ge' so entries created in the same second as the cursor come back, the cursor Ids drop the seen ones
+        query = {'$filter': "Created ge '%s'" % cursor['Created']}
+        if REDFISH_OBJ.get(entries_url, dict(query, **{'$top': 1})).status == 200:
+            log_entries = utils.iter_members(REDFISH_OBJ, entries_url, LOG_PAGE_SIZE, query=query)
+            position = None
+    if log_entries is None and cursor and cursor['Count'] and features.get('TopSkipQuery'):
+        # Skip the known entries only if the log grows at the end: the last known entry must still be in place
+        response_last = REDFISH_OBJ.get(entries_url, {'$skip': cursor['Count'] - 1, '$top': 1})
+        if response_last.status == 200 and response_last.dict.get('Members'):
+            last_member = response_last.dict['Members'][0]
+            if last_member.get('Id', last_member['@odata.id'].split('/')[-1]) == cursor['LastId']:
+                log_entries = utils.iter_members(REDFISH_OBJ, entries_url, LOG_PAGE_SIZE, skip=cursor['Count'])
+                position = cursor['Count']
+    if log_entries is None:
+        log_entries = utils.iter_members(REDFISH_OBJ, entries_url, LOG_PAGE_SIZE)
+    count = position
+    for log_entry in log_entries:
+        if position is not None:
+            count += 1
+            new_cursor['LastId'] = log_entry.get('Id', log_entry['@odata.id'].split('/')[-1])
+        if cursor and not is_newer_log_entry(log_entry, cursor):
+            continue
+        advance_log_cursor(new_cursor, log_entry)
+        yield log_entry
+    # After a filtered read the position of the last entry is unknown, the next run filters again
+    new_cursor['Count'] = count or 0
+    cursors[entries_url] = new_cursor
+
+
+def compare_created(created, last_created):
+    """Compare two Created values, returns -1, 0 or 1. Timestamps are compared as time, others as string"""
+    try:
+        first = datetime.datetime.fromisoformat(created.replace('Z', '+00:00'))
+        second = datetime.datetime.fromisoformat(last_created.replace('Z', '+00:00'))
+        return (first > second) - (first < second)
+    except (ValueError, TypeError, AttributeError):
+        return (created > last_created) - (created < last_created)
+
+
+def is_newer_log_entry(log_entry, cursor):
+    """Check whether a log entry comes after the cursor, by Created or by numeric Id when Created is missing"""
+    entry_id = log_entry.get('Id')
+    if log_entry.get('Created') and cursor['Created']:
+        order = compare_created(log_entry['Created'], cursor['Created'])
+        if order != 0:
+            return order > 0
+    elif entry_id is not None and str(entry_id).isdigit():
+        return int(entry_id) > cursor['MaxId']
+    return entry_id not in cursor['Ids']
+
+
+def advance_log_cursor(cursor, log_entry):
+    """Move the cursor to a newly read log entry"""
+    entry_id = log_entry.get('Id')
+    if entry_id is not None and str(entry_id).isdigit():
+        cursor['MaxId'] = max(cursor['MaxId'], int(entry_id))
+    created = log_entry.get('Created')
+    if not created:
+        if entry_id is not None and not str(entry_id).isdigit():
+            cursor['Ids'].append(entry_id)
+        return
+    order = compare_created(created, cursor['Created']) if cursor['Created'] else 1
+    if order > 0:
+        # Only the ids created at the latest time are needed to drop duplicates next time
+        cursor['Created'] = created
+        cursor['Ids'] = [entry_id]
+    elif order == 0:
+        cursor['Ids'].append(entry_id)
+
+
+_log_cursors_lock = threading.Lock()
+
+
+def load_log_cursors(state_file, ip):
+    """Get the log cursors of one BMC from the state file
+    :params state_file: state file path
+    :type state_file: string
+    :params ip: BMC IP address
+    :type ip: string
+    :returns: returns cursors per Entries URL, empty when the BMC was never read
+    """
+    with _log_cursors_lock:
+        if not os.path.isfile(state_file):
+            return {}
+        with open(state_file) as f:
+            return json.load(f).get(ip, {})
+
+
+def save_log_cursors(state_file, ip, cursors):
+    """Write the log cursors of one BMC to the state file, keeping the other BMCs
+    :params state_file: state file path
+    :type state_file: string
+    :params ip: BMC IP address
+    :type ip: string
+    :params cursors: cursors per Entries URL
+    :type cursors: dict
+    """
+    with _log_cursors_lock:
+        state = {}
+        if os.path.isfile(state_file):
+            with open(state_file) as f:
+                state = json.load(f)
+        state[ip] = cursors
+        temp_file = "%s.%s.tmp" % (state_file, os.getpid())
+        with open(temp_file, 'w') as f:
+            json.dump(state, f, sort_keys=True, indent=2)
+        os.replace(temp_file, state_file)
 
 
 if __name__ == '__main__':
     # Get parameters from config.ini and/or command line
     argget = utils.create_common_parameter_list()
+    argget.add_argument('--stream', action='store_true', help='Write entries as JSON lines while they are read, memory use stays flat for large logs')
+    argget.add_argument('--statefile', type=str, help='File keeping the last seen entry per BMC and log service, only newer entries are read and printed')
     args = argget.parse_args()
     parameter_info = utils.parse_parameter(args)
     
@@ -139,9 +294,13 @@ if __name__ == '__main__':
     system_id = parameter_info['sysid']
     
     # Get system log and check result
-    result = get_system_log(ip, login_account, login_password, system_id)
+    if args.stream:
+        result = get_system_log(ip, login_account, login_password, system_id, stream=sys.stdout, state_file=args.statefile)
+    else:
+        result = get_system_log(ip, login_account, login_password, system_id, state_file=args.statefile)
     if result['ret'] is True:
         del result['ret']
-        sys.stdout.write(json.dumps(result['entries'], sort_keys=True, indent=2))
+        if not args.stream:
+            sys.stdout.write(json.dumps(result['entries'], sort_keys=True, indent=2))
     else:
-        sys.stderr.write(result['msg'])
\ No newline at end of file
+        sys.stderr.write(result['msg'])
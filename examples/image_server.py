@@ -0,0 +1,283 @@
+###
+#
+# Lenovo Redfish examples - Serve firmware images from a local directory to the BMCs
+#
+# Copyright Notice:
+#
+# Copyright 2018 Lenovo Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+###
+
+
+import os
+import sys
+import time
+import socket
+import secrets
+import threading
+import http.server
+import urllib.parse
+import lenovo_utils as utils
+
+
+# Bytes handed to sendfile at a time, the per-connection rate cap is checked between them
+IMAGE_SEND_CHUNK = 1024 * 1024
+
+
+class ImageServer(object):
+    """HTTP server handing image files to the BMCs pulling them with SimpleUpdate, either the files of one directory
+    or only the files published with add_file, each under a random path.
+    Files go from the page cache to the socket with sendfile, Range requests are answered with 206,
+    and each connection may be held under a bytes per second cap.
+    """
+
+    def __init__(self, directory=None, port=0, address='', rate=None):
+        """
+        :params directory: directory the images are served from, nothing outside it is served(None: only files published with add_file)
+        :type directory: None or string
+        :params port: TCP port to listen on(0: any free port)
+        :type port: int
+        :params address: local address to listen on('': all addresses)
+        :type address: string
+        :params rate: bytes per second cap of each connection(None: no limit)
+        :type rate: None or float
+        """
+        self.directory = os.path.realpath(directory) if directory else None
+        self.rate = rate
+        self.sent = 0
+        self._files = {}
+        self._sent_lock = threading.Lock()
+        server_class = http.server.ThreadingHTTPServer
+        if ':' in address:
+            server_class = type('ImageHTTPServer6', (http.server.ThreadingHTTPServer,), {'address_family': socket.AF_INET6})
+        self._server = server_class((address, port), self._make_handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = None
+
+    def _make_handler(self):
+        server = self
+
+        class ImageHandler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_HEAD(self):
+                self.send_image(False)
+
+            def do_GET(self):
+                self.send_image(True)
+
+            def send_image(self, with_body):
+                path = server.get_image_path(self.path)
+                if path is None:
+                    self.send_error(404)
+                    return
+                with open(path, 'rb') as f:
+                    size = os.fstat(f.fileno()).st_size
+                    byte_range = parse_range(self.headers.get('Range'), size)
+                    if byte_range is False:
+                        self.send_response(416)
+                        self.send_header('Content-Range', 'bytes */%d' % size)
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    if byte_range is None:
+                        start, end = 0, size - 1
+                        self.send_response(200)
+                    else:
+                        start, end = byte_range
+                        self.send_response(206)
+                        self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, end, size))
+                    self.send_header('Content-Type', 'application/octet-stream')
+                    self.send_header('Content-Length', str(end - start + 1))
+                    self.send_header('Accept-Ranges', 'bytes')
+                    self.send_header('Last-Modified', self.date_time_string(os.fstat(f.fileno()).st_mtime))
+                    self.end_headers()
+                    if with_body:
+                        self.wfile.flush()
+                        server.send_file(self.connection, f, start, end - start + 1)
+
+            def log_message(self, format, *args):
+                pass
+
+        return ImageHandler
+
+    def add_file(self, path):
+        """Publish one file under a random path that can not be guessed
+        :params path: local file
+        :type path: string
+        :returns: returns URL path of the file, such as /<token>/<file name>
+        """
+        url_path = '/%s/%s' % (secrets.token_urlsafe(16), urllib.parse.quote(os.path.basename(path)))
+        self._files[url_path] = os.path.realpath(path)
+        return url_path
+
+    def get_image_path(self, request_path):
+        """Get the file a request path names, None when it is not published, missing or outside the directory"""
+        url_path = urllib.parse.urlsplit(request_path).path
+        if url_path in self._files:
+            return self._files[url_path] if os.path.isfile(self._files[url_path]) else None
+        if self.directory is None:
+            return None
+        name = urllib.parse.unquote(url_path).lstrip('/')
+        path = os.path.realpath(os.path.join(self.directory, name))
+        if os.path.commonpath([path, self.directory]) != self.directory or not os.path.isfile(path):
+            return None
+        return path
+
+    def send_file(self, connection, f, offset, count):
+        """Send count bytes of f from offset with sendfile, pausing to keep the connection under the rate cap"""
+        # Every connection gets its own bucket, a slow BMC must not hold back the others
+        throttle = utils.BandwidthLimiter(self.rate, IMAGE_SEND_CHUNK) if self.rate else None
+        while count > 0:
+            sent = connection.sendfile(f, offset, min(count, IMAGE_SEND_CHUNK))
+            if not sent:
+                break
+            offset += sent
+            count -= sent
+            with self._sent_lock:
+                self.sent += sent
+            if throttle is not None:
+                throttle.consume(sent)
+
+    def get_image_url(self, url_path, address):
+        """Get the URL a BMC downloads an image from
+        :params url_path: URL path from add_file, or file name in the served directory
+        :type url_path: string
+        :params address: address the BMCs reach this host at
+        :type address: string
+        :returns: returns image URL
+        """
+        if ':' in address:
+            address = '[%s]' % address
+        if not url_path.startswith('/'):
+            url_path = '/' + urllib.parse.quote(url_path)
+        return "http://%s:%s%s" % (address, self.port, url_path)
+
+    def start(self):
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving and close the listening socket"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def serve_image(image_file, bmc_ip, port=0, address=None, rate=None):
+    """Start an ImageServer serving only one image file, under a random path, on the address the BMCs reach this host at
+    :params image_file: local image file
+    :type image_file: string
+    :params bmc_ip: BMC IP address the URL is built for
+    :type bmc_ip: string
+    :params port: TCP port to listen on(0: any free port)
+    :type port: int
+    :params address: address the BMCs reach this host at, the server listens on it(None: the local address that routes to bmc_ip)
+    :type address: None or string
+    :params rate: bytes per second cap of each connection(None: no limit)
+    :type rate: None or float
+    :returns: returns started server and the image URL when succeeded or error message when failed
+    """
+    if not os.path.isfile(image_file):
+        return {'ret': False, 'msg': "Image file %s is not found" % image_file}
+    try:
+        address = address or get_local_address(bmc_ip)
+        server = ImageServer(None, port, address, rate)
+    except (IOError, OSError) as e:
+        return {'ret': False, 'msg': "Failed to start image server: %s" % e}
+    url = server.get_image_url(server.add_file(image_file), address)
+    server.start()
+    return {'ret': True, 'server': server, 'url': url}
+
+
+def parse_range(value, size):
+    """Get the byte range of a Range header value
+    :params value: Range header value, such as bytes=100- or bytes=-500
+    :type value: None or string
+    :params size: file size
+    :type size: int
+    :returns: returns (start, end) both inclusive, None when the whole file is asked for, False when the range can not be satisfied
+    """
+    if not value or not value.startswith('bytes=') or ',' in value:
+        # Multiple ranges are not used by the BMCs, send the whole file
+        return None
+    first, _, last = value[len('bytes='):].strip().partition('-')
+    try:
+        if not first:
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def get_local_address(remote_ip):
+    """Get the local address the route to remote_ip leaves from, no packet is sent
+    :params remote_ip: BMC IP address
+    :type remote_ip: string
+    :returns: returns local IP address
+    """
+    family = socket.AF_INET6 if ':' in remote_ip else socket.AF_INET
+    probe = socket.socket(family, socket.SOCK_DGRAM)
+    try:
+        probe.connect((remote_ip, 9))
+        return probe.getsockname()[0]
+    finally:
+        probe.close()
+
+
+import argparse
+def add_parameter():
+    """Add image server parameter"""
+    argget = argparse.ArgumentParser(description="This tool serves firmware images from a local directory to the BMCs")
+    argget.add_argument('--imagedir', type=str, default='.', help='Directory the images are served from, default is the current directory')
+    argget.add_argument('--port', type=int, default=8080, help='Port the server listens on, default is 8080')
+    argget.add_argument('--address', type=str, default='', help='Local address the server listens on, default is all addresses')
+    argget.add_argument('--rate', type=float, default=0, help='Rate cap of each connection in MB/s, default is no limit')
+    args = argget.parse_args()
+    parameter_info = {}
+    for name in ['imagedir', 'port', 'address', 'rate']:
+        parameter_info[name] = getattr(args, name)
+    return parameter_info
+
+
+if __name__ == '__main__':
+    # Get parameters from command line
+    parameter_info = add_parameter()
+    rate = parameter_info['rate'] * 1024 * 1024 if parameter_info['rate'] else None
+
+    # Serve until interrupted
+    server = ImageServer(parameter_info['imagedir'], parameter_info['port'], parameter_info['address'], rate)
+    server.start()
+    sys.stderr.write("Serving %s on port %s\n" % (server.directory, server.port))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    server.stop()
+    sys.stderr.write("%s bytes sent\n" % server.sent)
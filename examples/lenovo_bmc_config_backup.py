@@ -19,9 +19,14 @@
 # under the License.
 ###
 
+import os
+import re
 import sys
-import redfish
+import gzip
 import json
+import time
+import hashlib
+import threading
 import lenovo_utils as utils
 
 def lenovo_bmc_config_backup(ip, login_account, login_password,backup_password,backup_file):
@@ -51,82 +56,260 @@ def lenovo_bmc_config_backup(ip, login_account, login_password,backup_password,b
         result = {'ret': False, 'msg': "open file %s fail,Please check your backup file path"%backup_file}
         return result
 
+    result = get_bmc_config_backup(ip, login_account, login_password, backup_password)
+    if result['ret'] is True:
+        json.dump(result["data"],back_file)
+        result = {'ret': True,
+                  'msg': "bmc configuration backup succesfully ,backup path is:" + backup_file}
+    back_file.close()
+    return result
+
+
+def get_bmc_config_backup(ip, login_account, login_password, backup_password):
+    """Get the BMC configuration backup data
+        :params ip: BMC IP address
+        :type ip: string
+        :params login_account: BMC user name
+        :type login_account: string
+        :params login_password: BMC user password
+        :type login_password: string
+        :params backup_password: password the BMC encrypts values of the backup with
+        :type backup_password: string
+        :returns: returns backup data when succeeded or error message when failed
+        """
     login_host = "https://" + ip
 
     # Connect using the BMC address, account name, and password
-    # Create a REDFISH object
-    REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                         password=login_password, default_prefix='/redfish/v1')
-
     # Login into the server and create a session
     try:
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct\n"}
         return result
-    # Get ServiceBase resource
-    response_base_url = REDFISH_OBJ.get('/redfish/v1', None)
-    # Get response_base_url
-    if response_base_url.status == 200:
-        manager_url = response_base_url.dict['Managers']['@odata.id']
-    else:
-        error_message = utils.get_extended_error(response_base_url)
-        result = {'ret': False, 'msg': "Url '%s' response Error code %s \nerror_message: %s" % (
-        response_base_url, response_base_url.status, error_message)}
-        REDFISH_OBJ.logout()
-        back_file.close()
-        return result
-    response_manager_url = REDFISH_OBJ.get(manager_url, None)
-    bmc_time_detail = []
-    if response_manager_url.status == 200:
-        for request in response_manager_url.dict['Members']:
-            request_url = request['@odata.id']
-            response_url = REDFISH_OBJ.get(request_url, None)
-            if response_url.status == 200:
-                #get configuration url
-                oem_resource = response_url.dict['Oem']['Lenovo']
-                config_url = oem_resource['Configuration']['@odata.id']
-                response_config_url = REDFISH_OBJ.get(config_url, None)
-                if response_config_url.status == 200:
-                    #backup configuration
-                    backup_target_url = response_config_url.dict['Actions']['#LenovoConfigurationService.BackupConfiguration']['target']
-                    backup_body = {"Passphrase":backup_password}
-                    response_backup_url = REDFISH_OBJ.post(backup_target_url, body=backup_body)
-                    if response_backup_url.status == 200:
-                        json.dump(response_backup_url.dict["data"],back_file)
-                        result = {'ret': True,
-                                  'msg': "bmc configuration backup succesfully ,backup path is:" + backup_file}
-                        REDFISH_OBJ.logout()
-                        back_file.close()
-                        return result
+    try:
+        # Get ServiceBase resource
+        response_base_url = utils.get_navigation(REDFISH_OBJ, '/redfish/v1')
+        # Get response_base_url
+        if response_base_url.status == 200:
+            manager_url = response_base_url.dict['Managers']['@odata.id']
+        else:
+            error_message = utils.get_extended_error(response_base_url)
+            result = {'ret': False, 'msg': "Url '%s' response Error code %s \nerror_message: %s" % (
+            response_base_url, response_base_url.status, error_message)}
+            return result
+        response_manager_url = utils.get_navigation(REDFISH_OBJ, manager_url)
+        if response_manager_url.status == 200:
+            for request in response_manager_url.dict['Members']:
+                request_url = request['@odata.id']
+                response_url = utils.get_navigation(REDFISH_OBJ, request_url)
+                if response_url.status == 200:
+                    #get configuration url
+                    oem_resource = response_url.dict['Oem']['Lenovo']
+                    config_url = oem_resource['Configuration']['@odata.id']
+                    response_config_url = utils.get_navigation(REDFISH_OBJ, config_url)
+                    if response_config_url.status == 200:
+                        #backup configuration
+                        backup_target_url = response_config_url.dict['Actions']['#LenovoConfigurationService.BackupConfiguration']['target']
+                        backup_body = {"Passphrase":backup_password}
+                        response_backup_url = REDFISH_OBJ.post(backup_target_url, body=backup_body)
+                        if response_backup_url.status == 200:
+                            result = {'ret': True, 'data': response_backup_url.dict["data"]}
+                            return result
+                        else:
+                            error_message = utils.get_extended_error(response_backup_url)
+                            result = {'ret': False, 'msg': "Url '%s' response Error code %s \nerror_message: %s" % (
+                                response_backup_url, response_backup_url.status, error_message)}
+                            return result
                     else:
-                        error_message = utils.get_extended_error(response_backup_url)
+                        error_message = utils.get_extended_error(response_config_url)
                         result = {'ret': False, 'msg': "Url '%s' response Error code %s \nerror_message: %s" % (
-                            response_backup_url, response_backup_url.status, error_message)}
-                        REDFISH_OBJ.logout()
-                        back_file.close()
+                            response_config_url, response_config_url.status, error_message)}
                         return result
                 else:
-                    error_message = utils.get_extended_error(response_config_url)
+                    error_message = utils.get_extended_error(response_url)
                     result = {'ret': False, 'msg': "Url '%s' response Error code %s \nerror_message: %s" % (
-                        response_config_url, response_config_url.status, error_message)}
-                    REDFISH_OBJ.logout()
-                    back_file.close()
+                        response_url, response_url.status, error_message)}
                     return result
-            else:
-                error_message = utils.get_extended_error(response_url)
-                result = {'ret': False, 'msg': "Url '%s' response Error code %s \nerror_message: %s" % (
-                    response_url, response_url.status, error_message)}
-                REDFISH_OBJ.logout()
-                back_file.close()
-                return result
-    else:
-        error_message = utils.get_extended_error(response_manager_url)
-        result = {'ret': False, 'msg': "Url '%s' response Error code %s \nerror_message: %s" % (
-            response_manager_url, response_manager_url.status, error_message)}
+            result = {'ret': False, 'msg': "No manager found to back up"}
+        else:
+            error_message = utils.get_extended_error(response_manager_url)
+            result = {'ret': False, 'msg': "Url '%s' response Error code %s \nerror_message: %s" % (
+                response_manager_url, response_manager_url.status, error_message)}
+    except Exception as e:
+        result = {'ret': False, 'msg': "error_message: %s" % (e)}
+    finally:
+        # Logout of the current session
         REDFISH_OBJ.logout()
-        back_file.close()
+    return result
+
+
+# Settings whose values the BMC encrypts with the backup password, with a fresh salt on every backup
+ENCRYPTED_SETTING_PATTERN = re.compile(r'passw|passphrase|secret|community|privatekey|authkey|privkey', re.IGNORECASE)
+
+
+def mask_encrypted_values(data):
+    """Get a copy of backup data with the values of encrypted settings masked,
+    two backups of the same configuration give the same copy although their ciphertexts differ
+    :params data: BackupConfiguration data
+    :type data: list or dict
+    :returns: returns masked copy of data
+    """
+    if isinstance(data, dict):
+        masked = {}
+        for name, value in data.items():
+            if isinstance(value, str) and value and ENCRYPTED_SETTING_PATTERN.search(name):
+                masked[name] = '*'
+            else:
+                masked[name] = mask_encrypted_values(value)
+        return masked
+    if isinstance(data, list):
+        return [mask_encrypted_values(value) for value in data]
+    return data
+
+
+class ConfigArchive(object):
+    """Directory of BMC configuration backups stored by content.
+    Each distinct backup is one gzip file under objects/ named by the sha256 of its data with encrypted values masked,
+    index.jsonl has one line per host and backup pointing at it, so identical backups take the space of one.
+    The object keeps the first full backup of its content, encrypted values included, so it can be restored.
+    """
+
+    def __init__(self, directory):
+        """
+        :params directory: archive directory, created when missing
+        :type directory: string
+        """
+        self.directory = directory
+        self.index_file = os.path.join(directory, 'index.jsonl')
+        self._lock = threading.Lock()
+        if not os.path.isdir(os.path.join(directory, 'objects')):
+            os.makedirs(os.path.join(directory, 'objects'))
+
+    def object_file(self, digest):
+        """Get the file of the object with a sha256 digest"""
+        return os.path.join(self.directory, 'objects', digest[:2], digest + '.json.gz')
+
+    def store(self, host, data):
+        """Add the backup data of a host, the data is written only when no host had the same data before
+        :params host: BMC IP address
+        :type host: string
+        :params data: BackupConfiguration data
+        :type data: list or dict
+        :returns: returns index entry of the backup, new is False when the data was already stored
+        """
+        blob = json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        # Encrypted values differ on every backup, they must not make an unchanged configuration a new object
+        normalized = json.dumps(mask_encrypted_values(data), sort_keys=True, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(normalized).hexdigest()
+        object_file = self.object_file(digest)
+        new = False
+        temp_file = None
+        if not os.path.exists(object_file):
+            # Compress outside the lock so the workers storing different backups do not wait on each other
+            os.makedirs(os.path.dirname(object_file), exist_ok=True)
+            temp_file = "%s.%s.%s.tmp" % (object_file, os.getpid(), threading.get_ident())
+            with gzip.open(temp_file, 'wb') as f:
+                f.write(blob)
+        with self._lock:
+            if temp_file is not None and not os.path.exists(object_file):
+                os.replace(temp_file, object_file)
+                new = True
+            elif temp_file is not None:
+                # Another worker stored the same backup meanwhile
+                os.remove(temp_file)
+            entry = {'host': host, 'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'sha256': digest, 'size': len(blob)}
+            with open(self.index_file, 'a') as f:
+                f.write(json.dumps(entry, sort_keys=True) + '\n')
+        entry['new'] = new
+        return entry
+
+    def entries(self, host=None):
+        """Get the index entries, oldest first
+        :params host: only the entries of this host(None: all hosts)
+        :type host: None or string
+        :returns: returns list of index entries
+        """
+        entries = []
+        if not os.path.isfile(self.index_file):
+            return entries
+        with open(self.index_file) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if host is None or entry['host'] == host:
+                    entries.append(entry)
+        return entries
+
+    def find(self, host, date=None):
+        """Get the latest index entry of a host, on or before a date
+        :params host: BMC IP address
+        :type host: string
+        :params date: latest date wanted, such as 2026-10-17(None: the latest backup)
+        :type date: None or string
+        :returns: returns index entry(None: no backup found)
+        """
+        found = None
+        for entry in self.entries(host):
+            if date is None or entry['time'][:len(date)] <= date:
+                found = entry
+        return found
+
+    def load(self, digest):
+        """Get the backup data stored with a sha256 digest"""
+        with gzip.open(self.object_file(digest), 'rb') as f:
+            return json.loads(f.read().decode('utf-8'))
+
+
+def backup_to_archive(ip, login_account, login_password, backup_password, archive):
+    """Back up the BMC configuration into a ConfigArchive
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params backup_password: password the BMC encrypts values of the backup with
+    :type backup_password: string
+    :params archive: archive the backup is stored in
+    :type archive: ConfigArchive
+    :returns: returns index entry of the backup when succeeded or error message when failed
+    """
+    result = get_bmc_config_backup(ip, login_account, login_password, backup_password)
+    if result['ret'] is False:
         return result
+    entry = archive.store(ip, result['data'])
+    result = {'ret': True, 'msg': "bmc configuration backup stored as %s" % entry['sha256'], 'entry': entry}
+    return result
+
+
+def backup_config_fleet(host_list, login_account, login_password, backup_password, archive_dir, workers=16, timeout=None, output=sys.stdout):
+    """Back up the configuration of many BMCs at once into a content-addressed archive
+    :params host_list: BMC address list
+    :type host_list: list
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params backup_password: password the BMCs encrypt values of the backups with
+    :type backup_password: string
+    :params archive_dir: archive directory
+    :type archive_dir: string
+    :params workers: maximum number of BMCs handled at the same time
+    :type workers: int
+    :params timeout: seconds to wait for one BMC(None: no limit)
+    :type timeout: None or float
+    :params output: JSON lines stream, one line per BMC
+    :type output: file object
+    :returns: returns summary of the run
+    """
+    if len(backup_password) < 9:
+        result = {'ret': False, 'msg': "Password at least 9 characters needed", 'succeeded': 0, 'failed': len(host_list), 'timed_out': 0}
+        return result
+    archive = ConfigArchive(archive_dir)
+    return utils.run_fleet(host_list, backup_to_archive, (login_account, login_password, backup_password, archive), workers, timeout, output)
+
 
 def add_parameter():
     """Add BMC configuration backup parameter"""
@@ -137,8 +320,14 @@ def add_parameter():
     help_str += "(Password at least 9 characters needed)"
     argget.add_argument('--backuppasswd', type=str, help= help_str)
     argget.add_argument('--backupfile', type=str,default = "./bmc_config_backup.json",help='Input the file you want to save the backup configuration')
+    utils.add_fleet_parameter(argget, required=False)
+    argget.add_argument('--archive', type=str, help='Directory of the compressed, content-addressed backup archive, required with --hosts')
+    argget.add_argument('--extract', type=str, help='Write the archived backup of this BMC IP to --backupfile instead of backing up, for lenovo_bmc_config_restore.py')
+    argget.add_argument('--date', type=str, help='With --extract, use the latest backup on or before this date, such as 2026-10-17, default is the latest')
     args = argget.parse_args()
     parameter_info = utils.parse_parameter(args)
+    for name in ['hosts', 'workers', 'timeout', 'archive', 'extract', 'date']:
+        parameter_info[name] = getattr(args, name)
     parameter_info["backuppasswd"] = args.backuppasswd
     parameter_info["backupfile"] = args.backupfile
     return parameter_info
@@ -151,6 +340,35 @@ if __name__ == '__main__':
     login_password = parameter_info["passwd"]
     backup_password = parameter_info["backuppasswd"]
     backup_file = parameter_info["backupfile"]
+
+    # Write an archived backup to a file the restore script reads
+    if parameter_info['extract']:
+        if not parameter_info['archive']:
+            sys.stderr.write("Please specify the archive directory with --archive")
+            sys.exit(1)
+        archive = ConfigArchive(parameter_info['archive'])
+        entry = archive.find(parameter_info['extract'], parameter_info['date'])
+        if entry is None:
+            sys.stderr.write("No backup of %s found in %s" % (parameter_info['extract'], parameter_info['archive']))
+            sys.exit(1)
+        with open(backup_file, 'w') as f:
+            json.dump(archive.load(entry['sha256']), f)
+        sys.stdout.write(json.dumps("backup of %s taken at %s is saved as %s" % (entry['host'], entry['time'], backup_file)))
+        sys.exit(0)
+
+    # Back up many BMCs into the archive when a host list is given, one JSON line per BMC
+    if parameter_info['hosts']:
+        if not parameter_info['archive'] or not backup_password:
+            sys.stderr.write("Please specify --archive and --backuppasswd to back up many BMCs")
+            sys.exit(1)
+        host_list = utils.read_host_list(parameter_info['hosts'])
+        result = backup_config_fleet(host_list, login_account, login_password, backup_password, parameter_info['archive'],
+                                     parameter_info['workers'], parameter_info['timeout'])
+        if 'msg' in result:
+            sys.stderr.write(result['msg'] + '\n')
+        sys.stderr.write("%s succeeded, %s failed, %s timed out\n" % (result['succeeded'], result['failed'], result['timed_out']))
+        sys.exit(0 if result['ret'] else 1)
+
     #BMC configuration backup and check result
     result = lenovo_bmc_config_backup(ip, login_account, login_password,backup_password,backup_file)
     if result['ret'] is True:
@@ -20,7 +20,6 @@
 ###
 
 import sys
-import redfish
 import json
 import lenovo_utils as utils
 
@@ -54,18 +53,14 @@ def lenovo_config_restore(ip, login_account, login_password,backup_password,back
     login_host = "https://" + ip
 
     # Connect using the BMC address, account name, and password
-    # Create a REDFISH object
-    REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                         password=login_password, default_prefix='/redfish/v1')
-
     # Login into the server and create a session
     try:
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct\n"}
         return result
     # Get ServiceBase resource
-    response_base_url = REDFISH_OBJ.get('/redfish/v1', None)
+    response_base_url = utils.get_navigation(REDFISH_OBJ, '/redfish/v1')
     # Get response_base_url
     if response_base_url.status == 200:
         manager_url = response_base_url.dict['Managers']['@odata.id']
@@ -76,17 +71,17 @@ def lenovo_config_restore(ip, login_account, login_password,backup_password,back
         REDFISH_OBJ.logout()
         back_file.close()
         return result
-    response_manager_url = REDFISH_OBJ.get(manager_url, None)
+    response_manager_url = utils.get_navigation(REDFISH_OBJ, manager_url)
     bmc_time_detail = []
     if response_manager_url.status == 200:
         for request in response_manager_url.dict['Members']:
             request_url = request['@odata.id']
-            response_url = REDFISH_OBJ.get(request_url, None)
+            response_url = utils.get_navigation(REDFISH_OBJ, request_url)
             if response_url.status == 200:
                 # get configuration url
                 oem_resource = response_url.dict['Oem']['Lenovo']
                 config_url = oem_resource['Configuration']['@odata.id']
-                response_config_url = REDFISH_OBJ.get(config_url, None)
+                response_config_url = utils.get_navigation(REDFISH_OBJ, config_url)
                 if response_config_url.status == 200:
                     #restore configuratino
                     restore_target_url = response_config_url.dict['Actions']['#LenovoConfigurationService.RestoreConfiguration']['target']
@@ -109,6 +104,17 @@ def lenovo_config_restore(ip, login_account, login_password,backup_password,back
                     "Passphrase":backup_password
                     }
                     response_restore_url = REDFISH_OBJ.post(restore_target_url, body=restore_body)
+                    if response_restore_url.status == 202 and utils.get_task_uri(response_restore_url):
+                        # The restore runs as a task, wait for it to finish, the BMC may restart to apply it
+                        task_result = utils.wait_for_task(REDFISH_OBJ, utils.get_task_uri(response_restore_url), reboot_grace=utils.TASK_REBOOT_GRACE)
+                        if task_result['ret'] is True:
+                            result = {'ret': True,
+                                      'msg':"bmc configuration restore succesfully"}
+                        else:
+                            result = task_result
+                        REDFISH_OBJ.logout()
+                        back_file.close()
+                        return result
                     if response_restore_url.status == 200:
                         result = {'ret': True,
                                   'msg':"bmc configuration restore succesfully"}
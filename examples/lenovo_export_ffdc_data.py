@@ -21,14 +21,14 @@
 
 
 import sys
-import redfish
 import json
 import lenovo_utils as utils
 import time
 import os
+import threading
 
 
-def export_ffdc_data(ip, login_account, login_password, exporturi, sftpuser, sftppwd):
+def export_ffdc_data(ip, login_account, login_password, exporturi, sftpuser, sftppwd, save_dir=None, download_slots=None, throttle=None, verbose=True, timeout=None):
     """Export ffdc data    
     :params ip: BMC IP address
     :type ip: string
@@ -42,6 +42,16 @@ def export_ffdc_data(ip, login_account, login_password, exporturi, sftpuser, sft
     :type sftpuser: string
     :params sftppwd: Specify sftp password if you sprcify sftp uri
     :type sftppwd: string
+    :params save_dir: directory the downloaded FFDC file is saved to(None: current directory)
+    :type save_dir: None or string
+    :params download_slots: semaphore limiting the downloads running at the same time across BMCs(None: no limit)
+    :type download_slots: None or threading.Semaphore
+    :params throttle: limiter shared by the downloads to cap their total rate(None: no limit)
+    :type throttle: None or lenovo_utils.BandwidthLimiter
+    :params verbose: print progress and time cost
+    :type verbose: bool
+    :params timeout: seconds the ExportFFDCData task, and then the download, may take each, waiting for a download slot is not counted(None: task default, no download limit)
+    :type timeout: None or float
     :returns: returns export ffdc data result when succeeded or error message when failed
     """
 
@@ -50,16 +60,14 @@ def export_ffdc_data(ip, login_account, login_password, exporturi, sftpuser, sft
     try:
         result = {}        
         # Create a REDFISH object
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                         password=login_password, default_prefix='/redfish/v1')
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
         return result
 
     try:
         # Get ServiceRoot resource
-        response_base_url = REDFISH_OBJ.get('/redfish/v1/Managers', None)
+        response_base_url = utils.get_navigation(REDFISH_OBJ, '/redfish/v1/Managers')
         # Get managers collection
         if response_base_url.status == 200:
             managers_list = response_base_url.dict['Members']
@@ -71,7 +79,7 @@ def export_ffdc_data(ip, login_account, login_password, exporturi, sftpuser, sft
         # Get manager uri form managers collection
         for i in managers_list:
             manager_uri = i["@odata.id"]
-            response_manager_uri =  REDFISH_OBJ.get(manager_uri, None)
+            response_manager_uri = utils.get_navigation(REDFISH_OBJ, manager_uri)
             if response_manager_uri.status == 200:
                 # Get servicedata uri via manager uri response resource
                 servicedata_uri = response_manager_uri.dict['Oem']['Lenovo']['ServiceData']['@odata.id']
@@ -81,7 +89,7 @@ def export_ffdc_data(ip, login_account, login_password, exporturi, sftpuser, sft
                 return result
 
             # Get servicedata resource
-            response_servicedata_uri = REDFISH_OBJ.get(servicedata_uri, None)
+            response_servicedata_uri = utils.get_navigation(REDFISH_OBJ, servicedata_uri)
             if response_servicedata_uri.status == 200:
                 # Get export ffdc data uri via servicedaata uri response resource
                 ffdc_data_uri = response_servicedata_uri.dict['Actions']['#LenovoServiceData.ExportFFDCData']['target']
@@ -111,42 +119,42 @@ def export_ffdc_data(ip, login_account, login_password, exporturi, sftpuser, sft
                             body['Password'] = sftppwd
                 time_start=time.time()
                 response_ffdc_data_uri = REDFISH_OBJ.post(ffdc_data_uri, body=body)
-                print("Start downloading ffdc files and may need to wait a few minutes...")
+                if verbose:
+                    print("Start downloading ffdc files and may need to wait a few minutes...")
                 # The system will create a task to let user know the transfer progress and return a download URI
                 if response_ffdc_data_uri.status == 202:
-                    task_uri = response_ffdc_data_uri.dict['@odata.id']
-                    # Continue to get the task response until the task is completed
-                    while True:
-                        response_task_uri = REDFISH_OBJ.get(task_uri, None)
-                        if response_task_uri.status == 200:
-                            if response_task_uri.dict['TaskState'] == "Completed":
-                                # If the user does not specify export uri, the ffdc data file will be downloaded to the local
-                                if 'Oem' in response_task_uri.dict:
-                                    download_uri = response_task_uri.dict['Oem']['Lenovo']['FFDCForDownloading']['Path']
-                                    # Download FFDC data from download uri when the task completed
-                                    download_sign = download_ffdc(ip, login_account, login_password, download_uri)
-                                    if download_sign:
-                                        ffdc_file_name = os.getcwd() + "\\" + download_uri.split('/')[-1]
-                                        time_end = time.time()    
-                                        print('time cost: %.2f' %(time_end-time_start)+'s')
-                                        result = {'ret': True, 'msg':  "The FFDC data is saved as %s "  %(ffdc_file_name)}
-                                    else:
-                                        result = {'ret': False, 'msg':  "The FFDC data download failed"}
-                                    break
-                                else:
-                                    time_end = time.time()    
+                    task_uri = utils.get_task_uri(response_ffdc_data_uri)
+                    # Wait for the task, polled less often while it makes no progress
+                    task_result = utils.wait_for_task(REDFISH_OBJ, task_uri, timeout or utils.TASK_WAIT_TIMEOUT, progress=print_task_progress if verbose else None)
+                    if task_result['ret'] is True:
+                        response_task = task_result['entries']
+                        # If the user does not specify export uri, the ffdc data file will be downloaded to the local
+                        if 'Oem' in response_task:
+                            download_uri = response_task['Oem']['Lenovo']['FFDCForDownloading']['Path']
+                            # Download FFDC data from download uri when the task completed
+                            if download_slots is not None:
+                                download_slots.acquire()
+                            try:
+                                download_result = download_ffdc(ip, login_account, login_password, download_uri, save_dir,
+                                                                sys.stderr if verbose else None, throttle, timeout)
+                            finally:
+                                if download_slots is not None:
+                                    download_slots.release()
+                            if download_result['ret'] is True:
+                                time_end = time.time()    
+                                if verbose:
                                     print('time cost: %.2f' %(time_end-time_start)+'s')
-                                    result = {'ret': True, 'msg':  "The FFDC data is saved as %s "  %exporturi}
-                                    break
+                                result = {'ret': True, 'msg':  "The FFDC data is saved as %s, sha256 %s "  %(download_result['file'], download_result['sha256'])}
+                                result.update(download_result)
                             else:
-                                list = ['|','\\','-','/']
-                                for i in list:
-                                    print('\r{0}'.format(i), end='',flush=True)
-                                    time.sleep(0.1)
+                                result = {'ret': False, 'msg':  "The FFDC data download failed, %s" % download_result['msg']}
                         else:
-                            error_message = utils.get_extended_error(response_task_uri)
-                            result = {'ret': False, 'msg': "Url '%s' response task uri Error code %s \nerror_message: %s" % (task_uri, response_task_uri.status, error_message)}
-                            break
+                            time_end = time.time()    
+                            if verbose:
+                                print('time cost: %.2f' %(time_end-time_start)+'s')
+                            result = {'ret': True, 'msg':  "The FFDC data is saved as %s "  %exporturi}
+                    else:
+                        result = task_result
 
                     # Delete the task when the taskstate is completed
                     REDFISH_OBJ.delete(task_uri, None)
@@ -165,64 +173,230 @@ def export_ffdc_data(ip, login_account, login_password, exporturi, sftpuser, sft
         return result
 
 
+def print_task_progress(task_uri, percent_complete, task_state):
+    """Print the progress of the FFDC task over the previous progress line"""
+    print('\r%s %s%%' % (task_state, percent_complete if percent_complete is not None else '-'), end='', flush=True)
+
+
 # download FFDC file
+import random
 import requests
-import time
+import hashlib
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 
 
-def download_ffdc(ip, login_account, login_password, download_uri):
-    """Download ffdc file from download_uri"""
+# Bytes read from the BMC and written to disk at a time, the archive is never held in memory as a whole
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Times a dropped download is resumed, and seconds before the first retry(doubled for each retry)
+DOWNLOAD_RETRIES = 5
+DOWNLOAD_RETRY_DELAY = 2
+# Seconds without receiving data before the connection is considered dropped
+DOWNLOAD_READ_TIMEOUT = 60
+
+
+def download_ffdc(ip, login_account, login_password, download_uri, save_dir=None, progress=None, throttle=None, timeout=None):
+    """Download ffdc file from download_uri, streaming it to a temporary file that is renamed when complete.
+    A dropped connection is resumed with a Range request after a backoff, a partial file left by an earlier run is resumed too.
+    The ETag or Last-Modified of the file is kept next to the partial file, it is sent as If-Range so only the same file is resumed.
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params download_uri: path of the FFDC file on the BMC
+    :type download_uri: string
+    :params save_dir: directory the file is saved to(None: current directory)
+    :type save_dir: None or string
+    :params progress: stream progress is written to(None: no progress)
+    :type progress: None or file object
+    :params throttle: limiter the received bytes are counted against, it pauses the download to keep the rate(None: no limit)
+    :type throttle: None or lenovo_utils.BandwidthLimiter
+    :params timeout: seconds the download may take, pauses imposed by throttle are not counted(None: no limit)
+    :type timeout: None or float
+    :returns: returns file path, size and sha256 when succeeded or error message when failed
+    """
     # closed ssl security warning 
     requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-    temp = False
+    login_host = "https://" + ip
+    session = {}
+    ffdc_file_name = os.path.join(save_dir or os.getcwd(), download_uri.split('/')[-1])
+    temp_file_name = ffdc_file_name + '.part'
+    validator_file_name = temp_file_name + '.etag'
+    checksum = hashlib.sha256()
+    hashed = 0
+    validator = read_validator(validator_file_name)
+    delay = DOWNLOAD_RETRY_DELAY
+    deadline = time.time() + timeout if timeout else None
+    result = {}
     try:
-        download_sign = False
-        ip = ip
-        username = login_account
-        password = login_password
-        download_uri = "https://" + ip + download_uri
-        # Get session Id
-        session_uri = "https://" + ip + "/redfish/v1/SessionService/Sessions/"
-        body = {"UserName":username, "Password":password}
-        headers = {"Content-Type": "application/json"}
-        response_session_uri = requests.post(session_uri, data=json.dumps(body), headers = headers, verify=False)
-        if response_session_uri.status_code == 201:
-            x_auth_token = response_session_uri.headers['X-Auth-Token']
-            location_uri = response_session_uri.headers['Location']
-        else:
-            print("error_code:%s" %response_session_uri.status_code)
-            return
-
-        jsonHeader = {"X-Auth-Token":x_auth_token, "Content-Type":"application/json"}
-        # Download FFDC file
-        response_download_uri = requests.get(download_uri, headers=jsonHeader, verify=False)
-        if response_download_uri.status_code == 200:
-            ffdc_file_name = download_uri.split('/')[-1]
-            get_cwd = os.getcwd()
-            with open(os.getcwd() + '\\' + ffdc_file_name, 'wb') as f:
-                f.write(response_download_uri.content)
-                # f.write(response_download_uri.text)
-                download_sign = True
-            # print(response_download_uri.text)
-        else:
-            print("response manaegr uri Error code %s" %response_download_uri.status_code)
+        for attempt in range(DOWNLOAD_RETRIES + 1):
+            if deadline and time.time() >= deadline:
+                result = {'ret': False, 'msg': "The FFDC data download did not finish within %s seconds" % timeout}
+                break
+            if attempt:
+                # Back off with jitter so BMCs dropped by the same network hiccup do not retry in step
+                time.sleep(delay * random.uniform(0.5, 1.5))
+                delay *= 2
+            if not session:
+                result = utils.create_transfer_session(login_host, login_account, login_password, session)
+                if result['ret'] is False:
+                    continue
+            size = os.path.getsize(temp_file_name) if os.path.exists(temp_file_name) else 0
+            headers = {"X-Auth-Token": session['token']}
+            if size and not validator:
+                # Nothing tells whether the partial file belongs to the file on the BMC now, start over
+                os.remove(temp_file_name)
+                size = 0
+            if size:
+                headers['Range'] = 'bytes=%d-' % size
+                # The BMC sends the whole file instead if it changed since the first part was received
+                headers['If-Range'] = validator
+            try:
+                with requests.get(login_host + download_uri, headers=headers, verify=False, stream=True,
+                                  timeout=(30, DOWNLOAD_READ_TIMEOUT)) as response_download_uri:
+                    status = response_download_uri.status_code
+                    if status == 206:
+                        total = int(response_download_uri.headers.get('Content-Range', '/0').split('/')[-1] or 0)
+                        mode = 'ab'
+                    elif status == 200:
+                        total = int(response_download_uri.headers.get('Content-Length', 0))
+                        mode = 'wb'
+                        size = 0
+                    else:
+                        result = {'ret': False, 'msg': "Url '%s' response Error code %s" % (download_uri, status)}
+                        if status == 416:
+                            # The partial file does not fit the file on the BMC, start over
+                            os.remove(temp_file_name)
+                            validator = None
+                        elif status == 401:
+                            session.clear()
+                        elif status < 500:
+                            return result
+                        continue
+                    validator = response_download_uri.headers.get('ETag') or response_download_uri.headers.get('Last-Modified')
+                    write_validator(validator_file_name, validator)
+                    timed_out = False
+                    if hashed != size:
+                        # Resuming a file this call has not hashed yet, or starting over
+                        checksum, hashed = hash_file(temp_file_name, size)
+                    with open(temp_file_name, mode) as f:
+                        for chunk in response_download_uri.iter_content(DOWNLOAD_CHUNK_SIZE):
+                            f.write(chunk)
+                            checksum.update(chunk)
+                            size += len(chunk)
+                            hashed = size
+                            if throttle is not None and deadline:
+                                # Time held back by the shared cap is not the BMC's fault
+                                deadline += throttle.consume(len(chunk))
+                            elif throttle is not None:
+                                throttle.consume(len(chunk))
+                            if progress is not None:
+                                utils.write_progress(progress, size, total)
+                            if deadline and time.time() >= deadline:
+                                timed_out = True
+                                break
+            except (requests.exceptions.RequestException, IOError) as e:
+                result = {'ret': False, 'msg': "error_message: %s" % (e)}
+                continue
+            if timed_out:
+                # The partial file is kept so a later run resumes it
+                result = {'ret': False, 'msg': "The FFDC data download did not finish within %s seconds, %s bytes received" % (timeout, size)}
+                break
+            if total and size < total:
+                result = {'ret': False, 'msg': "The FFDC data download is incomplete, %s of %s bytes received" % (size, total)}
+                continue
+            # Only a complete file gets the final name
+            os.replace(temp_file_name, ffdc_file_name)
+            write_validator(validator_file_name, None)
+            result = {'ret': True, 'file': ffdc_file_name, 'size': size, 'sha256': checksum.hexdigest()}
+            break
     except Exception as e:
-        print(e)
+        result = {'ret': False, 'msg': "error_message: %s" % (e)}
     finally:
-        # Delete session
-        delete_session_uri = "https://" + ip + location_uri
-        jsonHeader = {"X-Auth-Token":x_auth_token, "Content-Type":"application/json"}
-        response_delete_session = requests.delete(delete_session_uri, headers=jsonHeader, verify=False)
-        if response_delete_session.status_code == 204 and download_sign:
-            temp = True
-        return temp
+        if progress is not None:
+            progress.write('\n')
+        # Delete session, the partial file is kept so the next run resumes it
+        if session:
+            try:
+                requests.delete(login_host + session['location'], headers={"X-Auth-Token": session['token']}, verify=False)
+            except Exception:
+                pass
+    return result
+
+
+def read_validator(file_name):
+    """Get the ETag or Last-Modified saved for a partial file, None when there is none"""
+    try:
+        with open(file_name) as f:
+            return f.read().strip() or None
+    except IOError:
+        return None
+
+
+def write_validator(file_name, validator):
+    """Save the ETag or Last-Modified of a partial file, or delete the saved one when validator is None"""
+    if validator:
+        with open(file_name, 'w') as f:
+            f.write(validator)
+    elif os.path.exists(file_name):
+        os.remove(file_name)
+
+
+def hash_file(file_name, size):
+    """Get sha256 object fed with the first size bytes of a file"""
+    checksum = hashlib.sha256()
+    if size:
+        with open(file_name, 'rb') as f:
+            remaining = size
+            while remaining:
+                chunk = f.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                checksum.update(chunk)
+                remaining -= len(chunk)
+    return checksum, size
+
+
+def export_ffdc_data_fleet(host_list, login_account, login_password, save_dir=None, workers=16, timeout=None, downloads=4, bandwidth=None, output=sys.stdout):
+    """Export and download FFDC data of many BMCs at once. The ExportFFDCData tasks of up to workers BMCs run together
+    and are polled by one task monitor, the downloads are limited in number and share one bandwidth cap
+    :params host_list: BMC address list
+    :type host_list: list
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params save_dir: directory the FFDC files are saved to(None: current directory)
+    :type save_dir: None or string
+    :params workers: maximum number of BMCs handled at the same time
+    :type workers: int
+    :params timeout: seconds the task of one BMC, and then its download, may take each, a BMC waiting for a download slot is not timed(None: no limit)
+    :type timeout: None or float
+    :params downloads: maximum number of FFDC files downloaded at the same time
+    :type downloads: int
+    :params bandwidth: total download rate cap in bytes per second(None: no limit)
+    :type bandwidth: None or float
+    :params output: JSON lines stream, one line per BMC
+    :type output: file object
+    :returns: returns summary of the run
+    """
+    download_slots = threading.Semaphore(downloads)
+    throttle = utils.BandwidthLimiter(bandwidth) if bandwidth else None
+    args = (login_account, login_password, '', None, None, save_dir, download_slots, throttle, False, timeout)
+    # The timeout is applied by export_ffdc_data to the task and the download, not to the whole call
+    return utils.run_fleet(host_list, export_ffdc_data, args, workers, None, output)
 
 
 import argparse
 def add_parameter():
     """Add get servicedata parameter"""
     argget = utils.create_common_parameter_list()
+    # Collecting and downloading FFDC data takes a while, give each BMC up to two hours
+    utils.add_fleet_parameter(argget, required=False, timeout=7200)
+    argget.add_argument('--savedir', type=str, help='Directory the FFDC data files are downloaded to, default is the current directory')
+    argget.add_argument('--downloads', type=int, default=4, help='With --hosts, maximum number of FFDC files downloaded at the same time, default is 4')
+    argget.add_argument('--bandwidth', type=float, default=0, help='With --hosts, total download rate cap in MB/s, default is no limit')
     argget.add_argument('--exporturi', type=str,nargs='?', default='', help='The format of ExportURI must be "sftp://…" or "tftp://… ".(If the user needs to download the FFDC data to the local, these parameters are not required.)')
     argget.add_argument('--sftpuser', type=str, nargs='?', help='Specify sftp username if you specify sftp uri.')
     argget.add_argument('--sftppwd', type=str, nargs='?', help='Specify sftp password if you sprcify sftp uri.')
@@ -233,6 +407,12 @@ def add_parameter():
     parameter_info['exporturi'] = args.exporturi
     parameter_info['sftpuser'] = args.sftpuser
     parameter_info['sftppwd'] = args.sftppwd
+    parameter_info['hosts'] = args.hosts
+    parameter_info['workers'] = args.workers
+    parameter_info['timeout'] = args.timeout
+    parameter_info['savedir'] = args.savedir
+    parameter_info['downloads'] = args.downloads
+    parameter_info['bandwidth'] = args.bandwidth
     return parameter_info
 
 
@@ -250,8 +430,17 @@ if __name__ == '__main__':
     sftpuser = parameter_info['sftpuser']
     sftppwd = parameter_info['sftppwd']
 
+    # Export FFDC data of many BMCs when a host list is given, one JSON line per BMC
+    if parameter_info['hosts']:
+        host_list = utils.read_host_list(parameter_info['hosts'])
+        bandwidth = parameter_info['bandwidth'] * 1024 * 1024 if parameter_info['bandwidth'] else None
+        result = export_ffdc_data_fleet(host_list, login_account, login_password, parameter_info['savedir'], parameter_info['workers'],
+                                        parameter_info['timeout'], parameter_info['downloads'], bandwidth)
+        sys.stderr.write("%s succeeded, %s failed, %s timed out\n" % (result['succeeded'], result['failed'], result['timed_out']))
+        sys.exit(0 if result['ret'] else 1)
+
     # Update firmware result and check result
-    result = export_ffdc_data(ip, login_account, login_password, exporturi, sftpuser, sftppwd)
+    result = export_ffdc_data(ip, login_account, login_password, exporturi, sftpuser, sftppwd, parameter_info['savedir'])
     if result['ret'] is True:
         del result['ret']
         sys.stdout.write(json.dumps(result['msg'], sort_keys=True, indent=2))
@@ -21,7 +21,6 @@
 
 
 import sys
-import redfish
 import json
 import lenovo_utils as utils
 import time
@@ -44,16 +43,14 @@ def export_health_report(ip, login_account, login_password):
     try:
         # Create a REDFISH object
         result = {}
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                         password=login_password, default_prefix='/redfish/v1')
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
         return result
 
     try:
         # Get ServiceRoot resource
-        response_base_url = REDFISH_OBJ.get('/redfish/v1/Managers', None)
+        response_base_url = utils.get_navigation(REDFISH_OBJ, '/redfish/v1/Managers')
         
         # Get the manager url collection
         if response_base_url.status == 200:
@@ -66,7 +63,7 @@ def export_health_report(ip, login_account, login_password):
         # Loop all manager resource instance in manager list
         for i in managers_list:
             manager_uri = i["@odata.id"]
-            response_manager_uri =  REDFISH_OBJ.get(manager_uri, None)
+            response_manager_uri = utils.get_navigation(REDFISH_OBJ, manager_uri)
             if response_manager_uri.status == 200:
                 # Get servicedata uri from manager resource instance
                 servicedata_uri = response_manager_uri.dict['Oem']['Lenovo']['ServiceData']['@odata.id']
@@ -76,7 +73,7 @@ def export_health_report(ip, login_account, login_password):
                 return result
 
             # Get servicedata resource instance
-            response_servicedata_uri = REDFISH_OBJ.get(servicedata_uri, None)
+            response_servicedata_uri = utils.get_navigation(REDFISH_OBJ, servicedata_uri)
             if response_servicedata_uri.status == 200:
                 export_health_report_uri = response_servicedata_uri.dict['Actions']['#LenovoServiceData.ExportHealthReport']['target']
                 
@@ -87,11 +84,12 @@ def export_health_report(ip, login_account, login_password):
                     # Specify health report name is composed of timestamp and Ip
                     releaseDate = time.strftime('%Y%m%d%H%M%S', time.localtime(time.time()))
                     health_report_name = ip+'_'+"health_report_"+ releaseDate+'.xml'
-                    report_pwd = os.getcwd() + '\\' + health_report_name
+                    report_pwd = os.path.join(os.getcwd(), health_report_name)
 
-                    # Write the response to the health report
-                    with open(report_pwd, 'w') as f:
+                    # Write the response to the health report, a temporary file is renamed so no truncated report is left
+                    with open(report_pwd + '.part', 'w') as f:
                         f.write(response_export_health_report_uri.dict['Report'])
+                    os.replace(report_pwd + '.part', report_pwd)
                     result = {'ret': True, 'msg':  "The health report is saved as '%s' "  %(report_pwd)}
                 else:
                     error_message = utils.get_extended_error(response_export_health_report_uri)
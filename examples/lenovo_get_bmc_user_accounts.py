@@ -23,7 +23,6 @@
 import sys
 import logging
 import json
-import redfish
 import lenovo_utils as utils
 
 
@@ -42,16 +41,13 @@ def get_bmc_user_accounts(ip, login_account, login_password):
     try:
         # Connect using the BMC address, account name, and password
         # Create a REDFISH object
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                             password=login_password, default_prefix='/redfish/v1')
-        # Login into the server and create a session
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
         return result
     try:
         # GET the Accounts resource
-        response_base_url = REDFISH_OBJ.get("/redfish/v1", None)
+        response_base_url = utils.get_navigation(REDFISH_OBJ, "/redfish/v1")
         if response_base_url.status == 200:
             account_service_url = response_base_url.dict["AccountService"]["@odata.id"]
         else:
@@ -70,7 +66,7 @@ def get_bmc_user_accounts(ip, login_account, login_password):
             return result
 
         # Get all BMC user account
-        accounts_url_response = REDFISH_OBJ.get(accounts_url, None)
+        accounts_url_response = utils.get_collection(REDFISH_OBJ, accounts_url)
         if accounts_url_response.status == 200:
             # Loop through Accounts and print info
             account_count = accounts_url_response.dict["Members@odata.count"]
@@ -83,10 +79,12 @@ def get_bmc_user_accounts(ip, login_account, login_password):
             return result
 
         user_details = []
-        for x in range(0, account_count):
+        members = accounts_url_response.dict["Members"]
+        # Get the accounts, several at a time
+        responses = utils.get_members(REDFISH_OBJ, members, select=['Name', 'UserName', 'Enabled', 'Locked', 'Links'])
+        for member, response_account_x_url in zip(members, responses):
             bmc_user = {}
-            account_x_url = accounts_url_response.dict["Members"][x]["@odata.id"]
-            response_account_x_url = REDFISH_OBJ.get(account_x_url, None)
+            account_x_url = member["@odata.id"]
             if response_account_x_url.status == 200:
                 # Print out account information if account is valid (UserName not blank)
                 if response_account_x_url.dict["UserName"]:
@@ -20,7 +20,6 @@
 ###
 
 import sys
-import redfish
 import json
 import lenovo_utils as utils
 
@@ -39,18 +38,14 @@ def lenovo_set_bmc_config_default(ip, login_account, login_password):
     login_host = "https://" + ip
 
     # Connect using the BMC address, account name, and password
-    # Create a REDFISH object
-    REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                         password=login_password, default_prefix='/redfish/v1')
-
     # Login into the server and create a session
     try:
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct\n"}
         return result
     # Get ServiceBase resource
-    response_base_url = REDFISH_OBJ.get('/redfish/v1', None)
+    response_base_url = utils.get_navigation(REDFISH_OBJ, '/redfish/v1')
     # Get response_base_url
     if response_base_url.status == 200:
         manager_url = response_base_url.dict['Managers']['@odata.id']
@@ -60,17 +55,17 @@ def lenovo_set_bmc_config_default(ip, login_account, login_password):
             response_base_url, response_base_url.status, error_message)}
         REDFISH_OBJ.logout()
         return result
-    response_manager_url = REDFISH_OBJ.get(manager_url, None)
+    response_manager_url = utils.get_navigation(REDFISH_OBJ, manager_url)
     bmc_time_detail = []
     if response_manager_url.status == 200:
         for request in response_manager_url.dict['Members']:
             request_url = request['@odata.id']
-            response_url = REDFISH_OBJ.get(request_url, None)
+            response_url = utils.get_navigation(REDFISH_OBJ, request_url)
             if response_url.status == 200:
                 # get bmc configuratino url
                 oem_resource = response_url.dict['Oem']['Lenovo']
                 config_url = oem_resource['Configuration']['@odata.id']
-                response_config_url = REDFISH_OBJ.get(config_url, None)
+                response_config_url = utils.get_navigation(REDFISH_OBJ, config_url)
                 if response_config_url.status == 200:
                     #set bmc configuration default
                     reset_default_url = response_config_url.dict['Actions']['#LenovoConfigurationService.ResetToDefault']['target']
@@ -22,7 +22,6 @@
 
 import sys
 import json
-import redfish
 import lenovo_utils as utils
 
 
@@ -57,16 +56,12 @@ def set_serial_interfaces(ip, login_account, login_password, interfaceid, bitrat
     try:
         # Connect using the BMC address, account name, and password
         # Create a REDFISH object
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                             password=login_password, default_prefix='/redfish/v1')
-    
-        # Login into the server and create a session
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
         return result
     try:
-        base_response = REDFISH_OBJ.get('/redfish/v1', None)
+        base_response = utils.get_navigation(REDFISH_OBJ, '/redfish/v1')
         if base_response.status == 200:
             # get the managers url
             managers_url = base_response.dict['Managers']['@odata.id']
@@ -79,7 +74,7 @@ def set_serial_interfaces(ip, login_account, login_password, interfaceid, bitrat
             
             return result
 
-        managers_url_response = REDFISH_OBJ.get(managers_url, None)
+        managers_url_response = utils.get_navigation(REDFISH_OBJ, managers_url)
         if managers_url_response.status == 200:
             # get the managers url collection
             managers_url_collection = managers_url_response.dict['Members']
@@ -21,7 +21,6 @@
 
 
 import sys
-import redfish
 import json
 import lenovo_utils as utils
 
@@ -46,16 +45,13 @@ def update_bmc_user_privileges(ip, login_account, login_password, username, auth
         # Connect using the BMC address, account name, and password
         # Create a REDFISH object
         login_host = "https://" + ip
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                             password=login_password, default_prefix='/redfish/v1')
-        # Login into the server and create a session
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct\n"}
         return result
     try:
         # Get response_base_url resource
-        response_base_url = REDFISH_OBJ.get('/redfish/v1', None)
+        response_base_url = utils.get_navigation(REDFISH_OBJ, '/redfish/v1')
 
         # Get account service url
         if response_base_url.status == 200:
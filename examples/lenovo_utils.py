@@ -17,10 +17,26 @@
 ###
 
 
+import os
 import sys
+import json
+import time
+import heapq
+import queue
+import atexit
+import random
+import inspect
+import re
+import asyncio
 import redfish
 import argparse
+import ipaddress
+import threading
+import contextlib
+import collections
 import configparser
+import email.utils
+import concurrent.futures
 
 
 def get_system_url(base_url, system_id, redfish_obj):
@@ -34,36 +50,39 @@ def get_system_url(base_url, system_id, redfish_obj):
     :returns: returns string URL to ComputerSystem resource
     """
     # Get ServiceRoot resource
-    response_base_url = redfish_obj.get(base_url, None)
+    response_base_url = get_navigation(redfish_obj, base_url)
     # Get ComputerSystemCollection resource
     systems_url = response_base_url.dict["Systems"]["@odata.id"]
-    response_systems_url = redfish_obj.get(systems_url, None)
-    count = response_systems_url.dict["Members@odata.count"]
-    Members = response_systems_url.dict["Members"]
+    response_systems_url = get_navigation(redfish_obj, systems_url)
+    return select_system_url(response_systems_url.dict["Members"], system_id)
+
+
+def select_system_url(members, system_id):
+    """Select ComputerSystem instance URL from the Systems collection members
+    :params members: Members of the ComputerSystemCollection resource
+    :type members: list
+    :params system_id: ComputerSystem instance id(None: first instance, All: all instances)
+    :type system_id: None or string
+    :returns: returns string URL list to ComputerSystem resource
+    """
     # NOTE: Get the ComputerSystem instance list
     system = []
-    if not Members:
+    if not members:
         return system
-    if system_id == "None":
+    if system_id is None or system_id == "None":
         # Default returns the first instance
-        system_url = response_systems_url.dict["Members"][0]["@odata.id"]
-        system.append(system_url)
-        return system
-    elif system_id == "all":
+        system.append(members[0]["@odata.id"])
+    elif system_id.lower() == "all":
         # Return all system list
-        for i in range(response_systems_url.dict['Members@odata.count']):
-            system_url = response_systems_url.dict["Members"][i]["@odata.id"]
-            system.append(system_url)
-            return system
+        for member in members:
+            system.append(member["@odata.id"])
     else:
         # Return parameters specify the system
-        for system_x_url in Members:
-            system_url = system_x_url["@odata.id"]
-            if system_id in system_url:
+        for member in members:
+            system_url = member["@odata.id"]
+            if system_url.rstrip('/').split('/')[-1] == system_id:
                 system.append(system_url)
-                return system
-            else:
-                return system
+    return system
 
 
 def get_extended_error(response_body):
@@ -84,11 +103,1412 @@ def get_extended_error(response_body):
         return message
 
 
+# Seconds a pooled session may stay unused before it is logged out
+SESSION_IDLE_TIMEOUT = 300
+
+_session_pool = {}
+_session_pool_lock = threading.Lock()
+_session_reaper = None
+_session_pool_stats = {'hits': 0, 'misses': 0, 'relogins': 0, 'logouts': 0, 'memo_hits': 0}
+# Clients each thread got from get_redfish_client and has not released yet
+_held_clients = threading.local()
+
+
+class PooledRedfishClient(object):
+    """Redfish client shared by all callers using the same BMC and user.
+    It forwards get/post/patch/put/delete/head to one logged-in redfish client,
+    logs in again once if the BMC answers 401, and turns logout() into a release
+    so the session and its keep-alive connection survive between calls.
+    It can also be used as a context manager, which releases it on exit.
+    """
+
+    def __init__(self, login_host, login_account, login_password):
+        self.login_host = login_host
+        self.login_account = login_account
+        self.login_password = login_password
+        self.last_used = time.time()
+        self.in_use = 0
+        self.retired = False
+        self._client = None
+        self._lock = threading.Lock()
+        # memoize_gets memo of each thread using this client, keyed by thread id
+        self._memos = {}
+
+    def _login(self):
+        client = redfish.redfish_client(base_url=self.login_host, username=self.login_account,
+                                        password=self.login_password, default_prefix='/redfish/v1')
+        client.login(auth="session")
+        self._client = client
+
+    def _close(self):
+        if self._client is None:
+            return
+        try:
+            self._client.logout()
+            _count_session_stat('logouts')
+        except Exception:
+            # The session may already be gone on the BMC, nothing is left to release
+            pass
+        self._client = None
+
+    def _request(self, method, *args, **kwargs):
+        client = self._client
+        response = getattr(client, method)(*args, **kwargs)
+        if response.status == 401:
+            # The session was deleted or timed out on the BMC, login again and retry once
+            with self._lock:
+                if self._client is client:
+                    try:
+                        self._login()
+                    except Exception as e:
+                        raise Exception("Login again to %s as %s failed: %s" % (self.login_host, self.login_account, e))
+                    _count_session_stat('relogins')
+                response = getattr(self._client, method)(*args, **kwargs)
+        self.last_used = time.time()
+        return response
+
+    def get(self, path, args=None, headers=None):
+        memo = self._memos.get(threading.get_ident())
+        if memo is None or headers:
+            return self._get(path, args, headers)
+        key = (path, json.dumps(args, sort_keys=True) if args else None)
+        if key in memo:
+            _count_session_stat('memo_hits')
+            status, text = memo[key]
+            return LocalRedfishResponse(status, json.loads(text), text=text)
+        response = self._get(path, args, headers)
+        if response.status == 200:
+            memo[key] = (response.status, response.text)
+        return response
+
+    def _get(self, path, args=None, headers=None):
+        if headers or RESPONSE_CACHE_MAX_ENTRIES <= 0:
+            return self._request('get', path, args, headers=headers)
+        # Bodies are cached per user, a resource read by an administrator may show more than another account may see
+        key = (self.login_host, self.login_account, path, json.dumps(args, sort_keys=True) if args else None)
+        cached = _response_cache_lookup(key)
+        if cached is None:
+            response = self._request('get', path, args)
+            _response_cache_store(key, response)
+            return response
+        # Revalidate the cached body, a 304 answer carries no body
+        etag, text = cached
+        _count_response_cache_stat('revalidations')
+        response = self._request('get', path, args, headers={'If-None-Match': etag})
+        if response.status == 304:
+            _count_response_cache_stat('hits')
+            _count_response_cache_stat('bytes_saved', len(text))
+            # Headers such as Retry-After and Location come from the fresh 304 answer, not the cached one
+            return LocalRedfishResponse(200, json.loads(text), {'ETag': etag}, text, header_source=response)
+        _response_cache_store(key, response)
+        return response
+
+    def head(self, *args, **kwargs):
+        return self._request('head', *args, **kwargs)
+
+    def post(self, path, *args, **kwargs):
+        self._forget(path)
+        return self._request('post', path, *args, **kwargs)
+
+    def put(self, path, *args, **kwargs):
+        self._forget(path)
+        return self._request('put', path, *args, **kwargs)
+
+    def patch(self, path, *args, **kwargs):
+        self._forget(path)
+        return self._request('patch', path, *args, **kwargs)
+
+    def delete(self, path, *args, **kwargs):
+        self._forget(path)
+        return self._request('delete', path, *args, **kwargs)
+
+    def _forget(self, path):
+        # A write to a resource makes its cached and memoized bodies stale
+        _response_cache_drop(self.login_host, path)
+        # Other threads memoizing the same client must not keep the old body either
+        for memo in list(self._memos.values()):
+            for key in [key for key in list(memo) if key[0] == path]:
+                memo.pop(key, None)
+
+    def logout(self):
+        """Release the client back to the pool, the session stays logged in"""
+        held_list = _get_held_clients()
+        if self in held_list:
+            held_list.remove(self)
+        with _session_pool_lock:
+            if self.in_use > 0:
+                self.in_use -= 1
+            retired = self.retired and self.in_use == 0
+        self.last_used = time.time()
+        if retired:
+            # Replaced in the pool after a credential change, the last user closes the old session
+            self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.logout()
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+# Bounds of the ETag response cache shared by all pooled clients(0 entries: disabled)
+RESPONSE_CACHE_MAX_ENTRIES = 1024
+RESPONSE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+_response_cache = collections.OrderedDict()
+_response_cache_lock = threading.Lock()
+_response_cache_stats = {'hits': 0, 'misses': 0, 'revalidations': 0, 'bytes_saved': 0, 'bytes': 0}
+
+
+def _response_cache_lookup(key):
+    # Returns (etag, text) and marks the entry as recently used
+    with _response_cache_lock:
+        cached = _response_cache.get(key)
+        if cached is None:
+            _response_cache_stats['misses'] += 1
+            return None
+        _response_cache.move_to_end(key)
+        return cached
+
+
+def _count_response_cache_stat(name, amount=1):
+    with _response_cache_lock:
+        _response_cache_stats[name] += amount
+
+
+def _response_cache_store(key, response):
+    # Keep successful responses carrying an ETag, evicting least recently used entries beyond the bounds
+    etag = None
+    if response.status == 200:
+        try:
+            etag = response.getheader('ETag')
+        except Exception:
+            etag = None
+    with _response_cache_lock:
+        old = _response_cache.pop(key, None)
+        if old is not None:
+            _response_cache_stats['bytes'] -= len(old[1])
+        if not etag:
+            return
+        text = response.text
+        if len(text) > RESPONSE_CACHE_MAX_BYTES:
+            return
+        _response_cache[key] = (etag, text)
+        _response_cache_stats['bytes'] += len(text)
+        while len(_response_cache) > RESPONSE_CACHE_MAX_ENTRIES or _response_cache_stats['bytes'] > RESPONSE_CACHE_MAX_BYTES:
+            _, evicted = _response_cache.popitem(last=False)
+            _response_cache_stats['bytes'] -= len(evicted[1])
+
+
+def _response_cache_drop(login_host, path):
+    # A write to a resource makes its cached body stale
+    with _response_cache_lock:
+        for key in [key for key in _response_cache if key[0] == login_host and key[2] == path]:
+            _response_cache_stats['bytes'] -= len(_response_cache.pop(key)[1])
+
+
+def get_response_cache_stats():
+    """Get ETag response cache counters
+    :returns: returns dict with hits(304 served from cache), misses, revalidations, bytes_saved, bytes and entries
+    """
+    with _response_cache_lock:
+        stats = dict(_response_cache_stats)
+        stats['entries'] = len(_response_cache)
+    return stats
+
+
+def get_redfish_client(login_host, login_account, login_password):
+    """Get a logged-in Redfish client from the session pool
+    :params login_host: BMC URL, such as https://10.10.10.10
+    :type login_host: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :returns: returns PooledRedfishClient, raises an exception when login failed
+    """
+    key = (login_host, login_account)
+    with _session_pool_lock:
+        _start_session_reaper()
+        stale_list = _pop_idle_sessions()
+        pooled = _session_pool.get(key)
+        if pooled is not None and pooled.login_password != login_password:
+            # Credential changed, the old session must not be handed out any more.
+            # Other threads may still be using it, then the last of them closes it in logout()
+            _session_pool.pop(key)
+            if pooled.in_use > 0:
+                pooled.retired = True
+            else:
+                stale_list.append(pooled)
+            pooled = None
+        if pooled is None:
+            pooled = PooledRedfishClient(login_host, login_account, login_password)
+            _session_pool[key] = pooled
+        pooled.in_use += 1
+    for stale in stale_list:
+        stale._close()
+    with pooled._lock:
+        if pooled._client is None:
+            try:
+                pooled._login()
+            except Exception:
+                with _session_pool_lock:
+                    pooled.in_use -= 1
+                    if _session_pool.get(key) is pooled:
+                        del _session_pool[key]
+                raise
+            _count_session_stat('misses')
+        else:
+            _count_session_stat('hits')
+    pooled.last_used = time.time()
+    _get_held_clients().append(pooled)
+    return pooled
+
+
+def _get_held_clients():
+    if not hasattr(_held_clients, 'client_list'):
+        _held_clients.client_list = []
+    return _held_clients.client_list
+
+
+def _release_held_clients():
+    # Release clients an example function left taken when it raised before its logout()
+    held_list = _get_held_clients()
+    while held_list:
+        held_list[-1].logout()
+
+
+def close_redfish_client(login_host, login_account):
+    """Logout and drop the pooled session of one BMC user, e.g. after its password changed
+    :params login_host: BMC URL, such as https://10.10.10.10
+    :type login_host: string
+    :params login_account: BMC user name
+    :type login_account: string
+    """
+    with _session_pool_lock:
+        pooled = _session_pool.pop((login_host, login_account), None)
+        if pooled is not None and pooled.in_use > 0:
+            # Other threads are still using it, the last of them closes it in logout()
+            pooled.retired = True
+            pooled = None
+    if pooled is not None:
+        pooled._close()
+
+
+def close_all_redfish_clients():
+    """Logout all pooled sessions, registered to run at process exit"""
+    with _session_pool_lock:
+        pooled_list = list(_session_pool.values())
+        _session_pool.clear()
+    for pooled in pooled_list:
+        pooled._close()
+
+
+@contextlib.contextmanager
+def memoize_gets(redfish_obj):
+    """Serve repeated GETs of the same URI from memory while the block runs,
+    so example functions walking the same BMC one after another fetch shared resources once.
+    The memo belongs to the calling thread, other threads sharing the pooled client are not served from it
+    :params redfish_obj: client from get_redfish_client
+    :type redfish_obj: PooledRedfishClient
+    """
+    thread_id = threading.get_ident()
+    if thread_id in redfish_obj._memos:
+        # Already inside memoize_gets for this client
+        yield redfish_obj
+        return
+    redfish_obj._memos[thread_id] = {}
+    try:
+        yield redfish_obj
+    finally:
+        redfish_obj._memos.pop(thread_id, None)
+
+
+def get_session_pool_stats():
+    """Get session pool counters
+    :returns: returns dict with hits, misses, relogins, logouts, memo_hits and open sessions
+    """
+    with _session_pool_lock:
+        stats = dict(_session_pool_stats)
+        stats['open'] = len(_session_pool)
+    return stats
+
+
+def _count_session_stat(name):
+    with _session_pool_lock:
+        _session_pool_stats[name] += 1
+
+
+def _start_session_reaper():
+    # Caller holds _session_pool_lock, idle sessions are logged out even when no further client is asked for
+    global _session_reaper
+    if _session_reaper is not None:
+        return
+    _session_reaper = threading.Thread(target=_reap_idle_sessions)
+    _session_reaper.daemon = True
+    _session_reaper.start()
+
+
+def _reap_idle_sessions():
+    while True:
+        time.sleep(max(SESSION_IDLE_TIMEOUT / 2.0, 1))
+        with _session_pool_lock:
+            idle_list = _pop_idle_sessions()
+        for pooled in idle_list:
+            pooled._close()
+
+
+def _pop_idle_sessions():
+    # Caller holds _session_pool_lock and logs the returned clients out after releasing it
+    now = time.time()
+    idle_list = []
+    for key in list(_session_pool):
+        pooled = _session_pool[key]
+        if pooled.in_use == 0 and now - pooled.last_used > SESSION_IDLE_TIMEOUT:
+            idle_list.append(_session_pool.pop(key))
+    return idle_list
+
+
+atexit.register(close_all_redfish_clients)
+
+
+def read_host_list(hosts):
+    """Get BMC address list from a host file or a comma separated host string
+    :params hosts: host file path(one host or CIDR per line, '#' starts a comment) or string like "10.10.10.10,10.10.20.0/24"
+    :type hosts: string
+    :returns: returns BMC address list
+    """
+    if os.path.isfile(hosts):
+        with open(hosts) as f:
+            entries = [line.split('#')[0].strip() for line in f]
+    else:
+        entries = [entry.strip() for entry in hosts.split(',')]
+    host_list = []
+    for entry in entries:
+        if not entry:
+            continue
+        if '/' in entry:
+            # Expand CIDR to every usable host address
+            network = ipaddress.ip_network(entry, strict=False)
+            if network.num_addresses == 1:
+                host_list.append(str(network.network_address))
+            else:
+                host_list.extend(str(address) for address in network.hosts())
+        else:
+            host_list.append(entry)
+    return host_list
+
+
+def _call_with_timeout(function, args, timeout, report):
+    # Run function in a daemon thread and report its result, or a timed out result after timeout seconds.
+    # The caller's pool slot stays taken until the thread really ends, so a hung BMC still counts against workers
+    outcome = {}
+
+    def target():
+        try:
+            outcome['result'] = function(*args)
+        except Exception as e:
+            outcome['result'] = {'ret': False, 'msg': "error_message: %s" % (e)}
+        finally:
+            _release_held_clients()
+
+    if not timeout:
+        target()
+        report(outcome['result'])
+        return
+    worker = threading.Thread(target=target)
+    worker.daemon = True
+    worker.start()
+    worker.join(timeout)
+    if not worker.is_alive():
+        report(outcome['result'])
+        return
+    report({'ret': False, 'timed_out': True, 'msg': "No response within %s seconds, the work may still be running on the BMC" % timeout})
+    worker.join()
+
+
+def get_result_state(result):
+    """Get the outcome of one host from its result
+    :params result: result of an example function, or the timed out result of run_on_hosts
+    :type result: dict
+    :returns: returns 'succeeded', 'failed' or 'timed_out'(the outcome is unknown, the work may still complete)
+    """
+    if isinstance(result, dict) and result.get('ret') is True:
+        return 'succeeded'
+    if isinstance(result, dict) and result.get('timed_out'):
+        return 'timed_out'
+    return 'failed'
+
+
+def run_on_hosts(function, host_list, args=(), workers=16, timeout=None):
+    """Run an example function against many BMCs concurrently
+    :params function: function called as function(ip, *args), such as get_fw_inventory with args (user, password)
+    :type function: callable
+    :params host_list: BMC address list
+    :type host_list: list
+    :params args: remaining positional arguments of function
+    :type args: tuple
+    :params workers: maximum number of BMCs handled at the same time, a timed out BMC keeps its worker until its call returns
+    :type workers: int
+    :params timeout: seconds to wait for one BMC before reporting it as timed out(None: no limit)
+    :type timeout: None or float
+    :returns: yields (ip, result, elapsed seconds) in completion order
+    """
+    records = queue.Queue()
+
+    def run(ip):
+        time_start = time.time()
+        _call_with_timeout(function, (ip,) + tuple(args), timeout,
+                           lambda result: records.put((ip, result, time.time() - time_start)))
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    futures = []
+    try:
+        futures = [executor.submit(run, ip) for ip in host_list]
+        for _ in host_list:
+            yield records.get()
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def run_fleet(host_list, function, args, workers, timeout, output=sys.stdout):
+    """Run function on every host and write one JSON line per host as soon as it finishes
+    :params host_list: BMC address list
+    :type host_list: list
+    :params function: entry function, async functions run on one event loop
+    :type function: callable
+    :params args: arguments following ip
+    :type args: tuple
+    :params workers: maximum number of BMCs handled at the same time
+    :type workers: int
+    :params timeout: seconds to wait for one BMC
+    :type timeout: float
+    :params output: JSON lines stream
+    :type output: file object
+    :returns: returns summary of the run
+    """
+    summary = {'succeeded': 0, 'failed': 0, 'timed_out': 0}
+    if inspect.iscoroutinefunction(function):
+        async def run_async():
+            async for record in run_on_hosts_async(function, host_list, args, workers, timeout):
+                write_fleet_record(record, summary, output)
+        asyncio.run(run_async())
+    else:
+        for record in run_on_hosts(function, host_list, args, workers, timeout):
+            write_fleet_record(record, summary, output)
+    return {'ret': summary['failed'] == 0 and summary['timed_out'] == 0, 'succeeded': summary['succeeded'],
+            'failed': summary['failed'], 'timed_out': summary['timed_out']}
+
+
+def write_fleet_record(record, summary, output):
+    """Write the result of one host as a JSON line and count it by get_result_state"""
+    ip, result, elapsed = record
+    summary[get_result_state(result)] += 1
+    output.write(json.dumps({'host': ip, 'elapsed': round(elapsed, 3), 'result': result}, sort_keys=True, default=str) + '\n')
+    output.flush()
+
+
+class BandwidthLimiter(object):
+    """Token bucket shared by many transfers, keeping their total rate under a bytes per second cap.
+    A transfer that takes more than the bucket holds sleeps off its debt, so the others slow down with it.
+    """
+
+    def __init__(self, bytes_per_second, burst=None):
+        """
+        :params bytes_per_second: total rate cap
+        :type bytes_per_second: float
+        :params burst: bytes that may pass at full speed after an idle period(None: one second worth)
+        :type burst: None or float
+        """
+        self.rate = float(bytes_per_second)
+        self.burst = float(burst or bytes_per_second)
+        self._tokens = self.burst
+        self._time = time.time()
+        self._lock = threading.Lock()
+
+    def consume(self, size):
+        """Count size bytes against the cap, sleeping as long as needed to stay under it, returns the seconds slept"""
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens + (now - self._time) * self.rate)
+            self._time = now
+            self._tokens -= size
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+def create_transfer_session(login_host, login_account, login_password, session):
+    """Create a Redfish session for streaming a file to or from the BMC with requests, its token and location are stored in session
+    :params login_host: BMC URL, such as https://10.10.10.10
+    :type login_host: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params session: dict receiving token and location
+    :type session: dict
+    :returns: returns session result
+    """
+    import requests
+    session_uri = login_host + "/redfish/v1/SessionService/Sessions/"
+    body = {"UserName": login_account, "Password": login_password}
+    headers = {"Content-Type": "application/json"}
+    try:
+        response_session_uri = requests.post(session_uri, data=json.dumps(body), headers=headers, verify=False, timeout=60)
+    except requests.exceptions.RequestException as e:
+        return {'ret': False, 'msg': "error_message: %s" % (e)}
+    if response_session_uri.status_code != 201:
+        return {'ret': False, 'msg': "Url '%s' response Error code %s" % (session_uri, response_session_uri.status_code)}
+    session['token'] = response_session_uri.headers['X-Auth-Token']
+    session['location'] = response_session_uri.headers['Location']
+    return {'ret': True}
+
+
+def write_progress(progress, size, total):
+    """Write the transferred size, and the percentage when the total size is known, over the previous progress line"""
+    if total:
+        progress.write('\r%.1f/%.1f MB %3d%%' % (size / 1048576.0, total / 1048576.0, size * 100 // total))
+    else:
+        progress.write('\r%.1f MB' % (size / 1048576.0))
+    progress.flush()
+
+
+# Seconds between polls of a task when the BMC sends no Retry-After, doubled while the task makes no progress
+TASK_POLL_INTERVAL = 2
+TASK_POLL_MAX_INTERVAL = 30
+# Maximum number of task GETs in flight, the scheduling itself runs on one thread for all tasks
+TASK_POLL_WORKERS = 8
+# Consecutive failed polls after which a task is reported as failed
+TASK_POLL_ERRORS = 5
+TASK_FINAL_STATES = ['Completed', 'Exception', 'Killed', 'Cancelled']
+# Seconds wait_for_task waits for a task by default
+TASK_WAIT_TIMEOUT = 7200
+# Seconds a BMC may stay unreachable, or answer 404 for the task, while it restarts after a flash
+TASK_REBOOT_GRACE = 600
+
+_task_monitor = None
+_task_monitor_lock = threading.Lock()
+
+
+class TaskMonitor(object):
+    """Poll long-running BMC tasks, on one or many BMCs, until they finish.
+    One scheduler thread keeps every task in a queue ordered by its next poll time,
+    the next poll is set by the Retry-After header or by a backoff with jitter that resets when PercentComplete moves.
+    """
+
+    def __init__(self, workers=None):
+        """
+        :params workers: maximum number of task GETs in flight(None: TASK_POLL_WORKERS)
+        :type workers: None or int
+        """
+        self._queue = []
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers or TASK_POLL_WORKERS)
+        scheduler = threading.Thread(target=self._schedule_loop)
+        scheduler.daemon = True
+        scheduler.start()
+
+    def add(self, redfish_obj, task_uri, timeout=None, progress=None, reboot_grace=None):
+        """Start monitoring a task
+        :params redfish_obj: logged-in redfish client
+        :type redfish_obj: redfish client object
+        :params task_uri: URL of the Task resource or task monitor
+        :type task_uri: string
+        :params timeout: seconds to wait for the task to finish(None: no limit)
+        :type timeout: None or float
+        :params progress: called as progress(task_uri, percent_complete, task_state) when the task changes
+        :type progress: None or callable
+        :params reboot_grace: seconds connection errors and 404 answers are tolerated while the BMC restarts(None: not tolerated)
+        :type reboot_grace: None or float
+        :returns: returns future whose result is the task result, see wait_for_task
+        """
+        task = {'redfish_obj': redfish_obj, 'uri': task_uri, 'progress': progress, 'future': concurrent.futures.Future(),
+                'deadline': time.time() + timeout if timeout else None, 'interval': TASK_POLL_INTERVAL,
+                'percent': None, 'state': None, 'errors': 0, 'reboot_grace': reboot_grace, 'outage_start': None}
+        self._schedule(task, 0)
+        return task['future']
+
+    def _schedule(self, task, delay):
+        with self._condition:
+            self._sequence += 1
+            heapq.heappush(self._queue, (time.time() + delay, self._sequence, task))
+            self._condition.notify()
+
+    def _schedule_loop(self):
+        while True:
+            with self._condition:
+                while not self._queue or self._queue[0][0] > time.time():
+                    self._condition.wait(self._queue[0][0] - time.time() if self._queue else None)
+                task = heapq.heappop(self._queue)[2]
+            self._executor.submit(self._poll, task)
+
+    def _poll(self, task):
+        # Whatever goes wrong, the future is resolved, wait_for_task must never wait on a task nobody polls
+        try:
+            self._poll_once(task)
+        except Exception as e:
+            if not task['future'].done():
+                task['future'].set_result({'ret': False, 'task_state': task['state'], 'percent_complete': task['percent'],
+                                           'msg': "Failed to poll task %s: %s" % (task['uri'], e)})
+
+    def _poll_once(self, task):
+        retry_after = None
+        try:
+            response = task['redfish_obj'].get(task['uri'], None)
+            retry_after = parse_retry_after(response.getheader('Retry-After'))
+            status = response.status
+            body = response.dict if response.text else {}
+        except Exception as e:
+            status, body, error = None, {}, "error_message: %s" % (e)
+        if not isinstance(body, dict):
+            body = {}
+        if status in [200, 201, 202]:
+            task['errors'] = 0
+            task['outage_start'] = None
+            state = body.get('TaskState')
+            if state is None and status != 202:
+                # A task monitor returns the resource the task produced once it is done
+                state = 'Completed'
+            percent = body.get('PercentComplete', task['percent'])
+            if (percent, state) != (task['percent'], task['state']):
+                if percent != task['percent']:
+                    task['interval'] = TASK_POLL_INTERVAL
+                task['percent'], task['state'] = percent, state
+                if task['progress'] is not None:
+                    task['progress'](task['uri'], percent, state)
+            else:
+                task['interval'] = min(task['interval'] * 2, TASK_POLL_MAX_INTERVAL)
+            if state in TASK_FINAL_STATES:
+                result = {'ret': state == 'Completed', 'task_state': state, 'percent_complete': percent, 'entries': body}
+                if state != 'Completed':
+                    messages = [message.get('Message', '') for message in body.get('Messages', [])]
+                    result['msg'] = "Task %s ended in state %s %s" % (task['uri'], state, ' '.join(messages))
+                task['future'].set_result(result)
+                return
+        elif self._in_reboot_grace(task, status):
+            # The BMC restarts after a flash, it drops connections and answers 404 until the task service is back
+            task['interval'] = min(task['interval'] * 2, TASK_POLL_MAX_INTERVAL)
+        else:
+            task['errors'] += 1
+            if status is not None:
+                error = "Url '%s' response Error code %s \nerror_message: %s" % (task['uri'], status, get_extended_error(response))
+            if task['outage_start'] is not None:
+                error = "BMC did not come back within %s seconds, %s" % (task['reboot_grace'], error)
+            if task['errors'] >= TASK_POLL_ERRORS or status in [401, 403, 404]:
+                task['future'].set_result({'ret': False, 'task_state': task['state'], 'percent_complete': task['percent'], 'msg': error})
+                return
+            task['interval'] = min(task['interval'] * 2, TASK_POLL_MAX_INTERVAL)
+        if task['deadline'] and time.time() >= task['deadline']:
+            task['future'].set_result({'ret': False, 'timed_out': True, 'task_state': task['state'], 'percent_complete': task['percent'],
+                                       'msg': "Task %s did not finish in time, last state %s" % (task['uri'], task['state'])})
+            return
+        if retry_after is not None:
+            delay = retry_after
+        else:
+            # Jitter keeps tasks started together from polling in step
+            delay = task['interval'] * random.uniform(0.8, 1.2)
+        if task['deadline']:
+            delay = min(delay, max(task['deadline'] - time.time(), 0))
+        self._schedule(task, delay)
+
+    def _in_reboot_grace(self, task, status):
+        if not task['reboot_grace'] or status not in [None, 404, 503]:
+            return False
+        if task['outage_start'] is None:
+            task['outage_start'] = time.time()
+        return time.time() - task['outage_start'] < task['reboot_grace']
+
+
+def parse_retry_after(value):
+    """Get seconds to wait from a Retry-After header value, either seconds or an HTTP date(None: no usable value)"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_task_monitor():
+    """Get the TaskMonitor shared by all threads of this process"""
+    global _task_monitor
+    with _task_monitor_lock:
+        if _task_monitor is None:
+            _task_monitor = TaskMonitor()
+        return _task_monitor
+
+
+def get_task_uri(response):
+    """Get the task to monitor from the response of a request the BMC runs as a task
+    :params response: response of the POST/PATCH, usually status 202
+    :type response: redfish response object
+    :returns: returns URL of the Task resource or task monitor, None when the response names no task
+    """
+    body = response.dict if response.text else {}
+    if 'TaskState' in body and '@odata.id' in body:
+        return body['@odata.id']
+    return response.getheader('Location') or body.get('@odata.id')
+
+
+def wait_for_task(redfish_obj, task_uri, timeout=TASK_WAIT_TIMEOUT, progress=None, reboot_grace=None):
+    """Wait until a BMC task finishes, polled by the shared TaskMonitor
+    :params redfish_obj: logged-in redfish client
+    :type redfish_obj: redfish client object
+    :params task_uri: URL of the Task resource or task monitor
+    :type task_uri: string
+    :params timeout: seconds to wait for the task to finish(None: no limit)
+    :type timeout: None or float
+    :params progress: called as progress(task_uri, percent_complete, task_state) when the task changes
+    :type progress: None or callable
+    :params reboot_grace: seconds the BMC may be unreachable or answer 404 for the task, such as TASK_REBOOT_GRACE after a BMC flash(None: not tolerated)
+    :type reboot_grace: None or float
+    :returns: returns final task resource(entries) and task_state when completed or error message when failed, timed_out is set when the task may still be running
+    """
+    future = get_task_monitor().add(redfish_obj, task_uri, timeout, progress, reboot_grace)
+    try:
+        # The monitor resolves the future at the deadline, the margin covers one poll that is still running then
+        return future.result(timeout + TASK_POLL_MAX_INTERVAL + 60 if timeout else None)
+    except concurrent.futures.TimeoutError:
+        return {'ret': False, 'timed_out': True, 'task_state': None, 'percent_complete': None, 'msg': "Task %s did not finish in time" % task_uri}
+
+
+# Maximum number of member GETs in flight to one BMC
+MEMBER_FETCH_WORKERS = 4
+
+
+def get_members(redfish_obj, members, workers=None, select=None):
+    """GET collection members concurrently
+    :params redfish_obj: logged-in redfish client
+    :type redfish_obj: redfish client object
+    :params members: Members list of a collection resource
+    :type members: list
+    :params workers: maximum number of member GETs in flight to this BMC(None: MEMBER_FETCH_WORKERS)
+    :type workers: None or int
+    :params select: properties the caller reads, sent as $select when the service supports it(None: all)
+    :type select: None or list
+    :returns: returns responses in the same order as members
+    """
+    if workers is None:
+        workers = MEMBER_FETCH_WORKERS
+    responses = [None] * len(members)
+    pending = []
+    for index, member in enumerate(members):
+        if len(member) > 1:
+            # Already expanded by get_collection, no request needed
+            responses[index] = LocalRedfishResponse(200, member)
+        else:
+            pending.append(index)
+    if not pending:
+        return responses
+    args = None
+    if select and get_protocol_features(redfish_obj).get('SelectQuery'):
+        args = {'$select': ','.join(select)}
+
+    def get_member(index):
+        responses[index] = redfish_obj.get(members[index]['@odata.id'], args)
+
+    if workers <= 1 or len(pending) <= 1:
+        for index in pending:
+            get_member(index)
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+            list(executor.map(get_member, pending))
+    return responses
+
+
+def get_collection(redfish_obj, collection_url):
+    """GET a resource collection, with all members expanded in the same request when the service supports $expand
+    :params redfish_obj: logged-in redfish client
+    :type redfish_obj: redfish client object
+    :params collection_url: URL of the collection resource
+    :type collection_url: string
+    :returns: returns collection response, pass its Members to get_members
+    """
+    if not get_protocol_features(redfish_obj).get('ExpandQuery', {}).get('NoLinks'):
+        return redfish_obj.get(collection_url, None)
+    response_collection = redfish_obj.get(collection_url, {'$expand': '.'})
+    if response_collection.status != 200:
+        # Some services reject the query on particular collections, fall back to a plain GET
+        return redfish_obj.get(collection_url, None)
+    collection = response_collection.dict
+    if 'Members@odata.nextLink' not in collection:
+        return response_collection
+    # Follow the pages so callers see every member
+    while 'Members@odata.nextLink' in collection:
+        response_next = redfish_obj.get(collection.pop('Members@odata.nextLink'), None)
+        if response_next.status != 200:
+            return response_next
+        collection['Members'].extend(response_next.dict.get('Members', []))
+        if 'Members@odata.nextLink' in response_next.dict:
+            collection['Members@odata.nextLink'] = response_next.dict['Members@odata.nextLink']
+    return LocalRedfishResponse(200, collection)
+
+
+def iter_members(redfish_obj, collection_url, top=None, skip=0, query=None):
+    """Yield the members of a collection one by one, following Members@odata.nextLink or $skip/$top pages,
+    so only one page is held in memory however large the collection is
+    :params redfish_obj: logged-in redfish client
+    :type redfish_obj: redfish client object
+    :params collection_url: URL of the collection resource
+    :type collection_url: string
+    :params top: page size requested with $top when the service supports it(None: service default pages)
+    :type top: None or int
+    :params skip: number of leading members to skip with $skip, the caller checks the service supports it
+    :type skip: int
+    :params query: other query parameters for the first page, such as $filter
+    :type query: None or dict
+    :returns: yields member resources, raises an exception when a page or member can not be read
+    """
+    use_top_skip = bool(top) and get_protocol_features(redfish_obj).get('TopSkipQuery', False)
+    url = collection_url
+    args = dict(query or {})
+    if use_top_skip:
+        args['$top'] = top
+    if skip:
+        args['$skip'] = skip
+    args = args or None
+    count = skip
+    while url:
+        response = redfish_obj.get(url, args)
+        if response.status != 200:
+            raise Exception("Url '%s' response Error code %s \nerror_message: %s" % (url, response.status, get_extended_error(response)))
+        page = response.dict
+        members = page.get('Members', [])
+        for member in members:
+            if len(member) > 1:
+                yield member
+                continue
+            # Link-only member, GET the resource itself
+            response_member = redfish_obj.get(member['@odata.id'], None)
+            if response_member.status != 200:
+                raise Exception("Url '%s' response Error code %s" % (member['@odata.id'], response_member.status))
+            yield response_member.dict
+        count += len(members)
+        if 'Members@odata.nextLink' in page:
+            url = page['Members@odata.nextLink']
+            args = None
+        elif use_top_skip and members and count < page.get('Members@odata.count', 0):
+            url = collection_url
+            args = dict(query or {})
+            args.update({'$top': top, '$skip': count})
+        else:
+            url = None
+
+
+def get_protocol_features(redfish_obj):
+    """Get ProtocolFeaturesSupported of the Service Root, read once per BMC
+    :params redfish_obj: logged-in redfish client
+    :type redfish_obj: redfish client object
+    :returns: returns ProtocolFeaturesSupported dict, empty when the service does not report it
+    """
+    response_base_url = get_navigation(redfish_obj, '/redfish/v1')
+    if response_base_url.status != 200:
+        return {}
+    return response_base_url.dict.get('ProtocolFeaturesSupported', {})
+
+
+# Seconds navigation links are reused before they are read from the BMC again
+NAVIGATION_CACHE_TTL = 3600
+# File keeping navigation links between runs(None: memory only), see [CacheCfg] in config.ini
+NAVIGATION_CACHE_FILE = None
+
+# Properties kept whole in the navigation cache
+NAVIGATION_PROPERTIES = ['@odata.id', 'Id', 'Members@odata.count', 'Actions', 'ProtocolFeaturesSupported']
+
+_navigation_cache = {}
+_navigation_cache_lock = threading.Lock()
+_navigation_cache_state = {'loaded': False, 'dirty': False}
+
+
+def get_navigation(redfish_obj, url):
+    """GET a resource for its navigation links only, served from the per-BMC navigation cache when fresh.
+    Use it for Service Root, Systems/Managers/Chassis collections and resources read for Links, Oem links or Actions only.
+    :params redfish_obj: logged-in redfish client
+    :type redfish_obj: redfish client object
+    :params url: URL of the resource
+    :type url: string
+    :returns: returns response whose dict keeps @odata.id links, Members, Actions and ProtocolFeaturesSupported of the resource
+    """
+    bmc = getattr(redfish_obj, 'login_host', None)
+    if bmc is None:
+        response = redfish_obj.get(url, None)
+        if response.status != 200:
+            return response
+        return LocalRedfishResponse(200, _navigation_properties(response.dict))
+    with _navigation_cache_lock:
+        _load_navigation_cache()
+        cached = _navigation_cache.get(bmc, {}).get(url)
+    if cached is not None and time.time() - cached[0] < NAVIGATION_CACHE_TTL:
+        return LocalRedfishResponse(200, cached[1])
+    response = redfish_obj.get(url, None)
+    if response.status != 200:
+        return response
+    navigation = _navigation_properties(response.dict)
+    with _navigation_cache_lock:
+        _navigation_cache.setdefault(bmc, {})[url] = [time.time(), navigation]
+        _navigation_cache_state['dirty'] = True
+    return LocalRedfishResponse(200, navigation)
+
+
+def invalidate_navigation_cache(login_host=None, url=None):
+    """Drop cached navigation links
+    :params login_host: BMC URL, such as https://10.10.10.10(None: all BMCs)
+    :type login_host: None or string
+    :params url: resource URL(None: all resources of the BMC)
+    :type url: None or string
+    """
+    with _navigation_cache_lock:
+        _load_navigation_cache()
+        if login_host is None:
+            _navigation_cache.clear()
+        elif url is None:
+            _navigation_cache.pop(login_host, None)
+        else:
+            _navigation_cache.get(login_host, {}).pop(url, None)
+        _navigation_cache_state['dirty'] = True
+
+
+def _navigation_properties(resource):
+    # Keep links and the properties in NAVIGATION_PROPERTIES, drop everything else
+    navigation = {}
+    for name, value in resource.items():
+        if name in NAVIGATION_PROPERTIES:
+            navigation[name] = value
+        elif isinstance(value, dict):
+            if '@odata.id' in value:
+                navigation[name] = {'@odata.id': value['@odata.id']}
+            else:
+                nested = _navigation_properties(value)
+                if nested:
+                    navigation[name] = nested
+        elif isinstance(value, list) and value and all(isinstance(item, dict) and '@odata.id' in item for item in value):
+            navigation[name] = [{'@odata.id': item['@odata.id']} for item in value]
+    return navigation
+
+
+def _load_navigation_cache():
+    # Caller holds _navigation_cache_lock
+    if _navigation_cache_state['loaded']:
+        return
+    _navigation_cache_state['loaded'] = True
+    if NAVIGATION_CACHE_FILE and os.path.isfile(NAVIGATION_CACHE_FILE):
+        try:
+            with open(NAVIGATION_CACHE_FILE) as f:
+                _navigation_cache.update(json.load(f))
+        except (IOError, ValueError):
+            # A broken cache file only costs the discovery GETs
+            pass
+
+
+def save_navigation_cache():
+    """Write the navigation cache to NAVIGATION_CACHE_FILE, registered to run at process exit"""
+    with _navigation_cache_lock:
+        if not NAVIGATION_CACHE_FILE or not _navigation_cache_state['dirty']:
+            return
+        # Drop expired entries so the file does not grow forever
+        now = time.time()
+        for bmc in list(_navigation_cache):
+            for url in list(_navigation_cache[bmc]):
+                if now - _navigation_cache[bmc][url][0] >= NAVIGATION_CACHE_TTL:
+                    del _navigation_cache[bmc][url]
+            if not _navigation_cache[bmc]:
+                del _navigation_cache[bmc]
+        temp_file = "%s.%s.tmp" % (NAVIGATION_CACHE_FILE, os.getpid())
+        try:
+            with open(temp_file, 'w') as f:
+                json.dump(_navigation_cache, f)
+            os.replace(temp_file, NAVIGATION_CACHE_FILE)
+            _navigation_cache_state['dirty'] = False
+        except (IOError, OSError) as e:
+            sys.stderr.write("Failed to save navigation cache %s: %s\n" % (NAVIGATION_CACHE_FILE, e))
+
+
+atexit.register(save_navigation_cache)
+
+
+# Directory keeping BIOS attribute registry indexes between runs(None: memory only), see [CacheCfg] in config.ini
+BIOS_REGISTRY_CACHE_DIR = None
+
+# AttributeRegistry properties kept in the index, by attribute name
+BIOS_REGISTRY_PROPERTIES = ['Type', 'ReadOnly', 'LowerBound', 'UpperBound', 'ScalarIncrement', 'MinLength', 'MaxLength', 'ValueExpression']
+
+_bios_registry_cache = {}
+_bios_registry_cache_lock = threading.Lock()
+
+
+def get_bios_registry(redfish_obj, system_url):
+    """Get the BIOS attribute registry index of a system, downloaded once per model and BIOS version
+    :params redfish_obj: logged-in redfish client
+    :type redfish_obj: redfish client object
+    :params system_url: ComputerSystem URL
+    :type system_url: string
+    :returns: returns index of attribute definitions by attribute name(None: the BMC publishes no registry) when succeeded or error message when failed
+    """
+    response_system_url = redfish_obj.get(system_url, None)
+    if response_system_url.status != 200:
+        return {'ret': False, 'msg': "Url '%s' response Error code %s" % (system_url, response_system_url.status)}
+    model = response_system_url.dict.get('Model')
+    bios_version = response_system_url.dict.get('BiosVersion')
+    # Without both, unrelated systems would share one entry, such a registry is not cached
+    key = "%s_%s" % (model, bios_version) if model and bios_version else None
+    index = None
+    if key is not None:
+        with _bios_registry_cache_lock:
+            index = _bios_registry_cache.get(key)
+        if index is None:
+            index = _load_bios_registry(key)
+    if index is not None:
+        return {'ret': True, 'registry': index}
+
+    # Find the registry named by the Bios resource and download it
+    bios_url = response_system_url.dict['Bios']['@odata.id']
+    response_bios_url = redfish_obj.get(bios_url, None)
+    if response_bios_url.status != 200:
+        return {'ret': False, 'msg': "Url '%s' response Error code %s" % (bios_url, response_bios_url.status)}
+    registry_name = response_bios_url.dict.get('AttributeRegistry')
+    if not registry_name:
+        return {'ret': True, 'registry': None}
+    response_registries = get_navigation(redfish_obj, '/redfish/v1/Registries')
+    if response_registries.status != 200:
+        return {'ret': True, 'registry': None}
+    registry_uri = None
+    for member in response_registries.dict.get('Members', []):
+        if member['@odata.id'].rstrip('/').split('/')[-1] != registry_name:
+            continue
+        response_file = redfish_obj.get(member['@odata.id'], None)
+        if response_file.status == 200:
+            for location in response_file.dict.get('Location', []):
+                if 'Uri' in location:
+                    registry_uri = location['Uri']
+                    break
+    if registry_uri is None:
+        return {'ret': True, 'registry': None}
+    response_registry = redfish_obj.get(registry_uri, None)
+    if response_registry.status != 200:
+        return {'ret': False, 'msg': "Url '%s' response Error code %s" % (registry_uri, response_registry.status)}
+    index = {'@Registry': registry_name}
+    for attribute in response_registry.dict.get('RegistryEntries', {}).get('Attributes', []):
+        entry = dict((name, attribute[name]) for name in BIOS_REGISTRY_PROPERTIES if attribute.get(name) is not None)
+        if 'Value' in attribute:
+            entry['Values'] = [value['ValueName'] for value in attribute['Value'] if 'ValueName' in value]
+        index[attribute['AttributeName']] = entry
+    if key is not None:
+        with _bios_registry_cache_lock:
+            _bios_registry_cache[key] = index
+        _save_bios_registry(key, index)
+    return {'ret': True, 'registry': index}
+
+
+def _bios_registry_file(key):
+    return os.path.join(BIOS_REGISTRY_CACHE_DIR, re.sub(r'[^A-Za-z0-9_.-]', '_', key) + '.json')
+
+
+def _load_bios_registry(key):
+    # A registry never changes for one BIOS version, the file is used whatever its age
+    if not BIOS_REGISTRY_CACHE_DIR or not os.path.isfile(_bios_registry_file(key)):
+        return None
+    try:
+        with open(_bios_registry_file(key)) as f:
+            index = json.load(f)
+    except (IOError, ValueError):
+        return None
+    with _bios_registry_cache_lock:
+        _bios_registry_cache[key] = index
+    return index
+
+
+def _save_bios_registry(key, index):
+    if not BIOS_REGISTRY_CACHE_DIR:
+        return
+    temp_file = "%s.%s.tmp" % (_bios_registry_file(key), os.getpid())
+    try:
+        if not os.path.isdir(BIOS_REGISTRY_CACHE_DIR):
+            os.makedirs(BIOS_REGISTRY_CACHE_DIR)
+        with open(temp_file, 'w') as f:
+            json.dump(index, f, separators=(',', ':'))
+        os.replace(temp_file, _bios_registry_file(key))
+    except (IOError, OSError) as e:
+        sys.stderr.write("Failed to save BIOS registry %s: %s\n" % (key, e))
+
+
+def validate_bios_attributes(registry, attributes):
+    """Check Bios attribute names and values against a registry index before they are sent.
+    String values of Integer and Boolean attributes, as given on the command line, are converted.
+    :params registry: index from get_bios_registry
+    :type registry: dict
+    :params attributes: attribute values by attribute name
+    :type attributes: dict
+    :returns: returns converted attributes when all are valid or the list of problems when not
+    """
+    errors = []
+    converted = {}
+    for name, value in attributes.items():
+        entry = registry.get(name) if name != '@Registry' else None
+        if entry is None:
+            errors.append("%s is not a Bios attribute" % name)
+            continue
+        if entry.get('ReadOnly'):
+            errors.append("%s is read only" % name)
+            continue
+        attribute_type = entry.get('Type')
+        if attribute_type == 'Integer':
+            if isinstance(value, str) and re.match(r'^-?\d+$', value.strip()):
+                value = int(value)
+            if not isinstance(value, int) or isinstance(value, bool):
+                errors.append("%s must be an integer, got %r" % (name, value))
+                continue
+            if 'LowerBound' in entry and value < entry['LowerBound'] or 'UpperBound' in entry and value > entry['UpperBound']:
+                errors.append("%s must be between %s and %s, got %s" % (name, entry.get('LowerBound'), entry.get('UpperBound'), value))
+                continue
+            if entry.get('ScalarIncrement') and (value - entry.get('LowerBound', 0)) % entry['ScalarIncrement']:
+                errors.append("%s must be a multiple of %s, got %s" % (name, entry['ScalarIncrement'], value))
+                continue
+        elif attribute_type == 'Boolean':
+            if isinstance(value, str) and value.lower() in ['true', 'false']:
+                value = value.lower() == 'true'
+            if not isinstance(value, bool):
+                errors.append("%s must be true or false, got %r" % (name, value))
+                continue
+        elif attribute_type == 'Enumeration':
+            if value not in entry.get('Values', [value]):
+                errors.append("%s must be one of %s, got %r" % (name, ', '.join(entry['Values']), value))
+                continue
+        elif attribute_type in ['String', 'Password']:
+            if not isinstance(value, str):
+                errors.append("%s must be a string, got %r" % (name, value))
+                continue
+            if len(value) < entry.get('MinLength', 0) or 'MaxLength' in entry and len(value) > entry['MaxLength']:
+                errors.append("%s must be %s to %s characters long" % (name, entry.get('MinLength', 0), entry.get('MaxLength')))
+                continue
+            if entry.get('ValueExpression'):
+                try:
+                    matched = re.match('(?:%s)\\Z' % entry['ValueExpression'], value)
+                except re.error:
+                    # The BMC may use a dialect Python can not compile, leave the check to the BMC
+                    matched = True
+                if not matched:
+                    errors.append("%s does not match %s" % (name, entry['ValueExpression']))
+                    continue
+        converted[name] = value
+    if errors:
+        return {'ret': False, 'msg': "Invalid Bios attributes: %s" % '; '.join(errors), 'errors': errors}
+    return {'ret': True, 'attributes': converted}
+
+
+class LocalRedfishResponse(object):
+    """Response built from data already at hand, such as an expanded collection member"""
+
+    def __init__(self, status, body, headers=None, text=None, header_source=None):
+        self.status = status
+        self.dict = body
+        self._text = text
+        self._headers = headers or {}
+        self._header_source = header_source
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = json.dumps(self.dict)
+        return self._text
+
+    def getheader(self, name):
+        if name in self._headers or self._header_source is None:
+            return self._headers.get(name)
+        return self._header_source.getheader(name)
+
+
+class AsyncRedfishResponse(object):
+    """Response of AsyncRedfishClient, exposing status, dict, text and getheader like the redfish library"""
+
+    def __init__(self, status, headers, text):
+        self.status = status
+        self.text = text
+        self._headers = headers
+        self._dict = None
+
+    @property
+    def dict(self):
+        if self._dict is None:
+            try:
+                self._dict = json.loads(self.text) if self.text else {}
+            except ValueError:
+                self._dict = {}
+        return self._dict
+
+    def getheader(self, name):
+        return self._headers.get(name)
+
+
+class AsyncRedfishClient(object):
+    """asyncio Redfish client with the get/post/patch/put/delete surface of the redfish library.
+    Requests are coroutines, so many of them, on one or many BMCs, can be in flight on one event loop.
+    Requires the aiohttp package.
+    """
+
+    def __init__(self, login_host, login_account, login_password, limit=8, timeout=60):
+        """
+        :params login_host: BMC URL, such as https://10.10.10.10
+        :type login_host: string
+        :params login_account: BMC user name
+        :type login_account: string
+        :params login_password: BMC user password
+        :type login_password: string
+        :params limit: maximum number of connections to this BMC
+        :type limit: int
+        :params timeout: seconds to wait for one request
+        :type timeout: float
+        """
+        self.login_host = login_host
+        self.login_account = login_account
+        self.login_password = login_password
+        self.limit = limit
+        self.timeout = timeout
+        self._http = None
+        self._token = None
+        self._session_location = None
+
+    async def login(self):
+        """Create a Redfish session, raises an exception when login failed"""
+        import aiohttp
+        connector = aiohttp.TCPConnector(limit=self.limit, ssl=False)
+        self._http = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        body = {"UserName": self.login_account, "Password": self.login_password}
+        try:
+            response = await self.post('/redfish/v1/SessionService/Sessions', body=body)
+            if response.status not in [200, 201]:
+                raise Exception("Login failed, error code %s \nerror_message: %s" % (response.status, get_extended_error(response)))
+        except BaseException:
+            # Close the connector of a failed login, nothing else will
+            await self._http.close()
+            self._http = None
+            raise
+        self._token = response.getheader('X-Auth-Token')
+        self._session_location = response.getheader('Location')
+
+    async def logout(self):
+        """Delete the Redfish session and close the connections"""
+        if self._http is None:
+            return
+        try:
+            if self._session_location:
+                await self.delete(self._session_location)
+        except Exception:
+            pass
+        finally:
+            await self._http.close()
+            self._http = None
+            self._token = None
+
+    async def _request(self, method, path, args=None, body=None, headers=None):
+        if path.startswith('/'):
+            url = self.login_host + path
+        else:
+            url = path
+        request_headers = {"Content-Type": "application/json"}
+        if self._token:
+            request_headers["X-Auth-Token"] = self._token
+        if headers:
+            request_headers.update(headers)
+        data = None
+        if body is not None:
+            data = body if isinstance(body, (str, bytes)) else json.dumps(body)
+        async with self._http.request(method, url, params=args, data=data, headers=request_headers) as response:
+            text = await response.text()
+            return AsyncRedfishResponse(response.status, response.headers.copy(), text)
+
+    async def get(self, path, args=None, headers=None):
+        return await self._request('GET', path, args=args, headers=headers)
+
+    async def post(self, path, args=None, body=None, headers=None):
+        return await self._request('POST', path, args=args, body=body, headers=headers)
+
+    async def patch(self, path, args=None, body=None, headers=None):
+        return await self._request('PATCH', path, args=args, body=body, headers=headers)
+
+    async def put(self, path, args=None, body=None, headers=None):
+        return await self._request('PUT', path, args=args, body=body, headers=headers)
+
+    async def delete(self, path, args=None, headers=None):
+        return await self._request('DELETE', path, args=args, headers=headers)
+
+
+async def get_system_url_async(base_url, system_id, redfish_obj):
+    """Get ComputerSystem instance URL with an AsyncRedfishClient
+    :params base_url: URL of the Redfish Service Root
+    :type base_url: string
+    :params system_id: ComputerSystem instance id(None: first instance, All: all instances)
+    :type system_id: None or string
+    :params redfish_obj: logged-in asyncio Redfish client
+    :type redfish_obj: AsyncRedfishClient
+    :returns: returns string URL list to ComputerSystem resource
+    """
+    response_base_url = await redfish_obj.get(base_url, None)
+    systems_url = response_base_url.dict["Systems"]["@odata.id"]
+    response_systems_url = await redfish_obj.get(systems_url, None)
+    return select_system_url(response_systems_url.dict["Members"], system_id)
+
+
+async def get_members_async(redfish_obj, members):
+    """GET all collection members at once with an AsyncRedfishClient
+    :params redfish_obj: logged-in asyncio Redfish client
+    :type redfish_obj: AsyncRedfishClient
+    :params members: Members list of a collection resource
+    :type members: list
+    :returns: returns responses in the same order as members
+    """
+    return await asyncio.gather(*[redfish_obj.get(member['@odata.id'], None) for member in members])
+
+
+async def run_on_hosts_async(coroutine_function, host_list, args=(), concurrency=256, timeout=None):
+    """Run an async example function against many BMCs on one event loop
+    :params coroutine_function: async function called as coroutine_function(ip, *args), such as get_cpu_info_async
+    :type coroutine_function: coroutine function
+    :params host_list: BMC address list
+    :type host_list: list
+    :params args: remaining positional arguments of coroutine_function
+    :type args: tuple
+    :params concurrency: maximum number of BMCs handled at the same time
+    :type concurrency: int
+    :params timeout: seconds to wait for one BMC(None: no limit)
+    :type timeout: None or float
+    :returns: yields (ip, result, elapsed seconds) in completion order
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(ip):
+        async with semaphore:
+            time_start = time.time()
+            try:
+                result = await asyncio.wait_for(coroutine_function(ip, *args), timeout)
+            except asyncio.TimeoutError:
+                # The coroutine is cancelled, but a request already sent may still take effect on the BMC
+                result = {'ret': False, 'timed_out': True, 'msg': "No response within %s seconds" % timeout}
+            except Exception as e:
+                result = {'ret': False, 'msg': "error_message: %s" % (e)}
+            return ip, result, time.time() - time_start
+
+    for task in asyncio.as_completed([run(ip) for ip in host_list]):
+        yield await task
+
+
 def read_config(config_file):
     """Read configuration file infomation    
     :config_file: Configuration file
     :type config_file: string 
     """
+    global NAVIGATION_CACHE_FILE, NAVIGATION_CACHE_TTL, BIOS_REGISTRY_CACHE_DIR
     cfg = configparser.ConfigParser()
     try:
         cfg.read(config_file)
@@ -98,6 +1518,13 @@ def read_config(config_file):
         config_ini_info["user"] = cfg.get('ConnectCfg', 'BmcUsername')
         config_ini_info["passwd"] = cfg.get('ConnectCfg', 'BmcUserpassword')
         config_ini_info['sysid'] = cfg.get('ConnectCfg', 'SystemId')
+        # Get the optional CacheCfg info
+        if cfg.has_option('CacheCfg', 'NavigationCacheFile') and cfg.get('CacheCfg', 'NavigationCacheFile'):
+            NAVIGATION_CACHE_FILE = cfg.get('CacheCfg', 'NavigationCacheFile')
+        if cfg.has_option('CacheCfg', 'NavigationCacheTTL'):
+            NAVIGATION_CACHE_TTL = cfg.getint('CacheCfg', 'NavigationCacheTTL')
+        if cfg.has_option('CacheCfg', 'BiosRegistryCacheDir') and cfg.get('CacheCfg', 'BiosRegistryCacheDir'):
+            BIOS_REGISTRY_CACHE_DIR = cfg.get('CacheCfg', 'BiosRegistryCacheDir')
     except:
         sys.stderr.write("Please check the file path is correct")
         sys.exit(1)
@@ -115,6 +1542,21 @@ def create_common_parameter_list():
     return argget
 
 
+def add_fleet_parameter(argget, required=True, timeout=600):
+    """Add parameters to run a tool against many BMCs
+    :params argget: parser from create_common_parameter_list
+    :type argget: class 'argparse.ArgumentParser'
+    :params required: whether --hosts must be given, False for tools that also run against the single BMC of --ip
+    :type required: bool
+    :params timeout: default of --timeout, seconds to wait for one BMC
+    :type timeout: float
+    """
+    argget.add_argument('--hosts', type=str, required=required, help='Host file(one BMC IP or CIDR per line) or comma separated BMC IPs/CIDRs')
+    argget.add_argument('--workers', type=int, default=16, help='Maximum number of BMCs handled at the same time, default is 16')
+    argget.add_argument('--timeout', type=float, default=timeout, help='Seconds to wait for one BMC before reporting it as timed out, its work may still complete, default is %s' % timeout)
+    return argget
+
+
 def parse_parameter(args):
     """parse parameter  
     :args: argparse namespace
@@ -0,0 +1,316 @@
+###
+#
+# Lenovo Redfish examples - Apply a batch of BMC user operations
+#
+# Copyright Notice:
+#
+# Copyright 2018 Lenovo Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+###
+
+
+import sys
+import json
+import lenovo_utils as utils
+from create_bmc_user import CUSTOM_PRIVILEGES
+
+# Operations understood by apply_user_operations
+USER_OPERATIONS = ['create', 'update', 'enable', 'disable', 'delete']
+
+
+class AccountsIndex(object):
+    """Accounts and Roles of one BMC, read once and kept up to date as operations are applied.
+    Accounts are found by UserName or by slot, the first empty slot is found without another walk of the collection.
+    """
+
+    def __init__(self, accounts, roles):
+        """
+        :params accounts: account entries in slot order, each with url, slot, UserName, Enabled, RoleId and etag
+        :type accounts: list
+        :params roles: role URL by role Name
+        :type roles: dict
+        """
+        self.accounts = accounts
+        self.roles = roles
+        self.by_name = dict((account['UserName'], account) for account in accounts if account['UserName'])
+
+    @classmethod
+    def load(cls, REDFISH_OBJ):
+        """Read the Accounts and Roles collections, their members several at a time
+        :params REDFISH_OBJ: logged-in redfish client
+        :type REDFISH_OBJ: redfish client object
+        :returns: returns index when succeeded or error message when failed
+        """
+        response_base_url = utils.get_navigation(REDFISH_OBJ, '/redfish/v1')
+        if response_base_url.status != 200:
+            return {'ret': False, 'msg': "response base url Error code %s" % response_base_url.status}
+        account_service_url = response_base_url.dict['AccountService']['@odata.id']
+        response_account_service_url = REDFISH_OBJ.get(account_service_url, None)
+        if response_account_service_url.status != 200:
+            return {'ret': False, 'msg': "response account service url Error code %s" % response_account_service_url.status}
+        accounts = []
+        response_accounts_url = utils.get_collection(REDFISH_OBJ, response_account_service_url.dict['Accounts']['@odata.id'])
+        if response_accounts_url.status != 200:
+            return {'ret': False, 'msg': "response accounts url Error code %s" % response_accounts_url.status}
+        members = response_accounts_url.dict['Members']
+        # All properties are read so each account keeps its @odata.etag for the If-Match of the PATCH
+        for slot, (member, response_account_url) in enumerate(zip(members, utils.get_members(REDFISH_OBJ, members)), 1):
+            if response_account_url.status != 200:
+                return {'ret': False, 'msg': "response account url Error code %s" % response_account_url.status}
+            account = response_account_url.dict
+            accounts.append({'url': member['@odata.id'], 'slot': slot, 'UserName': account.get('UserName', ''),
+                             'Enabled': account.get('Enabled'), 'RoleId': account.get('RoleId'), 'etag': account.get('@odata.etag', '')})
+        roles = {}
+        response_roles_url = utils.get_collection(REDFISH_OBJ, response_account_service_url.dict['Roles']['@odata.id'])
+        if response_roles_url.status != 200:
+            return {'ret': False, 'msg': "response roles url Error code %s" % response_roles_url.status}
+        members = response_roles_url.dict['Members']
+        for member, response_role_url in zip(members, utils.get_members(REDFISH_OBJ, members, select=['Name'])):
+            if response_role_url.status != 200:
+                return {'ret': False, 'msg': "response role url Error code %s" % response_role_url.status}
+            roles[response_role_url.dict['Name']] = member['@odata.id']
+        return {'ret': True, 'index': cls(accounts, roles)}
+
+    def find(self, username):
+        """Get the account entry of a user name(None: no such user)"""
+        return self.by_name.get(username)
+
+    def first_empty(self):
+        """Get the first account entry without a user(None: all slots are used)"""
+        for account in self.accounts:
+            if not account['UserName']:
+                return account
+        return None
+
+    def patch_account(self, REDFISH_OBJ, account, parameter):
+        """PATCH an account with its known etag and record the new values in the index"""
+        response_account_url = REDFISH_OBJ.patch(account['url'], body=parameter, headers={"If-Match": account['etag']})
+        if response_account_url.status not in [200, 204]:
+            if response_account_url.status == 412:
+                # The account changed since the index was read, the next operation on it reads it again
+                account['etag'] = None
+            try:
+                error_message = utils.get_extended_error(response_account_url)
+            except:
+                error_message = response_account_url
+            return {'ret': False, 'msg': "Url '%s' response Error code %s \nerror_message: %s" % (account['url'], response_account_url.status, error_message)}
+        if self.by_name.get(account['UserName']) is account:
+            del self.by_name[account['UserName']]
+        for name in ['UserName', 'Enabled', 'RoleId']:
+            if name in parameter:
+                account[name] = parameter[name]
+        if account['UserName']:
+            self.by_name[account['UserName']] = account
+        # The PATCH changed the etag, use the new one when the BMC returns the account
+        etag = None
+        if response_account_url.status == 200 and response_account_url.text:
+            etag = response_account_url.dict.get('@odata.etag')
+        account['etag'] = etag
+        return {'ret': True}
+
+    def refresh(self, REDFISH_OBJ, account):
+        """Read the etag of an account again when it is not known"""
+        if account['etag'] is not None:
+            return {'ret': True}
+        response_account_url = REDFISH_OBJ.get(account['url'], None)
+        if response_account_url.status != 200:
+            return {'ret': False, 'msg': "response account url Error code %s" % response_account_url.status}
+        account['etag'] = response_account_url.dict.get('@odata.etag', '')
+        return {'ret': True}
+
+    def set_role(self, REDFISH_OBJ, account, authority):
+        """Get the RoleId for an authority list, the CustomRole of the account slot gets the custom privileges"""
+        if len(authority) == 1 and authority[0] == "Supervisor":
+            return {'ret': True, 'role': "Administrator"}
+        if len(authority) == 1 and authority[0] == "ReadOnly":
+            return {'ret': True, 'role': "ReadOnly"}
+        for auth in authority:
+            if auth not in CUSTOM_PRIVILEGES:
+                return {'ret': False, 'msg': "custom privileges out of rang"}
+        role = "CustomRole" + str(account['slot'])
+        if role not in self.roles:
+            return {'ret': False, 'msg': "roles is not existed"}
+        response_role_url = REDFISH_OBJ.patch(self.roles[role], body={"OemPrivileges": list(authority)})
+        if response_role_url.status not in [200, 204]:
+            try:
+                error_message = utils.get_extended_error(response_role_url)
+            except:
+                error_message = response_role_url
+            return {'ret': False, 'msg': "response update role url Error code %s\n msg is %s" % (response_role_url.status, error_message)}
+        return {'ret': True, 'role': role}
+
+
+def apply_user_operation(REDFISH_OBJ, index, operation):
+    """Apply one user operation against an accounts index
+    :params REDFISH_OBJ: logged-in redfish client
+    :type REDFISH_OBJ: redfish client object
+    :params index: accounts index of the BMC
+    :type index: AccountsIndex
+    :params operation: dict with op(create, update, enable, disable or delete), username and, as needed, password and authority
+    :type operation: dict
+    :returns: returns operation result when succeeded or error message when failed
+    """
+    op = operation.get('op')
+    username = operation.get('username')
+    if op not in USER_OPERATIONS or not username:
+        return {'ret': False, 'msg': "Operation must have op(one of %s) and username" % ', '.join(USER_OPERATIONS)}
+    account = index.find(username)
+    if op == 'create':
+        if account is not None:
+            return {'ret': False, 'msg': "username %s is existed" % username}
+        if not operation.get('password'):
+            return {'ret': False, 'msg': "password is needed to create user %s" % username}
+        account = index.first_empty()
+        if account is None:
+            return {'ret': False, 'msg': "accounts is full,can't create a new account"}
+    elif account is None:
+        return {'ret': False, 'msg': "Account %s is not existed" % username}
+    result = index.refresh(REDFISH_OBJ, account)
+    if result['ret'] is False:
+        return result
+
+    parameter = {}
+    if op in ['create', 'update']:
+        if op == 'create':
+            parameter['UserName'] = username
+        if operation.get('password'):
+            parameter['Password'] = operation['password']
+        if op == 'create' or operation.get('authority'):
+            result = index.set_role(REDFISH_OBJ, account, operation.get('authority') or ["Supervisor"])
+            if result['ret'] is False:
+                return result
+            if result['role'] != account['RoleId'] or op == 'create':
+                parameter['RoleId'] = result['role']
+        if not parameter:
+            return {'ret': True, 'msg': "user %s is unchanged" % username}
+    elif op in ['enable', 'disable']:
+        if account['Enabled'] is (op == 'enable'):
+            return {'ret': True, 'msg': "BMC user %s is already %sd" % (username, op)}
+        parameter = {"Enabled": op == 'enable', "UserName": username}
+    else:
+        parameter = {"UserName": ""}
+    result = index.patch_account(REDFISH_OBJ, account, parameter)
+    if result['ret'] is False:
+        return result
+    if op == 'create':
+        # The BMC decides whether a new account starts enabled
+        account['Enabled'] = None
+    return {'ret': True, 'msg': "user %s %s successful" % (username, op == 'update' and 'updated' or op + 'd'), 'slot': account['slot']}
+
+
+def apply_user_operations(ip, login_account, login_password, operations):
+    """Apply a list of user operations to a BMC, Accounts and Roles are read only once
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params operations: operations applied in order, see apply_user_operation
+    :type operations: list
+    :returns: returns result of each operation, ret is False when any of them failed
+    """
+    login_host = "https://" + ip
+    try:
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
+    except:
+        result = {'ret': False, 'msg': "Please check the username, password, IP is correct\n"}
+        return result
+    result = AccountsIndex.load(REDFISH_OBJ)
+    if result['ret'] is False:
+        REDFISH_OBJ.logout()
+        return result
+    index = result['index']
+    results = []
+    for operation in operations:
+        try:
+            result = apply_user_operation(REDFISH_OBJ, index, operation)
+        except Exception as e:
+            result = {'ret': False, 'msg': "error_message: %s" % (e)}
+        results.append(dict(result, op=operation.get('op'), username=operation.get('username')))
+        if result['ret'] is True and operation.get('username') == login_account and (operation.get('op') in ['disable', 'delete'] or operation.get('password')):
+            # The BMC ends the sessions of the logged-in user when its password changes, carry on with a new one
+            REDFISH_OBJ.logout()
+            utils.close_redfish_client(login_host, login_account)
+            if operation.get('op') in ['disable', 'delete']:
+                break
+            login_password = operation['password']
+            try:
+                REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
+            except:
+                results.append({'ret': False, 'msg': "Failed to login again as %s" % login_account})
+                return {'ret': False, 'msg': "Login failed after updating %s" % login_account, 'results': results}
+    REDFISH_OBJ.logout()
+    failed = [entry for entry in results if entry['ret'] is False]
+    result = {'ret': not failed and len(results) == len(operations), 'results': results,
+              'msg': "%s of %s operations succeeded" % (len(results) - len(failed), len(operations))}
+    return result
+
+
+def read_user_operations(operations_file):
+    """Read a JSON list of user operations
+    :params operations_file: file path
+    :type operations_file: string
+    :returns: returns operations when succeeded or error message when failed
+    """
+    try:
+        with open(operations_file) as f:
+            operations = json.load(f)
+    except (IOError, ValueError) as e:
+        return {'ret': False, 'msg': "Failed to read operations %s: %s" % (operations_file, e)}
+    if not isinstance(operations, list) or not all(isinstance(operation, dict) for operation in operations):
+        return {'ret': False, 'msg': "Operations %s must be a list of objects" % operations_file}
+    return {'ret': True, 'operations': operations}
+
+
+import argparse
+def add_parameter():
+    """Add manage bmc users parameter"""
+    argget = utils.create_common_parameter_list()
+    utils.add_fleet_parameter(argget, required=False)
+    argget.add_argument('--operations', type=str, required=True, help='JSON file with a list of operations, such as [{"op": "create", "username": "ops", "password": "...", "authority": ["ReadOnly"]}, {"op": "disable", "username": "old"}], op is one of create, update, enable, disable, delete')
+    args = argget.parse_args()
+    parameter_info = utils.parse_parameter(args)
+    for name in ['hosts', 'workers', 'timeout', 'operations']:
+        parameter_info[name] = getattr(args, name)
+    return parameter_info
+
+
+if __name__ == '__main__':
+    # Get parameters from config.ini and/or command line
+    parameter_info = add_parameter()
+
+    # Get connection info from the parameters user specified
+    ip = parameter_info['ip']
+    login_account = parameter_info["user"]
+    login_password = parameter_info["passwd"]
+    result = read_user_operations(parameter_info['operations'])
+    if result['ret'] is False:
+        sys.stderr.write(result['msg'])
+        sys.exit(1)
+    operations = result['operations']
+
+    # Apply the operations to many BMCs when a host list is given, one JSON line per BMC
+    if parameter_info['hosts']:
+        host_list = utils.read_host_list(parameter_info['hosts'])
+        result = utils.run_fleet(host_list, apply_user_operations, (login_account, login_password, operations),
+                                 parameter_info['workers'], parameter_info['timeout'])
+        sys.stderr.write("%s succeeded, %s failed, %s timed out\n" % (result['succeeded'], result['failed'], result['timed_out']))
+        sys.exit(0 if result['ret'] else 1)
+
+    # Apply the operations and check result
+    result = apply_user_operations(ip, login_account, login_password, operations)
+    sys.stdout.write(json.dumps(result, sort_keys=True, indent=2))
+    if result['ret'] is False:
+        sys.exit(1)
@@ -21,7 +21,6 @@
 
 
 import sys
-import redfish
 import json
 import lenovo_utils as utils
 
@@ -42,17 +41,14 @@ def restart_manager(ip, login_account, login_password):
     try:
         # Connect using the BMC address, account name, and password
         # Create a REDFISH object
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                             password=login_password, default_prefix='/redfish/v1')
-        # Login into the server and create a session
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
         return result
     try:
         # GET the managers url from base url resource instance
         base_url = "/redfish/v1"
-        response_base_url = REDFISH_OBJ.get(base_url, None)
+        response_base_url = utils.get_navigation(REDFISH_OBJ, base_url)
         if response_base_url.status == 200:
             managers_url = response_base_url.dict['Managers']['@odata.id']
         else:
@@ -60,7 +56,7 @@ def restart_manager(ip, login_account, login_password):
             result = {'ret': False, 'msg': "Url '/redfish/v1' response Error code %s \nerror_message: %s" % (response_base_url.status, error_message)}
             return result
 
-        response_managers_url = REDFISH_OBJ.get(managers_url, None)
+        response_managers_url = utils.get_navigation(REDFISH_OBJ, managers_url)
         if response_managers_url.status == 200:
             count = response_managers_url.dict["Members@odata.count"]
             # Get the manager url from Member list
@@ -82,6 +78,8 @@ def restart_manager(ip, login_account, login_password):
                     headers = {"Content-Type":"application/json"}
                     response_restart = REDFISH_OBJ.post(restart_manager_url, headers=headers, body=body)
                     if response_restart.status in [200, 204]:  
+                        # All sessions are gone once the BMC restarts, drop the pooled one
+                        utils.close_redfish_client(login_host, login_account)
                         result = {'ret': True, 'msg': "Restart BMC Successfully"}
                     else:
                         error_message = utils.get_extended_error(response_restart)
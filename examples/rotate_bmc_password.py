@@ -0,0 +1,208 @@
+###
+#
+# Lenovo Redfish examples - Rotate a BMC user password across many BMCs
+#
+# Copyright Notice:
+#
+# Copyright 2018 Lenovo Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+###
+
+
+import os
+import sys
+import json
+import time
+import hashlib
+import lenovo_utils as utils
+from update_user_password import update_user_password
+
+
+def verify_password(ip, username, password):
+    """Check that a user can log in to a BMC with a password
+    :params ip: BMC IP address
+    :type ip: string
+    :params username: BMC user name
+    :type username: string
+    :params password: BMC user password
+    :type password: string
+    :returns: returns verify result
+    """
+    login_host = "https://" + ip
+    try:
+        REDFISH_OBJ = utils.get_redfish_client(login_host, username, password)
+    except Exception as e:
+        return {'ret': False, 'msg': "Login as %s with the new password failed: %s" % (username, e)}
+    response_session_url = REDFISH_OBJ.get('/redfish/v1/SessionService', None)
+    REDFISH_OBJ.logout()
+    if response_session_url.status != 200:
+        return {'ret': False, 'msg': "Login as %s with the new password failed, Error code %s" % (username, response_session_url.status)}
+    return {'ret': True}
+
+
+def rotate_password(ip, login_account, login_password, username, new_password):
+    """Change the password of a BMC user and verify it by logging in with it.
+    A BMC that already takes the new password, such as one finished by an interrupted run, counts as rotated.
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params username: user whose password is changed, may be login_account itself
+    :type username: string
+    :params new_password: new password
+    :type new_password: string
+    :returns: returns rotate result when succeeded or error message when failed
+    """
+    result = update_user_password(ip, login_account, login_password, username, new_password)
+    if result['ret'] is False:
+        if username == login_account and verify_password(ip, username, new_password)['ret'] is True:
+            # The old password no longer works but the new one does
+            utils.close_redfish_client("https://" + ip, username)
+            return {'ret': True, 'msg': "The BMC user '%s' password was already updated." % username, 'verified': True}
+        return result
+    # update_user_password dropped the pooled session of login_account when it changed its own password
+    verify_result = verify_password(ip, username, new_password)
+    if username != login_account or verify_result['ret'] is False:
+        utils.close_redfish_client("https://" + ip, username)
+    if verify_result['ret'] is False:
+        return {'ret': False, 'msg': "Password updated but not verified: %s" % verify_result['msg'], 'verified': False}
+    result['verified'] = True
+    return result
+
+
+def get_rotation_id(username, new_password):
+    """Get the id recorded with each result of a rotation, the same user and new password give the same id.
+    It is a slow salted hash, the state file does not reveal the password.
+    """
+    salt = ('rotate_bmc_password:%s' % username).encode('utf-8')
+    return hashlib.pbkdf2_hmac('sha256', new_password.encode('utf-8'), salt, 100000).hex()[:16]
+
+
+def read_rotation_state(state_file, username, rotation_id):
+    """Get the hosts already rotated from a state file written by rotate_password_fleet
+    :params state_file: JSON lines file, one line per host and attempt
+    :type state_file: string
+    :params username: user whose password is changed, records of other users are ignored
+    :type username: string
+    :params rotation_id: id of this rotation, records of other rotations are ignored
+    :type rotation_id: string
+    :returns: returns set of hosts whose last attempt of this rotation succeeded
+    """
+    done = set()
+    if not state_file or not os.path.isfile(state_file):
+        return done
+    with open(state_file) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # The last line may be cut short by an interrupted run
+                continue
+            if record.get('username') != username or record.get('rotation') != rotation_id:
+                continue
+            if record.get('result', {}).get('ret') is True:
+                done.add(record['host'])
+            else:
+                done.discard(record.get('host'))
+    return done
+
+
+def rotate_password_fleet(host_list, login_account, login_password, username, new_password, state_file=None, workers=16, timeout=None, output=sys.stdout, run_id=None):
+    """Rotate a user password on many BMCs in parallel, hosts recorded as done by the same rotation in the state file are skipped
+    :params host_list: BMC address list
+    :type host_list: list
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params username: user whose password is changed
+    :type username: string
+    :params new_password: new password
+    :type new_password: string
+    :params state_file: JSON lines file each result is appended to, read back to resume(None: no resume)
+    :type state_file: None or string
+    :params workers: maximum number of BMCs handled at the same time
+    :type workers: int
+    :params timeout: seconds to wait for one BMC(None: no limit)
+    :type timeout: None or float
+    :params output: JSON lines stream, one line per BMC
+    :type output: file object
+    :params run_id: id naming this rotation in the state file(None: derived from username and new_password)
+    :type run_id: None or string
+    :returns: returns summary of the run
+    """
+    rotation_id = run_id or get_rotation_id(username, new_password)
+    done = read_rotation_state(state_file, username, rotation_id)
+    pending = [ip for ip in host_list if ip not in done]
+    summary = {'ret': True, 'succeeded': 0, 'failed': 0, 'timed_out': 0, 'skipped': len(host_list) - len(pending)}
+    state = open(state_file, 'a') if state_file else None
+    args = (login_account, login_password, username, new_password)
+    try:
+        for ip, result, elapsed in utils.run_on_hosts(rotate_password, pending, args, workers, timeout):
+            # A timed out host is not recorded as done, the next run checks it again
+            summary[utils.get_result_state(result)] += 1
+            record = json.dumps({'host': ip, 'username': username, 'rotation': rotation_id, 'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                                 'elapsed': round(elapsed, 3), 'result': result}, sort_keys=True, default=str)
+            if state is not None:
+                # Written and flushed per host so an interrupted run resumes after the last finished host
+                state.write(record + '\n')
+                state.flush()
+                os.fsync(state.fileno())
+            output.write(record + '\n')
+            output.flush()
+    finally:
+        if state is not None:
+            state.close()
+    summary['ret'] = summary['failed'] == 0 and summary['timed_out'] == 0
+    return summary
+
+
+import argparse
+def add_parameter():
+    """Add rotate bmc password parameter"""
+    argget = utils.create_common_parameter_list()
+    utils.add_fleet_parameter(argget)
+    argget.add_argument('--username', type=str, required=True, help='BMC user whose password is rotated, may be the login user itself')
+    argget.add_argument('--newpasswd', type=str, help='New password, read from the ROTATE_NEW_PASSWORD environment variable when not given')
+    argget.add_argument('--state', type=str, help='JSON lines file results are appended to, hosts recorded as done by the same rotation are skipped when the job is run again')
+    argget.add_argument('--runid', type=str, help='Name of this rotation in the state file, default is derived from --username and the new password')
+    args = argget.parse_args()
+    parameter_info = utils.parse_parameter(args)
+    for name in ['hosts', 'workers', 'timeout', 'username', 'newpasswd', 'state', 'runid']:
+        parameter_info[name] = getattr(args, name)
+    return parameter_info
+
+
+if __name__ == '__main__':
+    # Get parameters from config.ini and/or command line
+    parameter_info = add_parameter()
+
+    # Get connection info from the parameters user specified
+    login_account = parameter_info["user"]
+    login_password = parameter_info["passwd"]
+    new_password = parameter_info['newpasswd'] or os.environ.get('ROTATE_NEW_PASSWORD')
+    if not new_password:
+        sys.stderr.write("Please specify the new password with --newpasswd or ROTATE_NEW_PASSWORD")
+        sys.exit(1)
+    host_list = utils.read_host_list(parameter_info['hosts'])
+
+    # Rotate the password on all hosts and check result
+    result = rotate_password_fleet(host_list, login_account, login_password, parameter_info['username'], new_password,
+                                   parameter_info['state'], parameter_info['workers'], parameter_info['timeout'], run_id=parameter_info['runid'])
+    sys.stderr.write("%s succeeded, %s failed, %s timed out, %s skipped as already done\n" % (result['succeeded'], result['failed'],
+                     result['timed_out'], result['skipped']))
+    if result['ret'] is False:
+        sys.exit(1)
@@ -23,7 +23,6 @@
 
 import sys
 import json
-import redfish
 import lenovo_utils as utils
 
 
@@ -48,10 +47,7 @@ def set_bios_attribute(ip,login_account,login_password,system_id,attribute_name,
     try:
         # Connect using the BMC address, account name, and password
         # Create a REDFISH object
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                             password=login_password, default_prefix='/redfish/v1')
-        # Login into the server and create a session
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
         return result
@@ -80,6 +76,14 @@ def set_bios_attribute(ip,login_account,login_password,system_id,attribute_name,
             REDFISH_OBJ.logout()
             return result
         parameter = {attribute_name: attribute_value}
+        # Check the name and value locally when the BMC publishes an attribute registry
+        registry_result = utils.get_bios_registry(REDFISH_OBJ, system_url)
+        if registry_result['ret'] is True and registry_result['registry'] is not None:
+            validate_result = utils.validate_bios_attributes(registry_result['registry'], parameter)
+            if validate_result['ret'] is False:
+                REDFISH_OBJ.logout()
+                return validate_result
+            parameter = validate_result['attributes']
         attribute = {"Attributes": parameter}
         response_pending_url = REDFISH_OBJ.patch(pending_url, body=attribute)
         if response_pending_url.status == 200:
@@ -95,14 +99,214 @@ def set_bios_attribute(ip,login_account,login_password,system_id,attribute_name,
     return result
 
 
+def apply_bios_profile(ip, login_account, login_password, system_id, profile, dry_run=False):
+    """Bring Bios attributes to a desired state, only the attributes that differ are sent, in one PATCH per system.
+    Every system is read, diffed and validated before the first PATCH, so a bad attribute fails the host before any write
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params system_id: ComputerSystem instance id(None: first instance, All: all instances)
+    :type system_id: None or string
+    :params profile: desired attribute values by attribute name
+    :type profile: dict
+    :params dry_run: only report the changes, do not PATCH
+    :type dry_run: bool
+    :returns: returns changed attributes with their old and new values when succeeded or error message when failed
+    """
+    result = {}
+    login_host = "https://" + ip
+    try:
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
+    except:
+        result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
+        return result
+    system = utils.get_system_url("/redfish/v1", system_id, REDFISH_OBJ)
+    if not system:
+        result = {'ret': False, 'msg': "This system id is not exist or system member is None"}
+        REDFISH_OBJ.logout()
+        return result
+    systems = []
+    plans = []
+    for system_url in system:
+        response_system_url = REDFISH_OBJ.get(system_url, None)
+        if response_system_url.status != 200:
+            result = {'ret': False, 'msg': "response system url Error code %s" % response_system_url.status}
+            REDFISH_OBJ.logout()
+            return result
+        bios_url = response_system_url.dict['Bios']['@odata.id']
+        # Check names and values locally when the BMC publishes an attribute registry, before reading the Bios resources
+        desired = profile
+        registry_result = utils.get_bios_registry(REDFISH_OBJ, system_url)
+        if registry_result['ret'] is True and registry_result['registry'] is not None:
+            validate_result = utils.validate_bios_attributes(registry_result['registry'], profile)
+            if validate_result['ret'] is False:
+                REDFISH_OBJ.logout()
+                return validate_result
+            desired = validate_result['attributes']
+        # Read current and pending Attributes once, as get_all_bios_attribute does
+        response_bios_url = REDFISH_OBJ.get(bios_url, None)
+        if response_bios_url.status != 200:
+            result = {'ret': False, 'msg': "response bios url Error code %s" % response_bios_url.status}
+            REDFISH_OBJ.logout()
+            return result
+        current = response_bios_url.dict['Attributes']
+        pending_url = response_bios_url.dict['@Redfish.Settings']['SettingsObject']['@odata.id']
+        response_pending_url = REDFISH_OBJ.get(pending_url, None)
+        if response_pending_url.status != 200:
+            result = {'ret': False, 'msg': "response pending url Error code %s" % response_pending_url.status}
+            REDFISH_OBJ.logout()
+            return result
+        diff = diff_bios_attributes(current, response_pending_url.dict.get('Attributes', {}), desired)
+        if diff['unknown']:
+            result = {'ret': False, 'msg': "Attributes not found in %s: %s" % (bios_url, ', '.join(sorted(diff['unknown'])))}
+            REDFISH_OBJ.logout()
+            return result
+        changes = dict((name, change[1]) for name, change in diff['changed'].items())
+        plans.append((pending_url, changes))
+        systems.append({'system': system_url, 'changed': diff['changed'], 'unchanged': diff['unchanged']})
+
+    # All systems passed, write the changes
+    for number, (pending_url, changes) in enumerate(plans):
+        if not changes or dry_run:
+            continue
+        response_pending_url = REDFISH_OBJ.patch(pending_url, body={"Attributes": changes})
+        if response_pending_url.status not in [200, 202, 204]:
+            error_message = utils.get_extended_error(response_pending_url)
+            result = {'ret': False, 'msg': "Url '%s' response Error code %s \nerror_message: %s" % (pending_url, response_pending_url.status, error_message),
+                      'systems': systems[:number]}
+            REDFISH_OBJ.logout()
+            return result
+    REDFISH_OBJ.logout()
+    changed = sum(len(entry['changed']) for entry in systems)
+    if dry_run:
+        msg = "%s attributes would be set" % changed
+    else:
+        msg = "%s attributes set, they take effect after the next reboot" % changed if changed else "Bios attributes already match the profile"
+    result = {'ret': True, 'msg': msg, 'changed': changed, 'systems': systems}
+    return result
+
+
+def diff_bios_attributes(current, pending, profile):
+    """Compare desired Bios attributes with current and pending ones, a pending value counts as already set
+    :params current: Attributes of the Bios resource
+    :type current: dict
+    :params pending: Attributes of the pending SettingsObject
+    :type pending: dict
+    :params profile: desired attribute values by attribute name
+    :type profile: dict
+    :returns: returns changed attributes as name: [old value, new value], number of unchanged ones and unknown names
+    """
+    diff = {'changed': {}, 'unchanged': 0, 'unknown': []}
+    for name, value in profile.items():
+        if name not in current:
+            diff['unknown'].append(name)
+            continue
+        effective = pending.get(name, current[name])
+        # Values given on the command line are strings, compare them with numbers as text
+        if effective == value or (isinstance(value, str) and not isinstance(effective, str) and str(effective) == value):
+            diff['unchanged'] += 1
+        else:
+            diff['changed'][name] = [effective, value]
+    return diff
+
+
+def read_bios_profile(profile_file):
+    """Read desired Bios attributes from a JSON file, either {"Attributes": {...}} or the attributes themselves
+    :params profile_file: profile file path
+    :type profile_file: string
+    :returns: returns profile attributes when succeeded or error message when failed
+    """
+    try:
+        with open(profile_file) as f:
+            profile = json.load(f)
+    except (IOError, ValueError) as e:
+        return {'ret': False, 'msg': "Failed to read profile %s: %s" % (profile_file, e)}
+    if isinstance(profile, dict) and isinstance(profile.get('Attributes'), dict):
+        profile = profile['Attributes']
+    if not isinstance(profile, dict) or not profile:
+        return {'ret': False, 'msg': "Profile %s has no attributes" % profile_file}
+    return {'ret': True, 'attributes': profile}
+
+
+def check_bios_profile(ip, login_account, login_password, system_id, profile):
+    """Validate a Bios profile against the attribute registry of one BMC, served from the registry cache when it holds it
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params system_id: ComputerSystem instance id(None: first instance, All: all instances)
+    :type system_id: None or string
+    :params profile: desired attribute values by attribute name
+    :type profile: dict
+    :returns: returns error message when the profile is invalid, checked is False when no registry could be read
+    """
+    login_host = "https://" + ip
+    try:
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
+    except:
+        return {'ret': True, 'checked': False}
+    try:
+        system = utils.get_system_url("/redfish/v1", system_id, REDFISH_OBJ)
+        registry_result = utils.get_bios_registry(REDFISH_OBJ, system[0]) if system else {'ret': False}
+    finally:
+        REDFISH_OBJ.logout()
+    if registry_result['ret'] is False or registry_result['registry'] is None:
+        return {'ret': True, 'checked': False}
+    validate_result = utils.validate_bios_attributes(registry_result['registry'], profile)
+    validate_result['checked'] = True
+    return validate_result
+
+
+def apply_bios_profile_fleet(host_list, login_account, login_password, system_id, profile, dry_run=False, workers=16, timeout=None, output=sys.stdout):
+    """Apply a Bios profile to many BMCs at once, one JSON line per BMC
+    :params host_list: BMC address list
+    :type host_list: list
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params system_id: ComputerSystem instance id(None: first instance, All: all instances)
+    :type system_id: None or string
+    :params profile: desired attribute values by attribute name
+    :type profile: dict
+    :params dry_run: only report the changes, do not PATCH
+    :type dry_run: bool
+    :params workers: maximum number of BMCs handled at the same time
+    :type workers: int
+    :params timeout: seconds to wait for one BMC(None: no limit)
+    :type timeout: None or float
+    :params output: JSON lines stream
+    :type output: file object
+    :returns: returns summary of the run
+    """
+    # A bad profile fails once, against the registry of the first BMC, instead of once per BMC
+    if host_list:
+        check_result = check_bios_profile(host_list[0], login_account, login_password, system_id, profile)
+        if check_result['ret'] is False:
+            result = {'ret': False, 'msg': check_result['msg'], 'succeeded': 0, 'failed': len(host_list), 'timed_out': 0}
+            return result
+    args = (login_account, login_password, system_id, profile, dry_run)
+    return utils.run_fleet(host_list, apply_bios_profile, args, workers, timeout, output)
+
+
 import argparse
 def add_parameter():
     """Add set bios attribute parameter"""
     argget = utils.create_common_parameter_list()
+    utils.add_fleet_parameter(argget, required=False)
     argget.add_argument('--name', type=str, help='Input the attribute name(This is the manufacturer/provider specific list of BIOS attributes.)')
     argget.add_argument('--value', type=str, help='Input the attribute value(This is the manufacturer/provider specific list of BIOS attributes.)')
+    argget.add_argument('--profile', type=str, help='JSON file of desired attribute values, only the attributes that differ are set, in one PATCH')
+    argget.add_argument('--dryrun', action='store_true', help='With --profile, only report the attributes that would be set')
     args = argget.parse_args()
     parameter_info = utils.parse_parameter(args)
+    for name in ['hosts', 'workers', 'timeout', 'profile', 'dryrun']:
+        parameter_info[name] = getattr(args, name)
     return parameter_info
 
 
@@ -116,6 +320,35 @@ if __name__ == '__main__':
     login_password = parameter_info["passwd"]
     system_id = parameter_info['sysid']
 
+    # A host list is only used with a profile
+    if parameter_info['hosts'] and not parameter_info['profile']:
+        sys.stderr.write("--hosts is only supported with --profile")
+        sys.exit(1)
+
+    # Apply a profile to the BMC, or to many BMCs when a host list is given
+    if parameter_info['profile']:
+        result = read_bios_profile(parameter_info['profile'])
+        if result['ret'] is False:
+            sys.stderr.write(result['msg'])
+            sys.exit(1)
+        profile = result['attributes']
+        if parameter_info['hosts']:
+            host_list = utils.read_host_list(parameter_info['hosts'])
+            result = apply_bios_profile_fleet(host_list, login_account, login_password, system_id, profile, parameter_info['dryrun'],
+                                              parameter_info['workers'], parameter_info['timeout'])
+            if 'msg' in result:
+                sys.stderr.write(result['msg'] + '\n')
+            sys.stderr.write("%s succeeded, %s failed, %s timed out\n" % (result['succeeded'], result['failed'], result['timed_out']))
+            sys.exit(0 if result['ret'] else 1)
+        result = apply_bios_profile(ip, login_account, login_password, system_id, profile, parameter_info['dryrun'])
+        if result['ret'] is True:
+            del result['ret']
+            sys.stdout.write(json.dumps(result, sort_keys=True, indent=2))
+        else:
+            sys.stderr.write(result['msg'])
+            sys.exit(1)
+        sys.exit(0)
+
     # Get set info from the parameters user specified
     try:
         attribute_name = parameter_info['attribute_name']
@@ -21,7 +21,6 @@
 
 
 import json,sys
-import redfish
 import lenovo_utils as utils
 
 
@@ -42,11 +41,7 @@ def set_bios_bootmode_uefi(ip, login_account, login_password,system_id):
     try:
         # Connect using the BMC address, account name, and password
         # Create a REDFISH object
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                             password=login_password, default_prefix='/redfish/v1')
-
-        # Login into the server and create a session
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
         return result
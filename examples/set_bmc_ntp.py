@@ -21,7 +21,6 @@
 
 
 import sys
-import redfish
 import json
 import lenovo_utils as utils
 
@@ -44,19 +43,15 @@ def set_manager_ntp(ip, login_account, login_password, ntp_server, ProtocolEnabl
     login_host = "https://" + ip
 
     # Connect using the BMC address, account name, and password
-    # Create a REDFISH object
-    REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                         password=login_password, default_prefix='/redfish/v1')
-
     # Login into the server and create a session
     try:
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct\n"}
         return result
     try:
         # Get ServiceBase resource
-        response_base_url = REDFISH_OBJ.get('/redfish/v1', None)
+        response_base_url = utils.get_navigation(REDFISH_OBJ, '/redfish/v1')
         # Get response_base_url
         if response_base_url.status == 200:
             manager_url = response_base_url.dict['Managers']['@odata.id']
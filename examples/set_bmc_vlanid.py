@@ -21,7 +21,6 @@
 
 
 import sys
-import redfish
 import json
 import lenovo_utils as utils
 
@@ -46,24 +45,22 @@ def set_manager_vlanid(ip, login_account, login_password, vlanid, vlanEnable):
     login_host = "https://"+ip
     # Connect using the BMC address, account name, and password
     # Create a REDFISH object
-    REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                         password=login_password, default_prefix='/redfish/v1')
     # Login into the server and create a session
     try:
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
         return result
     # GET the managers url
     base_url = "/redfish/v1"
-    response_base_url = REDFISH_OBJ.get(base_url, None)
+    response_base_url = utils.get_navigation(REDFISH_OBJ, base_url)
     if response_base_url.status == 200:
         managers_url = response_base_url.dict['Managers']['@odata.id']
     else:
         result = {'ret': False, 'msg': "response base url Error code %s" % response_base_url.status}
         REDFISH_OBJ.logout()
         return result
-    response_managers_url = REDFISH_OBJ.get(managers_url, None)
+    response_managers_url = utils.get_navigation(REDFISH_OBJ, managers_url)
     if response_managers_url.status == 200:
         count = response_managers_url.dict["Members@odata.count"]
         for i in range(count):
@@ -20,13 +20,19 @@
 ###
 
 
+import os
 import sys
-import redfish
 import json
+import time
+import uuid
+import requests
 import lenovo_utils as utils
+from requests.packages.urllib3.exceptions import InsecureRequestWarning
+from get_fw_inventory import get_cached_fw_inventory, invalidate_fw_inventory_cache
+from image_server import serve_image
 
 
-def update_fw(ip, login_account, login_password, image_url, targets, protocol):
+def update_fw(ip, login_account, login_password, image_url, targets, protocol, wait=True, version=None, timeout=None):
     """Set Bios attribute    
     :params ip: BMC IP address
     :type ip: string
@@ -40,23 +46,39 @@ def update_fw(ip, login_account, login_password, image_url, targets, protocol):
     :type targets: list
     :params protocol: User update transfer Protocol
     :type protocol: string
+    :params wait: wait for the update task the BMC starts to finish
+    :type wait: bool
+    :params version: version the image carries, targets already at it are not updated(None: always update)
+    :type version: None or string
+    :params timeout: seconds to wait for the update task(None: lenovo_utils.TASK_WAIT_TIMEOUT)
+    :type timeout: None or float
     :returns: returns set bios attribute result when succeeded or error message when failed
     """
+    # Skip the targets already running the requested version
+    if version:
+        check_result = check_fw_current(ip, login_account, login_password, targets, version)
+        if check_result['ret'] is False:
+            return check_result
+        if check_result['targets'] and not check_result['outdated']:
+            result = {'ret': True, 'skipped': True, 'msg': "Firmware is already at version %s, update skipped" % version,
+                      'current': check_result['current']}
+            return result
+        if check_result['targets']:
+            targets = check_result['outdated']
+
     # Connect using the address, account name, and password
     login_host = "https://" + ip 
     try:
         # Create a REDFISH object
         result = {}
-        REDFISH_OBJ = redfish.redfish_client(base_url=login_host, username=login_account,
-                                         password=login_password, default_prefix='/redfish/v1')
-        REDFISH_OBJ.login(auth="session")
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
     except:
         result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
         return result
 
 
     # Get ServiceRoot resource
-    response_base_url = REDFISH_OBJ.get('/redfish/v1', None)
+    response_base_url = utils.get_navigation(REDFISH_OBJ, '/redfish/v1')
     # Get response_update_service_url
     if response_base_url.status == 200:
         update_service_url = response_base_url.dict['UpdateService']['@odata.id']
@@ -67,10 +89,27 @@ def update_fw(ip, login_account, login_password, image_url, targets, protocol):
     response_update_service_url = REDFISH_OBJ.get(update_service_url, None)
     if response_update_service_url.status == 200:
         firmware_inventory_url = response_update_service_url.dict['Actions']['#UpdateService.SimpleUpdate']['target']
-        parameter = {"ImageURI": imageurl, "Targets": targets, "TransferProtocol": protocol}
+        parameter = {"ImageURI": image_url, "Targets": targets, "TransferProtocol": protocol}
         response_firmware_inventory = REDFISH_OBJ.post(firmware_inventory_url, body=parameter)
-        if response_firmware_inventory.status in [200, 202, 204]:
-            result = {'ret': True, 'msg': "Update firmware successful"}
+        task_uri = None
+        if response_firmware_inventory.status == 202:
+            task_uri = utils.get_task_uri(response_firmware_inventory)
+        if response_firmware_inventory.status in [200, 202, 204] and wait and task_uri:
+            # Track the update task until the image is flashed
+            # A BMC flash restarts the BMC, so it may be unreachable for a while before the task completes
+            task_result = utils.wait_for_task(REDFISH_OBJ, task_uri, timeout or utils.TASK_WAIT_TIMEOUT, reboot_grace=utils.TASK_REBOOT_GRACE)
+            # The cached firmware inventory no longer holds once the image is flashed
+            invalidate_fw_inventory_cache(ip)
+            if task_result['ret'] is True:
+                result = {'ret': True, 'msg': "Update firmware successful", 'task_uri': task_uri}
+            else:
+                result = {'ret': False, 'msg': "Update firmware failed, %s" % task_result['msg'], 'task_uri': task_uri}
+                if task_result.get('timed_out'):
+                    # The flash may still be running on the BMC
+                    result = {'ret': False, 'timed_out': True, 'msg': "Update firmware not finished, %s" % task_result['msg'], 'task_uri': task_uri}
+        elif response_firmware_inventory.status in [200, 202, 204]:
+            invalidate_fw_inventory_cache(ip)
+            result = {'ret': True, 'msg': "Update firmware successful", 'task_uri': task_uri}
         else:
             result = {'ret': False, 'msg': "response firmware inventory Error code %s" % response_firmware_inventory.status}
     else:
@@ -80,6 +119,247 @@ def update_fw(ip, login_account, login_password, image_url, targets, protocol):
     return result
 
 
+def check_fw_current(ip, login_account, login_password, targets, version):
+    """Find which update targets already run a version, from the cached firmware inventory of the BMC
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params targets: Targets list, SoftwareInventory URLs or ids such as BMC-Primary, or a comma separated string
+    :type targets: list or string
+    :params version: version the image carries
+    :type version: string
+    :returns: returns current and outdated targets when succeeded or error message when failed
+    """
+    if isinstance(targets, str):
+        targets = [target.strip() for target in targets.split(',') if target.strip()]
+    targets = list(targets or [])
+    result = {'ret': True, 'targets': targets, 'current': [], 'outdated': [], 'versions': {}}
+    if not targets:
+        # Without targets the image decides the component, there is nothing to compare with
+        return result
+    inventory_result = get_cached_fw_inventory(ip, login_account, login_password)
+    if inventory_result['ret'] is False:
+        return inventory_result
+    versions = {}
+    for entry in inventory_result['fw_version_detail']:
+        for firmware_id, firmware in entry.items():
+            versions[firmware_id] = firmware['Version']
+    for target in targets:
+        current_version = versions.get(target.rstrip('/').split('/')[-1])
+        result['versions'][target] = current_version
+        if current_version == version:
+            result['current'].append(target)
+        else:
+            result['outdated'].append(target)
+    return result
+
+
+def plan_fw_update(ip, login_account, login_password, targets, version):
+    """Dry run of update_fw with a version, report what would be updated without updating
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params targets: Targets list
+    :type targets: list or string
+    :params version: version the image carries
+    :type version: string
+    :returns: returns targets to update and their current versions when succeeded or error message when failed
+    """
+    check_result = check_fw_current(ip, login_account, login_password, targets, version)
+    if check_result['ret'] is False:
+        return check_result
+    if not check_result['targets']:
+        check_result['msg'] = "No targets given, the update would run"
+        check_result['update'] = True
+    else:
+        check_result['update'] = bool(check_result['outdated'])
+        check_result['msg'] = "Would update %s" % ', '.join(check_result['outdated']) if check_result['outdated'] else "Already at version %s" % version
+    return check_result
+
+
+# Bytes read from the image file at a time while it is pushed
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def push_fw(ip, login_account, login_password, image_file, targets, wait=True, progress=None):
+    """Push a local image to the UpdateService, the image is streamed from disk in chunks.
+    MultipartHttpPushUri is used when the BMC has it, otherwise the file is posted as is to HttpPushUri.
+    :params ip: BMC IP address
+    :type ip: string
+    :params login_account: BMC user name
+    :type login_account: string
+    :params login_password: BMC user password
+    :type login_password: string
+    :params image_file: local firmware image file
+    :type image_file: string
+    :params targets: Targets list, sent as UpdateParameters with a multipart push or set as HttpPushUriTargets otherwise(None or empty: the image decides)
+    :type targets: None or list
+    :params wait: wait for the update task the BMC starts to finish
+    :type wait: bool
+    :params progress: stream upload progress is written to(None: no progress)
+    :type progress: None or file object
+    :returns: returns push update result with upload size, seconds and throughput when succeeded or error message when failed
+    """
+    if not os.path.isfile(image_file):
+        result = {'ret': False, 'msg': "Image file %s is not found" % image_file}
+        return result
+    login_host = "https://" + ip
+    try:
+        REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
+    except:
+        result = {'ret': False, 'msg': "Please check the username, password, IP is correct"}
+        return result
+
+    # Get the push URIs from the UpdateService
+    response_base_url = utils.get_navigation(REDFISH_OBJ, '/redfish/v1')
+    if response_base_url.status != 200:
+        result = {'ret': False, 'msg': "response base url Error code %s" % response_base_url.status}
+        REDFISH_OBJ.logout()
+        return result
+    update_service_url = response_base_url.dict['UpdateService']['@odata.id']
+    response_update_service_url = REDFISH_OBJ.get(update_service_url, None)
+    if response_update_service_url.status != 200:
+        result = {'ret': False, 'msg': "response update service url Error code %s" % response_update_service_url.status}
+        REDFISH_OBJ.logout()
+        return result
+    update_service = response_update_service_url.dict
+    if 'MultipartHttpPushUri' in update_service:
+        push_uri = update_service['MultipartHttpPushUri']
+        parameters = {'Targets': targets} if targets else {}
+        body = MultipartImageBody(image_file, parameters)
+        headers = {'Content-Type': body.content_type}
+    elif 'HttpPushUri' in update_service:
+        # A plain push carries no parameters, the targets are set on the UpdateService first
+        if targets:
+            response_targets = REDFISH_OBJ.patch(update_service_url, body={'HttpPushUriTargets': targets})
+            if response_targets.status not in [200, 204]:
+                error_message = utils.get_extended_error(response_targets)
+                result = {'ret': False, 'msg': "Url '%s' response Error code %s \nerror_message: %s" % (update_service_url, response_targets.status, error_message)}
+                REDFISH_OBJ.logout()
+                return result
+        push_uri = update_service['HttpPushUri']
+        body = MultipartImageBody(image_file, None)
+        headers = {'Content-Type': 'application/octet-stream'}
+    else:
+        result = {'ret': False, 'msg': "The UpdateService has no HttpPushUri or MultipartHttpPushUri"}
+        REDFISH_OBJ.logout()
+        return result
+    REDFISH_OBJ.logout()
+
+    # Stream the image, requests reads the body in chunks and sends its length as Content-Length
+    requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+    session = {}
+    result = utils.create_transfer_session(login_host, login_account, login_password, session)
+    if result['ret'] is False:
+        body.close()
+        return result
+    headers['X-Auth-Token'] = session['token']
+    if progress is not None:
+        body.progress = lambda sent: utils.write_progress(progress, sent, len(body))
+    time_start = time.time()
+    try:
+        response_push_uri = requests.post(login_host + push_uri, data=body, headers=headers, verify=False, timeout=(30, 3600))
+    except requests.exceptions.RequestException as e:
+        result = {'ret': False, 'msg': "error_message: %s" % (e)}
+        return result
+    finally:
+        body.close()
+        if progress is not None:
+            progress.write('\n')
+        try:
+            requests.delete(login_host + session['location'], headers={"X-Auth-Token": session['token']}, verify=False)
+        except Exception:
+            pass
+    elapsed = time.time() - time_start
+    upload = {'size': body.sent, 'seconds': round(elapsed, 3),
+              'mb_per_second': round(body.sent / 1048576.0 / elapsed, 2) if elapsed else None}
+    if response_push_uri.status_code not in [200, 201, 202, 204]:
+        result = {'ret': False, 'msg': "Url '%s' response Error code %s" % (push_uri, response_push_uri.status_code), 'upload': upload}
+        return result
+
+    # The BMC flashes the pushed image in a task
+    task_uri = response_push_uri.headers.get('Location')
+    try:
+        body = response_push_uri.json()
+    except ValueError:
+        body = None
+    if isinstance(body, dict):
+        task_uri = body.get('@odata.id', task_uri)
+    invalidate_fw_inventory_cache(ip)
+    if wait and task_uri and response_push_uri.status_code == 202:
+        try:
+            REDFISH_OBJ = utils.get_redfish_client(login_host, login_account, login_password)
+        except Exception as e:
+            result = {'ret': False, 'msg': "The image was pushed but its update task can not be tracked, login failed: %s" % e,
+                      'task_uri': task_uri, 'upload': upload}
+            return result
+        try:
+            task_result = utils.wait_for_task(REDFISH_OBJ, task_uri, reboot_grace=utils.TASK_REBOOT_GRACE)
+        finally:
+            REDFISH_OBJ.logout()
+        if task_result['ret'] is False:
+            result = {'ret': False, 'msg': "Update firmware failed, %s" % task_result['msg'], 'task_uri': task_uri, 'upload': upload}
+            return result
+    result = {'ret': True, 'msg': "Update firmware successful", 'task_uri': task_uri, 'upload': upload}
+    return result
+
+
+class MultipartImageBody(object):
+    """Request body reading an image file in chunks, wrapped in multipart/form-data when there are UpdateParameters.
+    It reports its length so the request carries a Content-Length instead of being chunked.
+    """
+
+    def __init__(self, image_file, parameters):
+        """
+        :params image_file: local firmware image file
+        :type image_file: string
+        :params parameters: UpdateParameters part of a multipart push(None: the file alone)
+        :type parameters: None or dict
+        """
+        self._file = open(image_file, 'rb')
+        self.sent = 0
+        self.progress = None
+        if parameters is None:
+            self._head, self._tail = b'', b''
+            self.content_type = 'application/octet-stream'
+        else:
+            boundary = uuid.uuid4().hex
+            self.content_type = 'multipart/form-data; boundary=%s' % boundary
+            self._head = ('--%s\r\nContent-Disposition: form-data; name="UpdateParameters"\r\nContent-Type: application/json\r\n\r\n%s\r\n'
+                          '--%s\r\nContent-Disposition: form-data; name="UpdateFile"; filename="%s"\r\nContent-Type: application/octet-stream\r\n\r\n'
+                          % (boundary, json.dumps(parameters), boundary, os.path.basename(image_file))).encode('utf-8')
+            self._tail = ('\r\n--%s--\r\n' % boundary).encode('utf-8')
+        self._length = len(self._head) + os.fstat(self._file.fileno()).st_size + len(self._tail)
+        self._tail_sent = False
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = UPLOAD_CHUNK_SIZE
+        if self._head:
+            chunk, self._head = self._head[:size], self._head[size:]
+        else:
+            chunk = self._file.read(min(size, UPLOAD_CHUNK_SIZE))
+            if not chunk and not self._tail_sent:
+                chunk, self._tail_sent = self._tail, True
+        self.sent += len(chunk)
+        # The sender reads a few KB at a time, report once per UPLOAD_CHUNK_SIZE and at the end
+        if self.progress is not None and chunk and (self.sent // UPLOAD_CHUNK_SIZE != (self.sent - len(chunk)) // UPLOAD_CHUNK_SIZE or self.sent == self._length):
+            self.progress(self.sent)
+        return chunk
+
+    def close(self):
+        self._file.close()
+
+
 import argparse
 def add_parameter():
     """Add set bios attribute parameter"""
@@ -87,11 +367,47 @@ def add_parameter():
     argget.add_argument('--imageurl', type=str, help='Input the update firmware image url')
     argget.add_argument('--targets', type=str, help='Input the targets list')
     argget.add_argument('--protocol', type=str, help='Input the update firmware protocol')
+    add_image_server_parameter(argget)
+    argget.add_argument('--push', action='store_true', help='Upload --imagefile to the HttpPushUri/MultipartHttpPushUri of the BMC instead of serving it')
+    argget.add_argument('--version', type=str, help='Version the image carries, targets already at this version are not updated')
     args = argget.parse_args()
     parameter_info = utils.parse_parameter(args)
+    parameter_info['version'] = args.version
+    parameter_info['push'] = args.push
+    if args.targets is not None:
+        parameter_info['targets'] = args.targets
+    for name in ['imagefile', 'serveport', 'serveaddress', 'serverate']:
+        parameter_info[name] = getattr(args, name)
     return parameter_info
 
 
+def add_image_server_parameter(argget):
+    """Add parameters to serve a local image file to the BMCs instead of giving --imageurl"""
+    argget.add_argument('--imagefile', type=str, help='Local image file served to the BMCs over HTTP, replaces --imageurl and --protocol')
+    argget.add_argument('--serveport', type=int, default=0, help='Port the image server listens on, default is any free port')
+    argget.add_argument('--serveaddress', type=str, help='Local address the image server listens on and the BMCs reach it at, default is the local address that routes to the BMC')
+    argget.add_argument('--serverate', type=float, default=0, help='Rate cap of each image download in MB/s, default is no limit')
+    return argget
+
+
+def start_image_server(parameter_info, bmc_ip):
+    """Start the image server asked for by add_image_server_parameter, and point imageurl and protocol at it
+    :params parameter_info: parsed parameters, imageurl and protocol are set when an image file is given
+    :type parameter_info: dict
+    :params bmc_ip: a BMC IP address, the image URL uses the local address that routes to it
+    :type bmc_ip: string
+    :returns: returns the started server(None: no image file given) when succeeded or error message when failed
+    """
+    if not parameter_info.get('imagefile'):
+        return {'ret': True, 'server': None}
+    rate = parameter_info['serverate'] * 1024 * 1024 if parameter_info['serverate'] else None
+    result = serve_image(parameter_info['imagefile'], bmc_ip, parameter_info['serveport'], parameter_info['serveaddress'], rate)
+    if result['ret'] is True:
+        parameter_info['imageurl'] = result['url']
+        parameter_info['protocol'] = 'HTTP'
+    return result
+
+
 if __name__ == '__main__':
     # Get parameters from config.ini and/or command line
     parameter_info = add_parameter()
@@ -101,17 +417,45 @@ if __name__ == '__main__':
     login_account = parameter_info["user"]
     login_password = parameter_info["passwd"]
 
-    # Get set info from the parameters user specified
-    try:
-        imageurl = parameter_info['imageurl']
-        targets = parameter_info['targets']
-        protocol = parameter_info['protocol']
-    except:
-        sys.stderr.write("Please run the command 'python %s -h' to view the help info" % sys.argv[0])
+    # Push the local image file to the BMC when asked to, no file server is needed
+    if parameter_info['push']:
+        if not parameter_info['imagefile']:
+            sys.stderr.write("Please specify the image file to push with --imagefile")
+            sys.exit(1)
+        targets = parameter_info.get('targets')
+        if isinstance(targets, str):
+            targets = [target.strip() for target in targets.split(',') if target.strip()]
+        result = push_fw(ip, login_account, login_password, parameter_info['imagefile'], targets, progress=sys.stderr)
+        if result['ret'] is True:
+            del result['ret']
+            sys.stdout.write(json.dumps(result, sort_keys=True, indent=2))
+        else:
+            sys.stderr.write(result['msg'])
+            sys.exit(1)
+        sys.exit(0)
+
+    # Serve the local image file to the BMC when one is given
+    server_result = start_image_server(parameter_info, ip)
+    if server_result['ret'] is False:
+        sys.stderr.write(server_result['msg'])
         sys.exit(1)
 
-    # Update firmware result and check result
-    result = update_fw(ip, login_account, login_password, imageurl, targets, protocol)
+    # The server is stopped however the update ends
+    try:
+        # Get set info from the parameters user specified
+        try:
+            imageurl = parameter_info['imageurl']
+            targets = parameter_info['targets']
+            protocol = parameter_info['protocol']
+        except:
+            sys.stderr.write("Please run the command 'python %s -h' to view the help info" % sys.argv[0])
+            sys.exit(1)
+
+        # Update firmware result and check result
+        result = update_fw(ip, login_account, login_password, imageurl, targets, protocol, version=parameter_info['version'])
+    finally:
+        if server_result['server'] is not None:
+            server_result['server'].stop()
     if result['ret'] is True:
         del result['ret']
         sys.stdout.write(json.dumps(result['msg'], sort_keys=True, indent=2))